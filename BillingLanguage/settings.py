@@ -30,6 +30,7 @@ MIDDLEWARE = [
     'django.middleware.common.CommonMiddleware',
     'django.middleware.csrf.CsrfViewMiddleware',
     'django.contrib.auth.middleware.AuthenticationMiddleware',
+    'Finance.audit.AuditMiddleware',
     'django.contrib.messages.middleware.MessageMiddleware',
     'django.middleware.clickjacking.XFrameOptionsMiddleware',
 ]
@@ -58,6 +59,21 @@ DATABASES = {
     'default': {
         'ENGINE': 'django.db.backends.sqlite3',
         'NAME': BASE_DIR / 'db.sqlite3',
+        # Write transactions take the lock up front and wait for it, instead of
+        # failing with "database is locked" when two workers upgrade a read;
+        # they wait up to `timeout` seconds (the default, 5, is too short
+        # under concurrent writers).
+        'OPTIONS': {'transaction_mode': 'IMMEDIATE', 'timeout': 20},
+    }
+}
+
+# Cache (profile dashboard, Finance.caching)
+# LocMemCache is per process; with several workers use FileBasedCache
+# (or a shared server) so invalidations reach every process.
+CACHES = {
+    'default': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+        'LOCATION': 'billing-language',
     }
 }
 
@@ -117,4 +133,41 @@ DEFAULT_FROM_EMAIL = 'webmaster@localhost'
 # Lista de admins que recibirán los emails de contacto
 ADMINS = [
     ('Admin', 'admin@example.com'),  # <-- reemplaza con tu email real
-]
\ No newline at end of file
+]
+
+# ==============================
+# Finance
+# ==============================
+
+# Seconds between in-process overdue sweeps (OUTSTANDING -> OVERDUE once
+# due_date has passed). None disables it; `manage.py sweep_overdue` from cron
+# does the same job.
+FINANCE_OVERDUE_SWEEP_INTERVAL = None
+
+# Invoice numbers reserved per block (per ledger and company code) by each
+# worker process; see Finance.numbering.
+FINANCE_INVOICE_NUMBER_BLOCK_SIZE = 20
+
+# Rendered invoice documents (detail + printable), reused while the invoice is
+# unchanged. Least recently used files are deleted past the size limit.
+FINANCE_SNAPSHOT_DIR = BASE_DIR / 'var' / 'invoice_snapshots'
+FINANCE_SNAPSHOT_MAX_BYTES = 50 * 1024 * 1024
+
+# Field-level change log of invoices and parties (Finance.audit), written in
+# one batch per request by Finance.audit.AuditMiddleware.
+FINANCE_AUDIT_LOG = True
+
+# ==============================
+# Messaging
+# ==============================
+
+# Pub/sub behind the live chat (messaging.live). LocalBackend fans out inside
+# one process; with several worker processes use DatabaseBackend, which
+# shares the events through the database (polled every
+# MESSAGING_LIVE_POLL_INTERVAL seconds by each worker).
+MESSAGING_LIVE_BACKEND = 'messaging.live.LocalBackend'
+MESSAGING_LIVE_POLL_INTERVAL = 0.5
+# Pushed events need ASGI (BillingLanguage.asgi under uvicorn/daphne). Under
+# WSGI the chat pages poll every MESSAGING_LIVE_SHORT_POLL_SECONDS instead,
+# without holding a worker (see messaging.live).
+MESSAGING_LIVE_SHORT_POLL_SECONDS = 5
@@ -1,24 +1,139 @@
-from django.contrib import admin
-from .models import Customer, Vendor, CustomerInvoice, VendorInvoice
+from django.contrib import admin, messages
+from django.contrib.admin import helpers
+from django.template.response import TemplateResponse
+from .bulk_actions import apply_action
+from .forms import PaymentDateForm
+from .models import AgingSummary, AuditLogEntry, Customer, Vendor, CustomerInvoice, VendorInvoice, DailyInvoiceRollup, MonthlyInvoiceRollup
+from .pagination import EstimatedCountPaginator
+
+
+class LargeTableAdmin(admin.ModelAdmin):
+    """
+    Base for changelists of tables that grow without bound: no COUNT(*) of
+    the whole table per page (EstimatedCountPaginator, and no second count
+    for the "N total" link). Subclasses still declare list_select_related /
+    get_queryset() prefetching for their related columns.
+    """
+    paginator = EstimatedCountPaginator
+    show_full_result_count = False
+
+    def changelist_view(self, request, extra_context=None):
+        response = super().changelist_view(request, extra_context)
+        changelist = getattr(response, 'context_data', {}).get('cl')
+        if changelist is not None and changelist.paginator.truncated:
+            # The messages are rendered with the (still lazy) response
+            self.message_user(request, (
+                f"More than {changelist.paginator.EXACT_LIMIT:,} matches: only the first pages are listed. "
+                "Narrow the search or the filters to reach the rest."
+            ), messages.WARNING)
+        return response
+
+
+def mark_paid_with_date(modeladmin, request, queryset, ledger):
+    """
+    The 'mark paid' action with an intermediate page asking for the payment
+    date (same choice as the Finance bulk view); the selection is posted
+    back with it.
+    """
+    form = PaymentDateForm(request.POST if 'apply' in request.POST else None)
+    if form.is_valid():
+        updated = apply_action(ledger, queryset, 'mark_paid', payment_date=form.cleaned_data['payment_date'])
+        modeladmin.message_user(request, f"{updated} invoice(s) marked as paid.", messages.SUCCESS)
+        return None
+    return TemplateResponse(request, 'admin/Finance/mark_paid.html', {
+        **modeladmin.admin_site.each_context(request),
+        'title': "Mark invoices as paid",
+        'opts': modeladmin.model._meta,
+        'form': form,
+        'selected': request.POST.getlist(helpers.ACTION_CHECKBOX_NAME),
+        'select_across': request.POST.get('select_across', '0'),
+        'action_checkbox_name': helpers.ACTION_CHECKBOX_NAME,
+    })
+
 
 @admin.register(Customer)
-class CustomerAdmin(admin.ModelAdmin):
+class CustomerAdmin(LargeTableAdmin):
     list_display = ('name', 'email', 'company_code', 'created_at')
     search_fields = ('name', 'email', 'company_code')
+    raw_id_fields = ('user',)
+    ordering = ('name', 'pk')  # also the order of the invoice autocomplete
 
 @admin.register(Vendor)
-class VendorAdmin(admin.ModelAdmin):
+class VendorAdmin(LargeTableAdmin):
     list_display = ('name', 'email', 'company', 'company_code', 'created_at')
     search_fields = ('name', 'email', 'company_code')
+    raw_id_fields = ('user',)
+    ordering = ('name', 'pk')
 
 @admin.register(CustomerInvoice)
-class CustomerInvoiceAdmin(admin.ModelAdmin):
+class CustomerInvoiceAdmin(LargeTableAdmin):
     list_display = ('invoice_number', 'customer', 'date_issued', 'due_date', 'amount', 'status')
     list_filter = ('status', 'date_issued')
+    list_select_related = ('customer',)
     search_fields = ('invoice_number', 'customer__name')
+    autocomplete_fields = ('customer',)
+    actions = ['mark_paid', 'mark_overdue']
+
+    @admin.action(description="Mark selected invoices as paid")
+    def mark_paid(self, request, queryset):
+        return mark_paid_with_date(self, request, queryset, 'AR')
+
+    @admin.action(description="Mark selected invoices as overdue")
+    def mark_overdue(self, request, queryset):
+        updated = apply_action('AR', queryset, 'mark_overdue')
+        self.message_user(request, f"{updated} invoice(s) marked as overdue.", messages.SUCCESS)
 
 @admin.register(VendorInvoice)
-class VendorInvoiceAdmin(admin.ModelAdmin):
+class VendorInvoiceAdmin(LargeTableAdmin):
     list_display = ('invoice_number', 'vendor', 'date_issued', 'due_date', 'amount', 'status')
     list_filter = ('status', 'date_issued')
+    list_select_related = ('vendor',)
     search_fields = ('invoice_number', 'vendor__name')
+    autocomplete_fields = ('vendor',)
+    actions = ['mark_paid', 'mark_processed', 'mark_overdue']
+
+    @admin.action(description="Mark selected invoices as paid")
+    def mark_paid(self, request, queryset):
+        return mark_paid_with_date(self, request, queryset, 'AP')
+
+    @admin.action(description="Mark selected invoices as processed")
+    def mark_processed(self, request, queryset):
+        updated = apply_action('AP', queryset, 'mark_processed')
+        self.message_user(request, f"{updated} invoice(s) marked as processed.", messages.SUCCESS)
+
+    @admin.action(description="Mark selected invoices as overdue")
+    def mark_overdue(self, request, queryset):
+        updated = apply_action('AP', queryset, 'mark_overdue')
+        self.message_user(request, f"{updated} invoice(s) marked as overdue.", messages.SUCCESS)
+
+@admin.register(AgingSummary)
+class AgingSummaryAdmin(LargeTableAdmin):
+    list_display = ('ledger', 'customer', 'vendor', 'company_code', 'current', 'days_1_30', 'days_31_60', 'days_61_90', 'days_over_90', 'as_of')
+    list_filter = ('ledger', 'company_code')
+    list_select_related = ('customer', 'vendor')
+    readonly_fields = [f.name for f in AgingSummary._meta.fields]
+
+@admin.register(DailyInvoiceRollup, MonthlyInvoiceRollup)
+class InvoiceRollupAdmin(LargeTableAdmin):
+    list_display = ('period', 'ledger', 'company_code', 'status', 'invoice_count', 'amount')
+    list_filter = ('ledger', 'company_code', 'status')
+    date_hierarchy = 'period'
+    readonly_fields = ('ledger', 'company_code', 'status', 'period', 'invoice_count', 'amount')
+
+@admin.register(AuditLogEntry)
+class AuditLogEntryAdmin(LargeTableAdmin):
+    list_display = ('changed_at', 'model', 'object_repr', 'action', 'field', 'old_value', 'new_value', 'user')
+    # A date filter, not date_hierarchy: its year links run a DISTINCT over the whole log
+    list_filter = ('model', 'action', 'changed_at')
+    search_fields = ('object_repr',)
+    list_select_related = ('user',)
+
+    # Append-only: nothing is added, edited or deleted from the admin
+    def has_add_permission(self, request):
+        return False
+
+    def has_change_permission(self, request, obj=None):
+        return False
+
+    def has_delete_permission(self, request, obj=None):
+        return False
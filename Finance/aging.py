@@ -0,0 +1,188 @@
+from datetime import date, timedelta
+
+from django.db import transaction
+from django.db.models import F, Q, Sum, Count
+
+from .models import AgingSummary, Customer, CustomerInvoice, Vendor, VendorInvoice
+
+BUCKETS = ('current', 'days_1_30', 'days_31_60', 'days_61_90', 'days_over_90')
+
+# Per ledger: invoice model, party FK on the invoice, party model and the
+# statuses that still count as an open balance.
+LEDGERS = {
+    'AR': {
+        'model': CustomerInvoice,
+        'party': 'customer',
+        'party_model': Customer,
+        'open_statuses': ('OUTSTANDING', 'OVERDUE', 'IN_TRANSIT'),
+    },
+    'AP': {
+        'model': VendorInvoice,
+        'party': 'vendor',
+        'party_model': Vendor,
+        'open_statuses': ('OUTSTANDING', 'OVERDUE'),
+    },
+}
+
+
+def ledger_for(model):
+    """Returns 'AR' / 'AP' for an invoice model class, or None."""
+    for ledger, conf in LEDGERS.items():
+        if conf['model'] is model:
+            return ledger
+    return None
+
+
+def bucket_for(due_date, as_of):
+    """Name of the aging bucket an invoice due on ``due_date`` falls in."""
+    days = (as_of - due_date).days
+    if days <= 0:
+        return 'current'
+    if days <= 30:
+        return 'days_1_30'
+    if days <= 60:
+        return 'days_31_60'
+    if days <= 90:
+        return 'days_61_90'
+    return 'days_over_90'
+
+
+# === INCREMENTAL UPDATES (used by the save/delete hooks) ===
+def contribution(ledger, status, party_id, due_date, amount):
+    """
+    What a single invoice adds to the summary table: (party_id, due_date,
+    amount) for open invoices, None for closed ones.
+    """
+    if status not in LEDGERS[ledger]['open_statuses'] or party_id is None:
+        return None
+    return (party_id, due_date, amount)
+
+
+def stored_row(ledger, pk):
+    """
+    The invoice as currently stored in the database, plus its party's
+    company code: the one read the save hooks (aging, Finance.rollups,
+    Finance.audit) compare the new values against.
+    """
+    model = LEDGERS[ledger]['model']
+    fields = [f.attname for f in model._meta.concrete_fields]
+    return model.objects.filter(pk=pk).values(*fields, LEDGERS[ledger]['party'] + '__company_code').first()
+
+
+def row_contribution(ledger, row):
+    """Contribution of a row returned by stored_row()."""
+    if row is None:
+        return None
+    party_field = LEDGERS[ledger]['party'] + '_id'
+    return contribution(ledger, row['status'], row[party_field], row['due_date'], row['amount'])
+
+
+def instance_contribution(ledger, invoice):
+    party_id = getattr(invoice, LEDGERS[ledger]['party'] + '_id')
+    return contribution(ledger, invoice.status, party_id, invoice.due_date, invoice.amount)
+
+
+def _apply(ledger, contrib, sign):
+    party_id, due_date, amount = contrib
+    conf = LEDGERS[ledger]
+    lookup = {'ledger': ledger, conf['party'] + '_id': party_id}
+
+    if sign > 0:
+        summary, _ = AgingSummary.objects.get_or_create(
+            **lookup,
+            defaults={
+                'as_of': date.today,
+                'company_code': lambda: conf['party_model'].objects.values_list('company_code', flat=True).get(pk=party_id),
+            },
+        )
+        pk, as_of = summary.pk, summary.as_of
+    else:
+        # Never create a row to subtract from: the party may be mid-cascade delete
+        row = AgingSummary.objects.filter(**lookup).values_list('pk', 'as_of').first()
+        if row is None:
+            return
+        pk, as_of = row
+
+    bucket = bucket_for(due_date, as_of)
+    AgingSummary.objects.filter(pk=pk).update(**{
+        bucket: F(bucket) + amount * sign,
+        'open_count': F('open_count') + sign,
+    })
+
+
+def apply_change(ledger, old, new):
+    """Moves an invoice's amount from its ``old`` contribution to its ``new`` one."""
+    if old == new:
+        return
+    with transaction.atomic():
+        if old is not None:
+            _apply(ledger, old, -1)
+        if new is not None:
+            _apply(ledger, new, +1)
+
+
+# === FULL RECOMPUTE (nightly rollover and after bulk writes) ===
+def _bucket_sums(as_of):
+    def days_ago(n):
+        return as_of - timedelta(days=n)
+
+    return {
+        'current': Sum('amount', filter=Q(due_date__gte=as_of)),
+        'days_1_30': Sum('amount', filter=Q(due_date__lt=as_of, due_date__gte=days_ago(30))),
+        'days_31_60': Sum('amount', filter=Q(due_date__lt=days_ago(30), due_date__gte=days_ago(60))),
+        'days_61_90': Sum('amount', filter=Q(due_date__lt=days_ago(60), due_date__gte=days_ago(90))),
+        'days_over_90': Sum('amount', filter=Q(due_date__lt=days_ago(90))),
+        'open_count': Count('pk'),
+    }
+
+
+def rebuild(ledger, party_ids=None, as_of=None):
+    """
+    Recomputes summary rows for ``ledger`` from the invoice table with one
+    grouped query, either for every party or only for ``party_ids``.
+    Returns the number of summary rows written.
+    """
+    as_of = as_of or date.today()
+    conf = LEDGERS[ledger]
+    party = conf['party']
+
+    invoices = conf['model'].objects.filter(status__in=conf['open_statuses'])
+    summaries = AgingSummary.objects.filter(ledger=ledger)
+    if party_ids is not None:
+        party_ids = list(party_ids)
+        invoices = invoices.filter(**{party + '_id__in': party_ids})
+        summaries = summaries.filter(**{party + '_id__in': party_ids})
+
+    rows = (
+        invoices
+        .values(party + '_id', party + '__company_code')
+        .order_by()
+        .annotate(**_bucket_sums(as_of))
+    )
+    with transaction.atomic():
+        new_rows = [
+            AgingSummary(
+                ledger=ledger,
+                company_code=row[party + '__company_code'],
+                as_of=as_of,
+                open_count=row['open_count'],
+                **{party + '_id': row[party + '_id']},
+                **{bucket: row[bucket] or 0 for bucket in BUCKETS},
+            )
+            for row in rows
+        ]
+        summaries.delete()
+        AgingSummary.objects.bulk_create(new_rows, batch_size=500)
+    return len(new_rows)
+
+
+# === READ HELPERS ===
+def company_totals(ledger):
+    """Aging per company_code, summed over the per-party rows."""
+    return (
+        AgingSummary.objects
+        .filter(ledger=ledger)
+        .values('company_code')
+        .order_by('company_code')
+        .annotate(**{bucket: Sum(bucket) for bucket in BUCKETS}, open_count=Sum('open_count'))
+    )
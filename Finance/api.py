@@ -0,0 +1,200 @@
+import hashlib
+from functools import wraps
+
+from django.core.serializers.json import DjangoJSONEncoder
+from django.http import JsonResponse
+from django.views.decorators.http import condition, require_GET
+
+from . import forecast
+from .aging import LEDGERS
+from .pagination import paginate_request
+
+# API field -> ORM lookup, per ledger. 'id' is always returned.
+FIELDS = {
+    'AR': {
+        'id': 'pk',
+        'invoice_number': 'invoice_number',
+        'customer': 'customer_id',
+        'customer_name': 'customer__name',
+        'date_issued': 'date_issued',
+        'due_date': 'due_date',
+        'amount': 'amount',
+        'status': 'status',
+        'payment_date': 'payment_date',
+        'notes': 'notes',
+        'created_at': 'created_at',
+        'updated_at': 'updated_at',
+    },
+    'AP': {
+        'id': 'pk',
+        'invoice_number': 'invoice_number',
+        'vendor': 'vendor_id',
+        'vendor_name': 'vendor__name',
+        'date_issued': 'date_issued',
+        'due_date': 'due_date',
+        'amount': 'amount',
+        'status': 'status',
+        'payment_date': 'payment_date',
+        'payment_method': 'payment_method',
+        'notes': 'notes',
+        'created_at': 'created_at',
+        'updated_at': 'updated_at',
+    },
+}
+
+LEDGER_SLUGS = {'ar': 'AR', 'ap': 'AP'}
+
+
+class ApiError(Exception):
+    def __init__(self, message, status=400):
+        super().__init__(message)
+        self.status = status
+
+
+# === UTILITIES ===
+def api_view(view_func):
+    """login check with a JSON 401 instead of a redirect, and ApiError -> JSON error."""
+    @wraps(view_func)
+    def wrapper(request, *args, **kwargs):
+        if not request.user.is_authenticated:
+            return JsonResponse({'error': 'Authentication required.'}, status=401)
+        try:
+            return view_func(request, *args, **kwargs)
+        except ApiError as e:
+            return JsonResponse({'error': str(e)}, status=e.status)
+    return wrapper
+
+
+def _ledger(slug):
+    if slug not in LEDGER_SLUGS:
+        raise ApiError("Unknown ledger.", status=404)
+    return LEDGER_SLUGS[slug]
+
+
+def _scope(request, ledger):
+    """Same ownership rules as the HTML views: staff see everything, parties their own invoices."""
+    conf = LEDGERS[ledger]
+    model, party = conf['model'], conf['party']
+    if request.user.is_staff:
+        return model.objects.all()
+    profile_id = getattr(request.user, party + '_profile_id', None)
+    if profile_id:
+        return model.objects.filter(**{party + '_id': profile_id})
+    return model.objects.none()
+
+
+def _fields(request, ledger):
+    """Validated ?fields=a,b,c selection (always with id)."""
+    available = FIELDS[ledger]
+    requested = request.GET.get('fields')
+    if not requested:
+        return list(available)
+    names = [name.strip() for name in requested.split(',') if name.strip()]
+    unknown = [name for name in names if name not in available]
+    if unknown:
+        raise ApiError(f"Unknown field(s): {', '.join(unknown)}.")
+    return ['id'] + [name for name in names if name != 'id']
+
+
+def _party_updated_at(ledger):
+    return LEDGERS[ledger]['party'] + '__updated_at'
+
+
+def _lookups(ledger, fields):
+    # date_issued and updated_at are always read: the cursor and the ETag need
+    # them. So is the party's updated_at, since the party name is in the
+    # payload (the same version as Finance.snapshots)
+    lookups = {FIELDS[ledger][name] for name in fields} | {'pk', 'date_issued', 'updated_at', _party_updated_at(ledger)}
+    return sorted(lookups)
+
+
+def _version(ledger, row):
+    return f"{row['updated_at'].isoformat()}-{row[_party_updated_at(ledger)].isoformat()}"
+
+
+def _serialize(ledger, fields, row):
+    return {name: row[FIELDS[ledger][name]] for name in fields}
+
+
+def _etag(*parts):
+    return hashlib.sha1('|'.join(str(p) for p in parts).encode()).hexdigest()
+
+
+# === LOADERS ===
+# Each resource is read once per request and memoized on the request, so the
+# ETag/Last-Modified functions and the view share one query. A 304 stops
+# before anything is serialized.
+def _load_list(request, ledger_slug):
+    if not hasattr(request, '_api_resource'):
+        ledger = _ledger(ledger_slug)
+        fields = _fields(request, ledger)
+        queryset = _scope(request, ledger)
+        if request.GET.get('status'):
+            queryset = queryset.filter(status=request.GET['status'].upper())
+        page = paginate_request(request, queryset.values(*_lookups(ledger, fields)))
+        request._api_resource = (ledger, fields, page)
+    return request._api_resource
+
+
+def _load_detail(request, ledger_slug, pk):
+    if not hasattr(request, '_api_resource'):
+        ledger = _ledger(ledger_slug)
+        fields = _fields(request, ledger)
+        row = _scope(request, ledger).filter(pk=pk).values(*_lookups(ledger, fields)).first()
+        if row is None:
+            raise ApiError("Invoice not found.", status=404)
+        request._api_resource = (ledger, fields, row)
+    return request._api_resource
+
+
+def _list_etag(request, ledger):
+    ledger, fields, page = _load_list(request, ledger)
+    rows = ((row['pk'], _version(ledger, row)) for row in page.object_list)
+    return _etag(ledger, ','.join(fields), page.next_cursor, page.prev_cursor, *rows)
+
+
+def _detail_etag(request, ledger, pk):
+    ledger, fields, row = _load_detail(request, ledger, pk)
+    return _etag(ledger, row['pk'], _version(ledger, row), ','.join(fields))
+
+
+def _detail_last_modified(request, ledger, pk):
+    ledger, _, row = _load_detail(request, ledger, pk)
+    return max(row['updated_at'], row[_party_updated_at(ledger)])
+
+
+# === VIEWS ===
+@require_GET
+@api_view
+@condition(etag_func=_list_etag)
+def invoice_list_api(request, ledger):
+    """
+    GET /finance/api/<ar|ap>/invoices/?fields=...&status=...&after=...&before=...&page_size=...
+
+    ETag only: no Last-Modified, since a row deleted from the page or leaving
+    the filter changes the list without raising any updated_at.
+    """
+    ledger, fields, page = _load_list(request, ledger)
+    return JsonResponse({
+        'results': [_serialize(ledger, fields, row) for row in page.object_list],
+        'next': page.next_cursor,
+        'previous': page.prev_cursor,
+    }, encoder=DjangoJSONEncoder)
+
+
+@require_GET
+@api_view
+@condition(etag_func=_detail_etag, last_modified_func=_detail_last_modified)
+def invoice_detail_api(request, ledger, pk):
+    """GET /finance/api/<ar|ap>/invoices/<pk>/?fields=..."""
+    ledger, fields, row = _load_detail(request, ledger, pk)
+    return JsonResponse(_serialize(ledger, fields, row), encoder=DjangoJSONEncoder)
+
+
+@require_GET
+@api_view
+def cash_flow_forecast_api(request):
+    """GET /finance/api/forecast/ (staff only): the 13-week cash-flow projection."""
+    if not request.user.is_staff:
+        raise ApiError("Staff only.", status=403)
+    return JsonResponse(forecast.build_forecast().as_dict())
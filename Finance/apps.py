@@ -4,3 +4,12 @@ from django.apps import AppConfig
 class FinanceConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'Finance'
+
+    def ready(self):
+        import Finance.signals
+
+        from django.conf import settings
+        interval = getattr(settings, 'FINANCE_OVERDUE_SWEEP_INTERVAL', None)
+        if interval:
+            from Finance.sweeper import start_scheduler
+            start_scheduler(interval)
@@ -0,0 +1,98 @@
+from asgiref.sync import sync_to_async
+from django.contrib import messages
+from django.contrib.auth.decorators import login_required
+from django.http import Http404
+from django.shortcuts import redirect, render
+
+from . import snapshots
+from .models import CustomerInvoice, VendorInvoice
+from .pagination import apaginate_request
+from .views import INVOICE_TYPES
+
+# Async twins of the read-heavy invoice views, for deployments served through
+# BillingLanguage/asgi.py. Every query goes through the async ORM, so a slow
+# page no longer pins a worker thread while it waits on the database. Same
+# templates and same rules as the sync views in views.py.
+
+
+# === UTILITIES ===
+async def current_user(request):
+    """
+    Loads the user with the async auth API and pins it on the request, so the
+    templates and context processors don't trigger a sync lookup later.
+    """
+    user = await request.auser()
+    request.user = user
+    return user
+
+
+async def render_async(request, template_name, context):
+    # Template rendering is sync code (context processors read the session);
+    # all the ORM work is done before this point.
+    return await sync_to_async(render)(request, template_name, context)
+
+
+# === INVOICE LISTS ===
+@login_required
+async def invoice_list(request):
+    user = await current_user(request)
+    if user.is_staff:
+        invoices = CustomerInvoice.objects.filter(status='OUTSTANDING')
+    elif user.user_type == 'C':
+        if user.customer_profile_id:
+            invoices = CustomerInvoice.objects.filter(customer_id=user.customer_profile_id)
+        else:
+            invoices = CustomerInvoice.objects.none()
+            messages.warning(request, "Customer profile not found.")
+    else:
+        invoices = CustomerInvoice.objects.none()
+
+    page = await apaginate_request(request, invoices.select_related('customer'))
+    return await render_async(request, "Finance/invoice_list.html", {'invoices': page, 'page': page, 'page_title': 'Outstanding AR Invoices'})
+
+
+@login_required
+async def vendor_payment_list(request):
+    user = await current_user(request)
+    if user.is_staff:
+        invoices = VendorInvoice.objects.filter(status='OUTSTANDING')
+    elif user.user_type == 'V':
+        if user.vendor_profile_id:
+            invoices = VendorInvoice.objects.filter(vendor_id=user.vendor_profile_id)
+        else:
+            invoices = VendorInvoice.objects.none()
+            messages.warning(request, "Vendor profile not found.")
+    else:
+        invoices = VendorInvoice.objects.none()
+
+    page = await apaginate_request(request, invoices.select_related('vendor'))
+    return await render_async(request, "Finance/vendor_invoice_list.html", {'invoices': page, 'page': page, 'page_title': 'Pending AP Payments'})
+
+
+# === INVOICE DETAIL ===
+@login_required
+async def invoice_detail(request, pk, invoice_type):
+    model = INVOICE_TYPES.get(invoice_type)
+    if model is None:
+        raise Http404("Invoice does not exist.")
+
+    user = await current_user(request)
+    try:
+        invoice = await model.objects.select_related(invoice_type).aget(pk=pk)
+    except model.DoesNotExist:
+        raise Http404(f"No {model._meta.object_name} matches the given query.")
+
+    owner_profile_id = getattr(user, invoice_type + '_profile_id', None)
+    is_owner = owner_profile_id is not None and owner_profile_id == getattr(invoice, invoice_type + '_id')
+    if not (user.is_staff or is_owner):
+        messages.error(request, "You are not authorized to view this invoice.")
+        return redirect('profile')
+
+    context = {
+        'invoice': invoice,
+        'invoice_type': invoice_type,
+        'document': await sync_to_async(snapshots.get_document)(invoice, invoice_type),
+        'page_title': f"Invoice Detail: {invoice.invoice_number}",
+        'can_edit': True,
+    }
+    return await render_async(request, "Finance/invoice_detail.html", context)
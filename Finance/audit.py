@@ -0,0 +1,218 @@
+import json
+from contextvars import ContextVar
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction, sync_to_async
+from django.conf import settings
+from django.db import connections, transaction
+from django.db.models import DateTimeField, IntegerField, TextField, Value
+from django.db.models.functions import Cast, Coalesce, Substr
+from django.utils import timezone
+
+from .models import AuditLogEntry
+
+# Field-level change log of the Finance models. The save/delete hooks in
+# Finance.signals build the entries; they join the current request's buffer
+# once their transaction commits (rolled back changes are never logged) and
+# AuditMiddleware writes the whole buffer with one bulk_create when the
+# response is ready. Outside a request (commands, shell) each commit writes
+# its own entries. Bulk updates (rollups.update_queryset) write theirs in the
+# database with one INSERT ... SELECT per field, inside their transaction.
+
+# Bookkeeping fields, not worth an entry
+IGNORED_FIELDS = {'id', 'created_at', 'updated_at'}
+
+_buffer = ContextVar('finance_audit_buffer', default=None)
+_request = ContextVar('finance_audit_request', default=None)
+
+
+def enabled():
+    return getattr(settings, 'FINANCE_AUDIT_LOG', True)
+
+
+def audited_fields(model):
+    return [f.attname for f in model._meta.concrete_fields if f.attname not in IGNORED_FIELDS]
+
+
+def _text(value):
+    return None if value is None else str(value)
+
+
+def _current_user_id():
+    user = getattr(_request.get(), 'user', None)
+    return user.pk if user is not None and user.is_authenticated else None
+
+
+# === BUILDING ENTRIES ===
+def _entry(instance, action, changed_at, user_id, field='', old=None, new=None):
+    return AuditLogEntry(
+        model=instance._meta.model_name,
+        object_id=instance.pk,
+        object_repr=_object_repr(instance)[:200],
+        action=action,
+        field=field,
+        old_value=old,
+        new_value=new,
+        user_id=user_id,
+        changed_at=changed_at,
+    )
+
+
+def _object_repr(instance):
+    return getattr(instance, 'invoice_number', None) or getattr(instance, 'name', None) or str(instance.pk)
+
+
+def _row_json(values):
+    return json.dumps({name: _text(value) for name, value in values.items()}, sort_keys=True)
+
+
+def changes(instance, stored):
+    """(field, old, new) of every audited field that differs from ``stored`` (a values() row)."""
+    result = []
+    for name in audited_fields(type(instance)):
+        old, new = _text(stored.get(name)), _text(getattr(instance, name))
+        if name in stored and old != new:
+            result.append((name, old, new))
+    return result
+
+
+def entries_for_save(instance, stored, created):
+    if not enabled():
+        return []
+    now, user_id = timezone.now(), _current_user_id()
+    if created or stored is None:
+        values = {name: getattr(instance, name) for name in audited_fields(type(instance))}
+        return [_entry(instance, 'create', now, user_id, new=_row_json(values))]
+    return [_entry(instance, 'update', now, user_id, name, old, new) for name, old, new in changes(instance, stored)]
+
+
+def entries_for_delete(instance):
+    if not enabled():
+        return []
+    values = {name: getattr(instance, name) for name in audited_fields(type(instance))}
+    return [_entry(instance, 'delete', timezone.now(), _current_user_id(), old=_row_json(values))]
+
+
+def record_bulk_update(queryset, changed):
+    """
+    Entries for a queryset.update() of ``changed`` fields, one per row and
+    field that actually changes, written with a single INSERT ... SELECT
+    from the queryset: the rows never come into Python. Must run inside the
+    transaction, before the UPDATE (it reads the old values); a rollback
+    takes the entries with it.
+    """
+    if not enabled():
+        return 0
+    model = queryset.model
+    fields = [name for name in changed if name not in IGNORED_FIELDS]
+    repr_field = 'invoice_number' if hasattr(model, 'invoice_number') else 'name'
+    now, user_id = timezone.now(), _current_user_id()
+    columns = ['model', 'object_id', 'object_repr', 'action', 'field', 'old_value', 'new_value', 'user', 'changed_at']
+    connection = connections[queryset.db]
+    table = connection.ops.quote_name(AuditLogEntry._meta.db_table)
+    column_sql = ', '.join(connection.ops.quote_name(AuditLogEntry._meta.get_field(c).column) for c in columns)
+
+    written = 0
+    with connection.cursor() as cursor:
+        for name in fields:
+            new = changed[name]
+            # exclude() keeps the NULLs when ``new`` isn't NULL
+            rows = queryset.order_by().exclude(**{name: new})
+            select = rows.values_list(
+                Value(model._meta.model_name), 'pk', Coalesce(Substr(repr_field, 1, 200), Cast('pk', TextField()), output_field=TextField()),
+                Value('update'), Value(name),
+                Cast(name, TextField()), Value(_text(new), output_field=TextField()),
+                Value(user_id, output_field=IntegerField()), Value(now, output_field=DateTimeField()),
+            )
+            sql, params = select.query.get_compiler(queryset.db).as_sql()
+            cursor.execute(f"INSERT INTO {table} ({column_sql}) {sql}", params)
+            written += cursor.rowcount
+    return written
+
+
+def lock(queryset):
+    """
+    Locks the rows of a bulk update until the transaction ends, on backends
+    with SELECT ... FOR UPDATE, reading only their ids in chunks. (SQLite
+    takes the write lock when the transaction begins: transaction_mode
+    IMMEDIATE.)
+    """
+    if connections[queryset.db].features.has_select_for_update:
+        for _ in queryset.select_for_update().order_by().values_list('pk', flat=True).iterator(chunk_size=2000):
+            pass
+
+
+# === BUFFERING ===
+def record(entries):
+    """Queues ``entries`` to be written after the current transaction commits."""
+    if entries:
+        transaction.on_commit(lambda: _enqueue(entries))
+
+
+def _enqueue(entries):
+    buffer = _buffer.get()
+    if buffer is None:
+        flush(entries)
+    else:
+        buffer.extend(entries)
+
+
+def flush(entries):
+    if entries:
+        AuditLogEntry.objects.bulk_create(entries, batch_size=500)
+
+
+class AuditMiddleware:
+    """
+    Collects the request's audit entries and writes them with one
+    bulk_create. Async capable, so it doesn't push the async views
+    (Finance.async_views) back onto a thread.
+    """
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        if iscoroutinefunction(get_response):
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        buffer = []
+        buffer_token, request_token = _buffer.set(buffer), _request.set(request)
+        try:
+            return self.get_response(request)
+        finally:
+            _buffer.reset(buffer_token)
+            _request.reset(request_token)
+            flush(buffer)
+
+    async def __acall__(self, request):
+        buffer = []
+        buffer_token, request_token = _buffer.set(buffer), _request.set(request)
+        try:
+            return await self.get_response(request)
+        finally:
+            _buffer.reset(buffer_token)
+            _request.reset(request_token)
+            if buffer:
+                await sync_to_async(flush)(buffer)
+
+
+# === READ HELPERS ===
+def history(instance):
+    """Entries of one invoice or party, newest first (audit_object_time_idx)."""
+    return (
+        AuditLogEntry.objects
+        .filter(model=instance._meta.model_name, object_id=instance.pk)
+        .select_related('user')
+        .order_by('-changed_at', '-pk')
+    )
+
+
+def between(start, end, model=None):
+    """Entries with start <= changed_at < end, optionally of one model (audit_time_idx)."""
+    entries = AuditLogEntry.objects.filter(changed_at__gte=start, changed_at__lt=end)
+    if model is not None:
+        entries = entries.filter(model=model._meta.model_name)
+    return entries.order_by('changed_at', 'pk')
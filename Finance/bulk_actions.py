@@ -0,0 +1,48 @@
+from datetime import date
+
+from django.db import transaction
+from django.utils import timezone
+
+from . import rollups
+from .aging import LEDGERS
+from .signals import invoices_bulk_updated
+
+# action -> (new status, ledgers it applies to, sets payment_date, open invoices only)
+ACTIONS = {
+    'mark_paid': ('PAID', ('AR', 'AP'), True, False),
+    'mark_processed': ('PROCESSED', ('AP',), False, False),
+    # Paid or processed invoices never go back to overdue
+    'mark_overdue': ('OVERDUE', ('AR', 'AP'), False, True),
+}
+
+
+def apply_action(ledger, queryset_or_pks, action, payment_date=None):
+    """
+    Runs a bulk status action as one UPDATE on the ledger's table inside a
+    transaction and returns the number of rows changed. Accepts a queryset
+    (admin actions) or a list of pks (Finance views).
+    """
+    status, ledgers, sets_payment_date, open_only = ACTIONS[action]
+    if ledger not in ledgers:
+        raise ValueError(f"{action} does not apply to {ledger} invoices.")
+
+    conf = LEDGERS[ledger]
+    if isinstance(queryset_or_pks, (list, tuple, set)):
+        invoices = conf['model'].objects.filter(pk__in=queryset_or_pks)
+    else:
+        invoices = queryset_or_pks
+    invoices = invoices.exclude(status=status)
+    if open_only:
+        invoices = invoices.filter(status__in=conf['open_statuses'])
+
+    changes = {'status': status, 'updated_at': timezone.now()}
+    if sets_payment_date:
+        changes['payment_date'] = payment_date or date.today()
+
+    with transaction.atomic():
+        party_ids = set(invoices.values_list(conf['party'] + '_id', flat=True).distinct())
+        updated = rollups.update_queryset(ledger, invoices, **changes)
+
+    if updated:
+        invoices_bulk_updated.send(sender=conf['model'], party_ids=party_ids, changes=changes)
+    return updated
@@ -0,0 +1,40 @@
+import time
+
+from django.core.cache import cache
+
+DASHBOARD_TIMEOUT = 300
+
+
+# === VERSIONED KEYS ===
+# Every ledger has one version for the whole table ("all", used by the
+# superuser views) and one per customer/vendor. Cached entries embed the
+# version in their key, so bumping a version makes them unreachable and the
+# cache evicts them on its own.
+def _version_key(ledger, party_id=None):
+    return f"finance:invoices:v:{ledger}:{party_id or 'all'}"
+
+
+def get_version(ledger, party_id=None):
+    key = _version_key(ledger, party_id)
+    version = cache.get(key)
+    if version is None:
+        # Start from the clock rather than 1: if the version was evicted, old
+        # entries must not become valid again.
+        cache.add(key, time.time_ns(), None)
+        version = cache.get(key)
+    return version
+
+
+def bump(ledger, party_ids):
+    """Invalidates the ledger-wide entries and those of every party in ``party_ids``."""
+    keys = [_version_key(ledger)] + [_version_key(ledger, pid) for pid in party_ids if pid]
+    for key in keys:
+        try:
+            cache.incr(key)
+        except ValueError:
+            # Never read yet: the next get_version() starts a fresh one
+            pass
+
+
+def dashboard_key(user_pk, ledger, status, version):
+    return f"finance:dashboard:{user_pk}:{ledger}:{status or 'ALL'}:{version}"
@@ -0,0 +1,93 @@
+import csv
+import zlib
+from datetime import date
+
+from .aging import LEDGERS
+
+CHUNK_SIZE = 2000
+
+# Per ledger: (header, lookup) pairs; party columns come from the same JOIN.
+COLUMNS = {
+    'AR': [
+        ('invoice_number', 'invoice_number'),
+        ('customer', 'customer__name'),
+        ('customer_email', 'customer__email'),
+        ('company_code', 'customer__company_code'),
+        ('date_issued', 'date_issued'),
+        ('due_date', 'due_date'),
+        ('amount', 'amount'),
+        ('status', 'status'),
+        ('payment_date', 'payment_date'),
+        ('notes', 'notes'),
+    ],
+    'AP': [
+        ('invoice_number', 'invoice_number'),
+        ('vendor', 'vendor__name'),
+        ('vendor_email', 'vendor__email'),
+        ('company_code', 'vendor__company_code'),
+        ('date_issued', 'date_issued'),
+        ('due_date', 'due_date'),
+        ('amount', 'amount'),
+        ('status', 'status'),
+        ('payment_date', 'payment_date'),
+        ('payment_method', 'payment_method'),
+        ('notes', 'notes'),
+    ],
+}
+
+
+class Echo:
+    """File-like object whose write() just hands the line back to csv.writer."""
+    def write(self, value):
+        return value
+
+
+def parse_date(value, label):
+    if not value:
+        return None
+    try:
+        return date.fromisoformat(value)
+    except ValueError:
+        raise ValueError(f"{label} must be a date in YYYY-MM-DD format.")
+
+
+def export_queryset(ledger, status=None, date_from=None, date_to=None, company_code=None):
+    """Flat rows for the ledger, oldest first, with the party columns joined in."""
+    conf = LEDGERS[ledger]
+    party = conf['party']
+    qs = conf['model'].objects.all()
+    if status:
+        qs = qs.filter(status=status.upper())
+    if date_from:
+        qs = qs.filter(date_issued__gte=date_from)
+    if date_to:
+        qs = qs.filter(date_issued__lte=date_to)
+    if company_code:
+        qs = qs.filter(**{party + '__company_code': company_code.upper()})
+    lookups = [lookup for _, lookup in COLUMNS[ledger]]
+    return qs.order_by('date_issued', 'pk').values_list(*lookups)
+
+
+def csv_lines(ledger, queryset):
+    """Yields the header and then one CSV line per row, reading CHUNK_SIZE rows at a time."""
+    writer = csv.writer(Echo())
+    yield writer.writerow([header for header, _ in COLUMNS[ledger]])
+    for row in queryset.iterator(chunk_size=CHUNK_SIZE):
+        yield writer.writerow(row)
+
+
+def gzip_chunks(lines, flush_every=256 * 1024):
+    """Compresses a stream of text lines into gzip chunks of roughly ``flush_every`` bytes."""
+    compressor = zlib.compressobj(6, zlib.DEFLATED, 16 + zlib.MAX_WBITS)
+    buffered = []
+    size = 0
+    for line in lines:
+        data = line.encode('utf-8')
+        buffered.append(data)
+        size += len(data)
+        if size >= flush_every:
+            chunk = compressor.compress(b''.join(buffered))
+            buffered, size = [], 0
+            if chunk:
+                yield chunk
+    yield compressor.compress(b''.join(buffered)) + compressor.flush()
@@ -0,0 +1,181 @@
+from dataclasses import dataclass, field
+from datetime import date, timedelta
+
+import numpy as np
+from django.core.cache import cache
+from django.db import connection
+from django.db.models import F, FloatField, Func, Value
+from django.db.models.functions import Cast, Extract
+
+from .aging import LEDGERS
+
+WEEKS = 13
+
+# Historical lags outside this window (days) are treated as data errors
+LAG_CLIP = (-60, 180)
+
+# Payment habits change slowly: the per-party lags are recomputed at most
+# once an hour, only the open invoices are read on every forecast.
+LAG_CACHE_TIMEOUT = 3600
+
+
+@dataclass
+class ForecastWeek:
+    start: date
+    end: date
+    receipts: float = 0.0
+    payments: float = 0.0
+    net: float = 0.0
+    balance: float = 0.0  # cumulative net from the first week
+
+
+@dataclass
+class Forecast:
+    as_of: date
+    weeks: list = field(default_factory=list)
+    beyond_receipts: float = 0.0  # expected after the 13th week
+    beyond_payments: float = 0.0
+    open_counts: dict = field(default_factory=dict)
+    default_lags: dict = field(default_factory=dict)  # lag of parties without history, per ledger
+
+    def as_dict(self):
+        return {
+            'as_of': self.as_of.isoformat(),
+            'weeks': [
+                {
+                    'start': w.start.isoformat(),
+                    'end': w.end.isoformat(),
+                    'receipts': round(w.receipts, 2),
+                    'payments': round(w.payments, 2),
+                    'net': round(w.net, 2),
+                    'balance': round(w.balance, 2),
+                }
+                for w in self.weeks
+            ],
+            'beyond': {'receipts': round(self.beyond_receipts, 2), 'payments': round(self.beyond_payments, 2)},
+            'open_invoices': self.open_counts,
+            'default_lag_days': {k: round(v, 1) for k, v in self.default_lags.items()},
+        }
+
+
+# === COLUMN LOADING ===
+# Dates come back as day numbers and amounts as floats straight from the
+# database: no date/Decimal objects are built per row, and the rows go into
+# numpy arrays in one call.
+def _day_number(field_name):
+    """Days since 1970-01-01 as a float column."""
+    if connection.vendor == 'sqlite':
+        return Func(F(field_name), function='julianday', output_field=FloatField()) - Value(2440587.5)
+    return Extract(field_name, 'epoch', output_field=FloatField()) / Value(86400.0)
+
+
+def _columns(queryset, *expressions):
+    """
+    values_list() of numeric expressions as a 2-D float array (rows x
+    columns). The compiled query is run with one fetchall(): the columns need
+    no converters, and skipping the ORM's row-by-row iteration is a third of
+    the load time on a large ledger.
+    """
+    names = [f'c{i}' for i in range(len(expressions))]
+    sql, params = queryset.annotate(**dict(zip(names, expressions))).values_list(*names).query.sql_with_params()
+    with connection.cursor() as cursor:
+        cursor.execute(sql, params)
+        array = np.array(cursor.fetchall(), dtype=np.float64)
+    return array.reshape(-1, len(expressions))
+
+
+def _load_history(ledger):
+    """(party_id, lag in days) of every paid invoice with a payment_date."""
+    conf = LEDGERS[ledger]
+    qs = conf['model'].objects.filter(status='PAID', payment_date__isnull=False)
+    return _columns(qs, F(conf['party'] + '_id'), _day_number('payment_date') - _day_number('due_date'))
+
+
+def _load_open(ledger):
+    """(party_id, due day number, amount) of every open invoice."""
+    conf = LEDGERS[ledger]
+    qs = conf['model'].objects.filter(status__in=conf['open_statuses'])
+    return _columns(qs, F(conf['party'] + '_id'), _day_number('due_date'), Cast('amount', FloatField()))
+
+
+# === COMPUTATION ===
+def party_lags(history):
+    """
+    Mean payment lag per party id as an array indexed by party id, plus the
+    overall mean used for parties without history (NaN in the array).
+    """
+    if not len(history):
+        return np.full(0, np.nan), 0.0
+    parties = history[:, 0].astype(np.int64)
+    lags = np.clip(history[:, 1], *LAG_CLIP)
+    counts = np.bincount(parties)
+    sums = np.bincount(parties, weights=lags)
+    with np.errstate(invalid='ignore', divide='ignore'):
+        means = sums / counts  # NaN where a party has no paid invoices
+    return means, float(lags.mean())
+
+
+def cached_party_lags(ledger, refresh=False):
+    key = f"finance:forecast:lags:{ledger}"
+    lags = None if refresh else cache.get(key)
+    if lags is None:
+        lags = party_lags(_load_history(ledger))
+        cache.set(key, lags, LAG_CACHE_TIMEOUT)
+    return lags
+
+
+def weekly_totals(open_rows, lags, default_lag, today_day, weeks=WEEKS):
+    """
+    Expected cash per week: every open invoice lands on due_date + its party's
+    lag; anything expected before today falls in the first week. Returns
+    (per-week sums, total after the horizon).
+    """
+    if not len(open_rows):
+        return np.zeros(weeks), 0.0
+    parties = open_rows[:, 0].astype(np.int64)
+    lag = np.full(len(parties), default_lag)
+    known = parties < len(lags)
+    lag[known] = lags[parties[known]]
+    lag = np.where(np.isnan(lag), default_lag, lag)
+
+    expected = open_rows[:, 1] + np.rint(lag)
+    week = np.floor_divide(np.maximum(expected - today_day, 0), 7).astype(np.int64)
+    amounts = open_rows[:, 2]
+    inside = week < weeks
+    per_week = np.bincount(week[inside], weights=amounts[inside], minlength=weeks)
+    return per_week, float(amounts[~inside].sum())
+
+
+def build_forecast(as_of=None, weeks=WEEKS, refresh_lags=False):
+    """13-week projection: AR receipts in, AP payments out, and the running balance."""
+    as_of = as_of or date.today()
+    today_day = (as_of - date(1970, 1, 1)).days
+
+    totals, beyond, counts, default_lags = {}, {}, {}, {}
+    for ledger in ('AR', 'AP'):
+        lags, default_lag = cached_party_lags(ledger, refresh=refresh_lags)
+        open_rows = _load_open(ledger)
+        totals[ledger], beyond[ledger] = weekly_totals(open_rows, lags, default_lag, today_day, weeks)
+        counts[ledger] = len(open_rows)
+        default_lags[ledger] = default_lag
+
+    net = totals['AR'] - totals['AP']
+    balance = np.cumsum(net)
+    result = Forecast(
+        as_of=as_of,
+        beyond_receipts=beyond['AR'],
+        beyond_payments=beyond['AP'],
+        open_counts=counts,
+        default_lags=default_lags,
+    )
+    for i in range(weeks):
+        start = as_of + timedelta(weeks=i)
+        result.weeks.append(ForecastWeek(
+            start=start,
+            end=start + timedelta(days=6),
+            receipts=float(totals['AR'][i]),
+            payments=float(totals['AP'][i]),
+            net=float(net[i]),
+            balance=float(balance[i]),
+        ))
+    return result
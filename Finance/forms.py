@@ -1,6 +1,41 @@
+from datetime import date
+
 from django import forms
+from django.urls import reverse
+
+from . import numbering
 from .models import CustomerInvoice, VendorInvoice, Customer, Vendor
 
+
+# ===============================
+# PARTY AUTOCOMPLETE WIDGET
+# ===============================
+class PartyAutocompleteWidget(forms.Widget):
+    """
+    Text box backed by the party_autocomplete endpoint. Only the selected pk
+    is posted (hidden input), so rendering never iterates the choices and
+    validating is a single pk lookup by the ModelChoiceField.
+    """
+    template_name = 'Finance/widgets/party_autocomplete.html'
+
+    def __init__(self, kind, attrs=None):
+        self.kind = kind
+        super().__init__(attrs)
+
+    def get_context(self, name, value, attrs):
+        context = super().get_context(name, value, attrs)
+        model = Customer if self.kind == 'customer' else Vendor
+        label = ''
+        if value not in (None, ''):
+            party = model.objects.filter(pk=value).values('name', 'email').first()
+            if party:
+                label = f"{party['name']} ({party['email']})"
+        context['widget'].update({
+            'label': label,
+            'url': reverse('party_autocomplete', kwargs={'kind': self.kind}),
+        })
+        return context
+
 # ===============================
 # CUSTOMER INVOICE FORM
 # ===============================
@@ -16,6 +51,14 @@ class CustomerInvoiceForm(forms.ModelForm):
             self.fields['customer'].queryset = Customer.objects.filter(pk=user.customer_profile.pk)
             self.fields['customer'].disabled = False
             self.fields['customer'].initial = user.customer_profile
+        else:
+            # Staff elige entre todos los customers: autocomplete en vez de un <select> con la tabla entera
+            self.fields['customer'].widget = PartyAutocompleteWidget('customer')
+
+        # Al crear, el número es opcional: vacío se asigna automáticamente (Finance.numbering)
+        if not self.instance.pk:
+            self.fields['invoice_number'].required = False
+            self.fields['invoice_number'].widget.attrs['placeholder'] = 'Leave blank to assign the next number'
 
         # Seguridad: bloquear el status si no es staff
         if 'status' in self.fields and user and not user.is_staff:
@@ -35,6 +78,13 @@ class CustomerInvoiceForm(forms.ModelForm):
             'due_date': forms.DateInput(attrs={'type': 'date'}),
         }
 
+    def clean_invoice_number(self):
+        """Los números AR-<company>-NNNNNN los asigna Finance.numbering"""
+        number = self.cleaned_data.get('invoice_number')
+        if number and number != self.instance.invoice_number and numbering.is_reserved('AR', number):
+            raise forms.ValidationError(numbering.reserved_number_error('AR'))
+        return number
+
     def clean_customer(self):
         """Asegura que siempre se retenga el customer correcto"""
         if self.instance and 'customer' in self.fields and not self.fields['customer'].disabled:
@@ -64,8 +114,13 @@ class VendorInvoiceForm(forms.ModelForm):
             self.fields['vendor'].disabled = False
             self.fields['vendor'].initial = user.vendor_profile
         else:
-            # Staff puede ver todos los vendors
-            self.fields['vendor'].queryset = Vendor.objects.all()
+            # Staff puede ver todos los vendors: autocomplete en vez de un <select> con la tabla entera
+            self.fields['vendor'].widget = PartyAutocompleteWidget('vendor')
+
+        # Al crear, el número es opcional: vacío se asigna automáticamente (Finance.numbering)
+        if not self.instance.pk:
+            self.fields['invoice_number'].required = False
+            self.fields['invoice_number'].widget.attrs['placeholder'] = 'Leave blank to assign the next number'
 
         # Seguridad: bloquear el status si no es staff
         if 'status' in self.fields and user and not user.is_staff:
@@ -85,6 +140,13 @@ class VendorInvoiceForm(forms.ModelForm):
             'due_date': forms.DateInput(attrs={'type': 'date'}),
         }
 
+    def clean_invoice_number(self):
+        """Los números AP-<company>-NNNNNN los asigna Finance.numbering"""
+        number = self.cleaned_data.get('invoice_number')
+        if number and number != self.instance.invoice_number and numbering.is_reserved('AP', number):
+            raise forms.ValidationError(numbering.reserved_number_error('AP'))
+        return number
+
     def clean_vendor(self):
         """Asegura que siempre haya un vendor seleccionado"""
         vendor = self.cleaned_data.get('vendor')
@@ -97,3 +159,11 @@ class VendorInvoiceForm(forms.ModelForm):
         if self.instance and 'status' in self.fields and self.fields['status'].disabled:
             return self.instance.status
         return self.cleaned_data.get('status')
+
+
+# ===============================
+# BULK MARK PAID (ADMIN)
+# ===============================
+class PaymentDateForm(forms.Form):
+    """Fecha de pago del paso intermedio de la acción 'mark paid' del admin"""
+    payment_date = forms.DateField(initial=date.today, widget=forms.DateInput(attrs={'type': 'date'}))
@@ -0,0 +1,60 @@
+import time
+from datetime import date
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db.models import Max, Min
+
+from Finance import rollups
+from Finance.aging import LEDGERS
+
+
+def _month(value, name):
+    try:
+        return rollups.month_start(date.fromisoformat(value + '-01'))
+    except ValueError:
+        raise CommandError(f"--{name} must be a month in YYYY-MM format.")
+
+
+class Command(BaseCommand):
+    help = (
+        "Rebuilds the daily/monthly revenue and spend rollups from the invoice tables, "
+        "a few months per transaction. Run once after deploying, or over a range to repair it."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--ledger', choices=['AR', 'AP'], help="Only rebuild one ledger.")
+        parser.add_argument('--from', dest='start', help="First month (YYYY-MM). Default: first invoice.")
+        parser.add_argument('--to', dest='end', help="Last month (YYYY-MM), included. Default: last invoice.")
+        parser.add_argument('--chunk-months', type=int, default=3, help="Months rebuilt per transaction (default 3).")
+
+    def handle(self, *args, **options):
+        if options['chunk_months'] < 1:
+            raise CommandError("--chunk-months must be at least 1.")
+
+        ledgers = [options['ledger']] if options['ledger'] else list(LEDGERS)
+        for ledger in ledgers:
+            bounds = LEDGERS[ledger]['model'].objects.aggregate(first=Min('date_issued'), last=Max('date_issued'))
+            if bounds['first'] is None and not (options['start'] and options['end']):
+                self.stdout.write(f"{ledger}: no invoices.")
+                continue
+            start = _month(options['start'], 'from') if options['start'] else rollups.month_start(bounds['first'])
+            last = _month(options['end'], 'to') if options['end'] else rollups.month_start(bounds['last'])
+            if last < start:
+                raise CommandError("--to is before --from.")
+
+            started = time.perf_counter()
+            daily = monthly = 0
+            while start <= last:
+                end = start
+                for _ in range(options['chunk_months']):
+                    end = rollups.next_month(end)
+                end = min(end, rollups.next_month(last))
+                written = rollups.rebuild(ledger, start, end)
+                daily += written[0]
+                monthly += written[1]
+                self.stdout.write(f"{ledger}: {start:%Y-%m} .. {end:%Y-%m} (excl.) -> {written[0]} daily, {written[1]} monthly rows")
+                start = end
+
+            self.stdout.write(self.style.SUCCESS(
+                f"{ledger}: {daily} daily and {monthly} monthly rollup rows in {time.perf_counter() - started:.2f}s."
+            ))
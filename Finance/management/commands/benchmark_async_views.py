@@ -0,0 +1,180 @@
+import importlib.util
+import os
+import statistics
+import subprocess
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor
+from importlib import import_module
+from urllib.error import HTTPError, URLError
+from urllib.request import Request, urlopen
+
+from django.conf import settings
+from django.contrib.auth import BACKEND_SESSION_KEY, HASH_SESSION_KEY, SESSION_KEY, get_user_model
+from django.core.management.base import BaseCommand, CommandError
+from django.urls import reverse
+
+# (sync url name, async url name, kwargs). Detail pages are added when a pk is given.
+LIST_VIEWS = [
+    ('invoice_list', 'invoice_list_async', {}),
+    ('vendor_payment_list', 'vendor_payment_list_async', {}),
+    ('conversation_list', 'conversation_list_async', {}),
+]
+
+WSGI_SERVERS = {
+    'runserver': lambda host, port, workers: [
+        sys.executable, str(settings.BASE_DIR / 'manage.py'), 'runserver', '--noreload', f'{host}:{port}',
+    ],
+    'gunicorn': lambda host, port, workers: [
+        sys.executable, '-m', 'gunicorn', 'BillingLanguage.wsgi:application',
+        '--bind', f'{host}:{port}', '--threads', str(workers),
+    ],
+}
+
+ASGI_SERVERS = {
+    'uvicorn': lambda host, port, workers: [
+        sys.executable, '-m', 'uvicorn', 'BillingLanguage.asgi:application',
+        '--host', host, '--port', str(port), '--log-level', 'warning',
+    ],
+    'daphne': lambda host, port, workers: [
+        sys.executable, '-m', 'daphne', '-b', host, '-p', str(port), 'BillingLanguage.asgi:application',
+    ],
+    'hypercorn': lambda host, port, workers: [
+        sys.executable, '-m', 'hypercorn', 'BillingLanguage.asgi:application', '--bind', f'{host}:{port}',
+    ],
+}
+
+
+def session_cookie(user):
+    """A logged-in session for ``user``, created directly in the session store."""
+    store = import_module(settings.SESSION_ENGINE).SessionStore()
+    store[SESSION_KEY] = str(user.pk)
+    store[BACKEND_SESSION_KEY] = settings.AUTHENTICATION_BACKENDS[0]
+    store[HASH_SESSION_KEY] = user.get_session_auth_hash()
+    store.create()
+    return f"{settings.SESSION_COOKIE_NAME}={store.session_key}"
+
+
+def fetch(url, cookie, timeout):
+    """(seconds, ok). A redirect (e.g. to the login page) counts as a failure."""
+    start = time.perf_counter()
+    try:
+        with urlopen(Request(url, headers={'Cookie': cookie}), timeout=timeout) as response:
+            response.read()
+            ok = response.status == 200 and response.geturl() == url
+    except (HTTPError, URLError, OSError):
+        ok = False
+    return time.perf_counter() - start, ok
+
+
+def run_load(url, cookie, total, concurrency, timeout):
+    """Fires ``total`` GETs with ``concurrency`` clients; returns the stats of the run."""
+    started = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=concurrency) as pool:
+        results = list(pool.map(lambda _: fetch(url, cookie, timeout), range(total)))
+    elapsed = time.perf_counter() - started
+
+    latencies = sorted(seconds for seconds, _ in results)
+    return {
+        'rps': total / elapsed if elapsed else 0.0,
+        'p50': statistics.median(latencies) * 1000,
+        'p95': latencies[min(len(latencies) - 1, int(len(latencies) * 0.95))] * 1000,
+        'errors': sum(1 for _, ok in results if not ok),
+    }
+
+
+class Server:
+    """A local server subprocess, started and stopped around one benchmark round."""
+
+    def __init__(self, name, argv, base_url, startup_timeout):
+        self.name = name
+        self.argv = argv
+        self.base_url = base_url
+        self.startup_timeout = startup_timeout
+        self.process = None
+
+    def __enter__(self):
+        self.process = subprocess.Popen(
+            self.argv, cwd=settings.BASE_DIR, env=os.environ.copy(),
+            stdout=subprocess.DEVNULL, stderr=subprocess.PIPE,
+        )
+        deadline = time.monotonic() + self.startup_timeout
+        while time.monotonic() < deadline:
+            if self.process.poll() is not None:
+                raise CommandError(f"{self.name} exited on startup:\n{self.process.stderr.read().decode()}")
+            try:
+                urlopen(self.base_url, timeout=1).close()
+                return self
+            except HTTPError:
+                return self  # any HTTP answer means it is listening
+            except (URLError, OSError):
+                time.sleep(0.2)
+        self.__exit__()
+        raise CommandError(f"Server did not start within {self.startup_timeout}s: {' '.join(self.argv)}")
+
+    def __exit__(self, *exc):
+        if self.process and self.process.poll() is None:
+            self.process.terminate()
+            try:
+                self.process.wait(timeout=10)
+            except subprocess.TimeoutExpired:
+                self.process.kill()
+
+
+class Command(BaseCommand):
+    help = (
+        "Compares concurrent throughput of the sync views served by a WSGI server "
+        "with their async versions served by an ASGI server, on a local port."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--username', required=True, help="User the requests are made as.")
+        parser.add_argument('--requests', type=int, default=500, help="Requests per view and server (default 500).")
+        parser.add_argument('--concurrency', type=int, default=20, help="Concurrent clients (default 20).")
+        parser.add_argument('--warmup', type=int, default=10, help="Unmeasured requests per view first.")
+        parser.add_argument('--wsgi-server', choices=sorted(WSGI_SERVERS), default='runserver')
+        parser.add_argument('--asgi-server', choices=sorted(ASGI_SERVERS), default='uvicorn')
+        parser.add_argument('--host', default='127.0.0.1')
+        parser.add_argument('--port', type=int, default=8765)
+        parser.add_argument('--invoice-pk', type=int, help="Also benchmark the AR invoice detail page of this invoice.")
+        parser.add_argument('--conversation-pk', type=int, help="Also benchmark this conversation's chat page.")
+        parser.add_argument('--timeout', type=float, default=30.0, help="Per-request timeout in seconds.")
+
+    def handle(self, *args, **options):
+        for server in (options['wsgi_server'], options['asgi_server']):
+            if server != 'runserver' and importlib.util.find_spec(server) is None:
+                raise CommandError(f"{server} is not installed (pip install {server}).")
+        try:
+            user = get_user_model().objects.get(username=options['username'])
+        except get_user_model().DoesNotExist:
+            raise CommandError(f"User {options['username']!r} does not exist.")
+        cookie = session_cookie(user)
+
+        views = list(LIST_VIEWS)
+        if options['invoice_pk']:
+            views.append(('customer_invoice_detail', 'customer_invoice_detail_async', {'pk': options['invoice_pk']}))
+        if options['conversation_pk']:
+            views.append(('conversation_detail', 'conversation_detail_async', {'pk': options['conversation_pk']}))
+
+        host, port = options['host'], options['port']
+        base_url = f"http://{host}:{port}"
+        rounds = [
+            ('WSGI', options['wsgi_server'], WSGI_SERVERS[options['wsgi_server']], 0),
+            ('ASGI', options['asgi_server'], ASGI_SERVERS[options['asgi_server']], 1),
+        ]
+
+        results = []
+        for interface, name, argv, url_index in rounds:
+            self.stdout.write(f"Starting {name} ({interface}) on {base_url} ...")
+            with Server(name, argv(host, port, options['concurrency']), base_url + '/', startup_timeout=30):
+                for view in views:
+                    url = base_url + reverse(view[url_index], kwargs=view[2])
+                    for _ in range(options['warmup']):
+                        fetch(url, cookie, options['timeout'])
+                    stats = run_load(url, cookie, options['requests'], options['concurrency'], options['timeout'])
+                    results.append((view[0], f"{interface}/{name}", stats))
+
+        self.stdout.write(f"\n{'view':<28} {'server':<16} {'req/s':>8} {'p50 ms':>8} {'p95 ms':>8} {'errors':>7}")
+        for view_name, server, stats in results:
+            line = f"{view_name:<28} {server:<16} {stats['rps']:>8.1f} {stats['p50']:>8.1f} {stats['p95']:>8.1f} {stats['errors']:>7}"
+            self.stdout.write(self.style.ERROR(line) if stats['errors'] else line)
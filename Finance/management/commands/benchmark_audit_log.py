@@ -0,0 +1,104 @@
+import statistics
+import time
+import uuid
+from datetime import date, timedelta
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from django.db.models import Q
+from django.test import Client
+from django.test.utils import CaptureQueriesContext, modify_settings, override_settings
+from django.urls import reverse
+
+from Finance.models import AuditLogEntry, Customer, CustomerInvoice
+
+# What each run changes on top of the default settings
+MODES = {
+    'off': lambda: override_settings(FINANCE_AUDIT_LOG=False),
+    # No request buffer: every save writes its own entries when it commits
+    'per-save': lambda: modify_settings(MIDDLEWARE={'remove': 'Finance.audit.AuditMiddleware'}),
+    'buffered': lambda: override_settings(),
+}
+
+
+class Command(BaseCommand):
+    help = (
+        "Measures the audit log's overhead on edit_customer_invoice: the same POSTs with the log "
+        "off, written per save and buffered per request. Works on a throwaway customer, invoice "
+        "and staff user, removed afterwards together with their audit entries."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--requests', type=int, default=200, help="Edit requests per mode (default 200).")
+        parser.add_argument('--modes', default=','.join(MODES), help="Comma-separated: off,per-save,buffered.")
+
+    def handle(self, *args, **options):
+        modes = [m.strip() for m in options['modes'].split(',') if m.strip()]
+        unknown = set(modes) - set(MODES)
+        if unknown:
+            raise CommandError(f"Unknown mode(s): {', '.join(sorted(unknown))}.")
+
+        tag = uuid.uuid4().hex[:12]
+        staff = get_user_model().objects.create_user(f"audit-bench-{tag}", password=uuid.uuid4().hex, is_staff=True)
+        customer = Customer.objects.create(name="Audit log benchmark", email=f"audit-{tag}@example.invalid", company_code='USPS')
+        invoice = CustomerInvoice.objects.create(
+            customer=customer, invoice_number=f"BENCH-{tag}",
+            date_issued=date.today(), due_date=date.today(), amount=100,
+        )
+        url = reverse('edit_customer_invoice', kwargs={'pk': invoice.pk})
+
+        try:
+            with override_settings(ALLOWED_HOSTS=[*settings.ALLOWED_HOSTS, 'testserver']):
+                client = Client()
+                client.force_login(staff)
+                client.post(url, self._data(invoice, customer, 0))  # warm-up: first-request imports, caches
+
+                self.stdout.write(f"{options['requests']} edit request(s) per mode, 4 fields changed per request\n")
+                self.stdout.write(f"{'mode':<10} {'mean ms':>8} {'p50 ms':>8} {'p95 ms':>8} {'queries':>8} {'entries':>8}")
+                baseline = None
+                for mode in modes:
+                    with MODES[mode]():
+                        timings, queries, entries = self._run(client, url, invoice, customer, options['requests'])
+                    mean = statistics.mean(timings) * 1000
+                    quantiles = statistics.quantiles(timings, n=20)
+                    line = (
+                        f"{mode:<10} {mean:>8.2f} {statistics.median(timings) * 1000:>8.2f} "
+                        f"{quantiles[18] * 1000:>8.2f} {queries:>8.1f} {entries:>8}"
+                    )
+                    if baseline is None:
+                        baseline = mean
+                    else:
+                        line += f"  ({mean - baseline:+.2f} ms vs {modes[0]})"
+                    self.stdout.write(line)
+        finally:
+            logged = Q(model='customerinvoice', object_id=invoice.pk) | Q(model='customer', object_id=customer.pk)
+            customer.delete()
+            staff.delete()
+            AuditLogEntry.objects.filter(logged).delete()
+
+    @staticmethod
+    def _data(invoice, customer, i):
+        return {
+            'invoice_number': invoice.invoice_number,
+            'customer': customer.pk,
+            'due_date': (date.today() + timedelta(days=i % 30)).isoformat(),
+            'amount': f"{100 + i}.00",
+            'notes': f"benchmark edit {i}",
+            'status': 'OVERDUE' if i % 2 else 'OUTSTANDING',
+        }
+
+    def _run(self, client, url, invoice, customer, count):
+        """(seconds per request, mean queries per request, audit entries written)."""
+        before = AuditLogEntry.objects.count()
+        timings, queries = [], 0
+        for i in range(1, count + 1):
+            with CaptureQueriesContext(connection) as captured:
+                started = time.perf_counter()
+                response = client.post(url, self._data(invoice, customer, i))
+                timings.append(time.perf_counter() - started)
+            if response.status_code != 302:
+                raise CommandError(f"Edit request failed with HTTP {response.status_code}.")
+            queries += len(captured)
+        return timings, queries / count, AuditLogEntry.objects.count() - before
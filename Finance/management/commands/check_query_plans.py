@@ -0,0 +1,89 @@
+from datetime import date
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from django.db.models import Q
+
+from Finance.models import CustomerInvoice, VendorInvoice
+
+# Placeholder values: SQLite picks the plan from the shape of the query,
+# not from the parameters, so any id/date works here.
+SAMPLE_PK = 1
+SAMPLE_DATE = date(2000, 1, 1)
+
+
+def _keyset(qs):
+    """Same shape as a non-first page of Finance.pagination.keyset_paginate."""
+    return qs.filter(
+        Q(date_issued__lt=SAMPLE_DATE) | Q(date_issued=SAMPLE_DATE, pk__lt=SAMPLE_PK)
+    ).order_by('-date_issued', '-pk')[:51]
+
+
+def view_querysets():
+    """(label, queryset) pairs mirroring the hot invoice queries of each view."""
+    return [
+        # Finance.views.invoice_list / vendor_payment_list
+        ('invoice_list (staff)', CustomerInvoice.objects.filter(status='OUTSTANDING').select_related('customer').order_by('-date_issued', '-pk')[:51]),
+        ('invoice_list (staff, next page)', _keyset(CustomerInvoice.objects.filter(status='OUTSTANDING').select_related('customer'))),
+        ('invoice_list (customer)', CustomerInvoice.objects.filter(customer_id=SAMPLE_PK).select_related('customer').order_by('-date_issued', '-pk')[:51]),
+        ('invoice_list (customer, next page)', _keyset(CustomerInvoice.objects.filter(customer_id=SAMPLE_PK).select_related('customer'))),
+        ('vendor_payment_list (staff)', VendorInvoice.objects.filter(status='OUTSTANDING').select_related('vendor').order_by('-date_issued', '-pk')[:51]),
+        ('vendor_payment_list (staff, next page)', _keyset(VendorInvoice.objects.filter(status='OUTSTANDING').select_related('vendor'))),
+        ('vendor_payment_list (vendor)', VendorInvoice.objects.filter(vendor_id=SAMPLE_PK).select_related('vendor').order_by('-date_issued', '-pk')[:51]),
+        ('vendor_payment_list (vendor, next page)', _keyset(VendorInvoice.objects.filter(vendor_id=SAMPLE_PK).select_related('vendor'))),
+        # accounts.views.profile_view
+        ('profile_view (superuser, AR status)', CustomerInvoice.objects.filter(status='PAID')),
+        ('profile_view (superuser, AP status)', VendorInvoice.objects.filter(status='PAID')),
+        ('profile_view (customer)', CustomerInvoice.objects.filter(customer_id=SAMPLE_PK)),
+        ('profile_view (customer, status)', CustomerInvoice.objects.filter(customer_id=SAMPLE_PK, status='PAID')),
+        ('profile_view (vendor)', VendorInvoice.objects.filter(vendor_id=SAMPLE_PK)),
+        ('profile_view (vendor, status)', VendorInvoice.objects.filter(vendor_id=SAMPLE_PK, status='PAID')),
+        # Finance.sweeper.sweep_overdue (same WHERE as its UPDATE)
+        ('sweep_overdue (AR)', CustomerInvoice.objects.filter(status='OUTSTANDING', due_date__lt=SAMPLE_DATE)),
+        ('sweep_overdue (AP)', VendorInvoice.objects.filter(status='OUTSTANDING', due_date__lt=SAMPLE_DATE)),
+        # Finance.forecast (open invoices, read on every forecast)
+        ('forecast (AR)', CustomerInvoice.objects.filter(status__in=['OUTSTANDING', 'OVERDUE', 'IN_TRANSIT']).values_list('customer_id', 'due_date', 'amount')),
+        ('forecast (AP)', VendorInvoice.objects.filter(status__in=['OUTSTANDING', 'OVERDUE']).values_list('vendor_id', 'due_date', 'amount')),
+    ]
+
+
+def full_scans(plan):
+    """
+    Returns the plan lines that read a whole table instead of an index.
+    "SCAN Finance_customerinvoice" is a table scan; "SCAN ... USING INDEX"
+    is an ordered index walk and is fine.
+    """
+    return [
+        line.strip() for line in plan.splitlines()
+        if ' SCAN ' in f" {line.strip()} " and 'USING' not in line
+    ]
+
+
+class Command(BaseCommand):
+    help = "Runs EXPLAIN QUERY PLAN on the invoice view querysets and fails on full table scans."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--verbose-plans', action='store_true', help="Print every plan, not only the failing ones.")
+
+    def handle(self, *args, **options):
+        if connection.vendor != 'sqlite':
+            raise CommandError("check_query_plans only understands SQLite's EXPLAIN QUERY PLAN output.")
+
+        failures = []
+        for label, qs in view_querysets():
+            plan = qs.explain()
+            scans = full_scans(plan)
+            if scans:
+                failures.append(label)
+                self.stdout.write(self.style.ERROR(f"FULL SCAN  {label}"))
+            else:
+                self.stdout.write(self.style.SUCCESS(f"ok         {label}"))
+            if 'TEMP B-TREE' in plan:
+                self.stdout.write(self.style.WARNING("           sorts in a temp b-tree"))
+            if scans or options['verbose_plans']:
+                for line in plan.splitlines():
+                    self.stdout.write(f"           {line}")
+
+        if failures:
+            raise CommandError(f"{len(failures)} queryset(s) fall back to a full table scan: {', '.join(failures)}")
+        self.stdout.write(self.style.SUCCESS("All invoice access paths use an index."))
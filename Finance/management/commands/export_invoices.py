@@ -0,0 +1,44 @@
+import sys
+
+from django.core.management.base import BaseCommand, CommandError
+
+from Finance import exporting
+
+
+class Command(BaseCommand):
+    help = "Streams the AR or AP ledger to CSV with constant memory."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--ledger', choices=['AR', 'AP'], required=True)
+        parser.add_argument('--status', help="Only invoices with this status.")
+        parser.add_argument('--from', dest='date_from', help="date_issued on or after (YYYY-MM-DD).")
+        parser.add_argument('--to', dest='date_to', help="date_issued on or before (YYYY-MM-DD).")
+        parser.add_argument('--company-code', help="Only parties with this company_code.")
+        parser.add_argument('--gzip', action='store_true', help="Compress the output.")
+        parser.add_argument('-o', '--output', help="Output file. Defaults to stdout.")
+
+    def handle(self, *args, **options):
+        ledger = options['ledger']
+        try:
+            queryset = exporting.export_queryset(
+                ledger,
+                status=options['status'],
+                date_from=exporting.parse_date(options['date_from'], '--from'),
+                date_to=exporting.parse_date(options['date_to'], '--to'),
+                company_code=options['company_code'],
+            )
+        except ValueError as e:
+            raise CommandError(str(e))
+
+        lines = exporting.csv_lines(ledger, queryset)
+        if options['gzip']:
+            if not options['output']:
+                raise CommandError("--gzip needs --output.")
+            with open(options['output'], 'wb') as fh:
+                for chunk in exporting.gzip_chunks(lines):
+                    fh.write(chunk)
+        elif options['output']:
+            with open(options['output'], 'w', encoding='utf-8', newline='') as fh:
+                fh.writelines(lines)
+        else:
+            sys.stdout.writelines(lines)
@@ -0,0 +1,226 @@
+import csv
+import gzip
+import json
+from datetime import date
+from pathlib import Path
+
+from django import forms
+from django.core.exceptions import ValidationError
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+
+from Finance import aging, audit, caching, numbering, rollups
+from Finance.forms import CustomerInvoiceForm, VendorInvoiceForm
+
+FORMS = {'AR': CustomerInvoiceForm, 'AP': VendorInvoiceForm}
+
+# Optional columns that the web forms fill in themselves (date_issued) or
+# that only exist on one ledger.
+EXTRA_FIELDS = {
+    'AR': {'date_issued': forms.DateField(required=False), 'payment_date': forms.DateField(required=False)},
+    'AP': {
+        'date_issued': forms.DateField(required=False),
+        'payment_date': forms.DateField(required=False),
+        'payment_method': forms.CharField(max_length=50, required=False),
+    },
+}
+
+
+def open_text(path):
+    if path.suffix == '.gz':
+        return gzip.open(path, 'rt', encoding='utf-8', newline='')
+    return open(path, 'r', encoding='utf-8', newline='')
+
+
+def read_rows(path, fmt):
+    """Yields (row_number, dict) one row at a time, whatever the file size."""
+    with open_text(path) as fh:
+        if fmt == 'csv':
+            for number, row in enumerate(csv.DictReader(fh), start=1):
+                yield number, row
+        else:
+            for number, line in enumerate(fh, start=1):
+                line = line.strip()
+                if not line:
+                    continue
+                try:
+                    row = json.loads(line)
+                except json.JSONDecodeError as e:
+                    yield number, ValueError(f"invalid JSON: {e}")
+                    continue
+                if not isinstance(row, dict):
+                    yield number, ValueError("expected a JSON object")
+                    continue
+                yield number, row
+
+
+class RowValidator:
+    """
+    Applies the CustomerInvoiceForm/VendorInvoiceForm field rules to a row
+    without the per-row queries a bound ModelForm would run: the party is
+    resolved from an in-memory email map and invoice_number uniqueness is
+    checked once per batch. Rows without a number get the next one from
+    Finance.numbering here, since bulk_create skips the pre_save hook that
+    assigns it.
+    """
+
+    def __init__(self, ledger):
+        self.ledger = ledger
+        self.conf = aging.LEDGERS[ledger]
+        self.party = self.conf['party']
+        self.model = self.conf['model']
+        form = FORMS[ledger]()
+        self.fields = {name: field for name, field in form.fields.items() if name != self.party}
+        self.fields.update(EXTRA_FIELDS[ledger])
+        # Imported rows without a status start as OUTSTANDING, like the add views
+        self.fields['status'].required = False
+        # email -> (pk, company code) for every party, loaded once
+        self.parties = {
+            email.lower(): (pk, company_code)
+            for pk, email, company_code in (
+                self.conf['party_model'].objects.values_list('pk', 'email', 'company_code').iterator(chunk_size=5000)
+            )
+        }
+
+    def build(self, row):
+        """Returns an unsaved invoice, or raises ValidationError with every field error."""
+        errors = {}
+        cleaned = {}
+        for name, field in self.fields.items():
+            raw = row.get(name)
+            if raw is not None and not isinstance(raw, str):
+                raw = str(raw)
+            try:
+                cleaned[name] = field.clean(raw)
+            except ValidationError as e:
+                errors[name] = e.messages
+
+        if numbering.is_reserved(self.ledger, cleaned.get('invoice_number')):
+            errors['invoice_number'] = [numbering.reserved_number_error(self.ledger)]
+
+        email = (row.get(self.party) or '').strip().lower()
+        party_id, company_code = self.parties.get(email, (None, None))
+        if not email:
+            errors[self.party] = [f"{self.party.capitalize()} is required."]
+        elif party_id is None:
+            errors[self.party] = [f"No {self.party} with email {email}."]
+
+        if errors:
+            raise ValidationError(errors)
+
+        cleaned['invoice_number'] = cleaned.get('invoice_number') or numbering.next_invoice_number(self.ledger, company_code)
+        cleaned['date_issued'] = cleaned.get('date_issued') or date.today()
+        cleaned['status'] = cleaned.get('status') or 'OUTSTANDING'
+        cleaned['notes'] = cleaned.get('notes') or None
+        for optional in ('payment_date', 'payment_method'):
+            if optional in cleaned and not cleaned[optional]:
+                cleaned[optional] = None
+        return self.model(**cleaned, **{self.party + '_id': party_id})
+
+
+class Command(BaseCommand):
+    help = "Streams AR/AP invoices from a CSV or JSONL file and inserts them in bulk_create batches."
+
+    def add_arguments(self, parser):
+        parser.add_argument('path', help="CSV or JSONL file (optionally .gz).")
+        parser.add_argument('--ledger', choices=['AR', 'AP'], required=True, help="AR = customer invoices, AP = vendor invoices.")
+        parser.add_argument('--format', choices=['csv', 'jsonl'], help="Defaults to the file extension.")
+        parser.add_argument('--batch-size', type=int, default=2000)
+        parser.add_argument('--errors-file', help="Write rejected rows here as CSV (row, invoice_number, error).")
+        parser.add_argument('--checkpoint', help="Progress file. Defaults to <path>.checkpoint.")
+        parser.add_argument('--resume', action='store_true', help="Skip the rows committed by a previous run.")
+        parser.add_argument('--skip-existing', action='store_true', help="Silently skip invoice numbers that already exist.")
+
+    def handle(self, *args, **options):
+        path = Path(options['path'])
+        if not path.exists():
+            raise CommandError(f"{path} does not exist.")
+        fmt = options['format'] or ('jsonl' if '.jsonl' in path.suffixes or '.json' in path.suffixes else 'csv')
+        batch_size = max(1, options['batch_size'])
+        checkpoint = Path(options['checkpoint'] or f"{path}.checkpoint")
+
+        start_after = 0
+        if options['resume'] and checkpoint.exists():
+            start_after = int(checkpoint.read_text().strip() or 0)
+            self.stdout.write(f"Resuming after row {start_after}.")
+
+        self.validator = RowValidator(options['ledger'])
+        self.skip_existing = options['skip_existing']
+        self.errors_writer = None
+        errors_fh = None
+        if options['errors_file']:
+            errors_fh = open(options['errors_file'], 'a' if options['resume'] else 'w', encoding='utf-8', newline='')
+            self.errors_writer = csv.writer(errors_fh)
+
+        self.created = self.rejected = self.skipped = 0
+        batch = []
+        last_row = start_after
+        try:
+            for number, row in read_rows(path, fmt):
+                if number <= start_after:
+                    continue
+                last_row = number
+                if isinstance(row, Exception):
+                    self.reject(number, '', str(row))
+                    continue
+                try:
+                    batch.append((number, self.validator.build(row)))
+                except ValidationError as e:
+                    self.reject(number, row.get('invoice_number', ''), '; '.join(
+                        f"{field}: {' '.join(msgs)}" for field, msgs in e.message_dict.items()
+                    ))
+                if len(batch) >= batch_size:
+                    self.flush(batch)
+                    batch = []
+                    checkpoint.write_text(str(last_row))
+            self.flush(batch)
+            checkpoint.write_text(str(last_row))
+        finally:
+            if errors_fh:
+                errors_fh.close()
+
+        self.stdout.write(self.style.SUCCESS(
+            f"Imported {self.created} invoice(s); {self.rejected} rejected, {self.skipped} skipped. Last row: {last_row}."
+        ))
+
+    def reject(self, number, invoice_number, message):
+        self.rejected += 1
+        self.stderr.write(f"row {number} ({invoice_number or '-'}): {message}")
+        if self.errors_writer:
+            self.errors_writer.writerow([number, invoice_number, message])
+
+    def flush(self, batch):
+        """Inserts one batch in a single transaction, after one uniqueness query."""
+        if not batch:
+            return
+        model = self.validator.model
+        numbers = [invoice.invoice_number for _, invoice in batch]
+        existing = set(model.objects.filter(invoice_number__in=numbers).values_list('invoice_number', flat=True))
+
+        seen = set()
+        to_create = []
+        for number, invoice in batch:
+            if invoice.invoice_number in existing:
+                if self.skip_existing:
+                    self.skipped += 1
+                else:
+                    self.reject(number, invoice.invoice_number, "invoice_number: Invoice with this Invoice number already exists.")
+                continue
+            if invoice.invoice_number in seen:
+                self.reject(number, invoice.invoice_number, "invoice_number: duplicated in the import file.")
+                continue
+            seen.add(invoice.invoice_number)
+            to_create.append(invoice)
+
+        ledger = self.validator.ledger
+        party_ids = {getattr(i, self.validator.party + '_id') for i in to_create}
+        with transaction.atomic():
+            model.objects.bulk_create(to_create, batch_size=500)
+            # bulk_create skips the aging, rollup, audit and dashboard cache
+            # signals: refresh the touched parties
+            aging.rebuild(ledger, party_ids=party_ids)
+            rollups.add_created(ledger, to_create)
+            audit.record([entry for i in to_create for entry in audit.entries_for_save(i, None, created=True)])
+            if to_create:
+                transaction.on_commit(lambda: caching.bump(ledger, party_ids))
+        self.created += len(to_create)
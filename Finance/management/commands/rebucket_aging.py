@@ -0,0 +1,24 @@
+from datetime import date
+
+from django.core.management.base import BaseCommand, CommandError
+
+from Finance import aging
+
+
+class Command(BaseCommand):
+    help = "Recomputes the AR/AP aging summary against today's date. Run nightly for the date rollover."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--ledger', choices=['AR', 'AP'], help="Only rebuild one ledger.")
+        parser.add_argument('--as-of', help="Bucket against this date (YYYY-MM-DD) instead of today.")
+
+    def handle(self, *args, **options):
+        try:
+            as_of = date.fromisoformat(options['as_of']) if options['as_of'] else date.today()
+        except ValueError:
+            raise CommandError("--as-of must be a date in YYYY-MM-DD format.")
+
+        ledgers = [options['ledger']] if options['ledger'] else list(aging.LEDGERS)
+        for ledger in ledgers:
+            count = aging.rebuild(ledger, as_of=as_of)
+            self.stdout.write(self.style.SUCCESS(f"{ledger}: {count} party summaries bucketed as of {as_of}."))
@@ -0,0 +1,18 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from Finance import search
+
+
+class Command(BaseCommand):
+    help = "Rebuilds the SQLite FTS5 search index for customers and vendors."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--kind', choices=list(search.INDEXES), help="Only rebuild one index.")
+
+    def handle(self, *args, **options):
+        if not search.fts_enabled():
+            raise CommandError("The party search index needs SQLite with FTS5.")
+        kinds = [options['kind']] if options['kind'] else list(search.INDEXES)
+        for kind in kinds:
+            count = search.rebuild(kind)
+            self.stdout.write(self.style.SUCCESS(f"{kind}: indexed {count} row(s)."))
@@ -0,0 +1,50 @@
+import csv
+
+from django.core.management.base import BaseCommand, CommandError
+
+from Finance import reconciliation
+
+
+class Command(BaseCommand):
+    help = "Matches a bank statement (CSV or OFX) against open AR/AP invoices and marks the matches PAID."
+
+    def add_arguments(self, parser):
+        parser.add_argument('path', help="Statement file: CSV (date, amount, description, reference) or .ofx/.qfx.")
+        parser.add_argument('--ledger', choices=['AR', 'AP'], help="Only reconcile one ledger.")
+        parser.add_argument('--window', type=int, default=reconciliation.DATE_WINDOW_DAYS, help="Days between due date and payment accepted by fuzzy matching.")
+        parser.add_argument('--threshold', type=float, default=reconciliation.NAME_THRESHOLD, help="Share of the party name that must appear in the description (0-1).")
+        parser.add_argument('--no-fuzzy', action='store_true', help="Only match by invoice number.")
+        parser.add_argument('--dry-run', action='store_true', help="Report matches without updating invoices.")
+        parser.add_argument('--report', help="Write every line and its outcome to this CSV file.")
+
+    def handle(self, *args, **options):
+        try:
+            lines = reconciliation.read_statement(options['path'])
+        except (OSError, ValueError) as e:
+            raise CommandError(f"Could not read statement: {e}")
+
+        ledgers = [options['ledger']] if options['ledger'] else ['AR', 'AP']
+        threshold = 2.0 if options['no_fuzzy'] else options['threshold']
+        result = reconciliation.match_statement(lines, ledgers, options['window'], threshold)
+
+        exact = sum(1 for m in result.matches if m.method == 'exact')
+        self.stdout.write(
+            f"{len(lines)} statement line(s): {exact} exact, {len(result.matches) - exact} fuzzy, "
+            f"{len(result.unmatched)} unmatched."
+        )
+
+        if options['report']:
+            with open(options['report'], 'w', encoding='utf-8', newline='') as fh:
+                writer = csv.writer(fh)
+                writer.writerow(['line', 'date', 'amount', 'description', 'ledger', 'invoice_number', 'method', 'score', 'note'])
+                for m in result.matches:
+                    writer.writerow([m.line.line_no, m.line.date, m.line.amount, m.line.description, m.ledger, m.invoice_number, m.method, f"{m.score:.2f}", ''])
+                for line, reason in result.unmatched:
+                    writer.writerow([line.line_no, line.date, line.amount, line.description, line.ledger, '', '', '', reason])
+
+        if options['dry_run']:
+            self.stdout.write("Dry run: no invoices updated.")
+            return
+
+        for ledger, count in reconciliation.apply_matches(result.matches).items():
+            self.stdout.write(self.style.SUCCESS(f"{ledger}: {count} invoice(s) marked PAID."))
@@ -0,0 +1,123 @@
+import multiprocessing
+import time
+import uuid
+from collections import Counter
+from concurrent.futures import ThreadPoolExecutor
+from datetime import date
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import IntegrityError, OperationalError, connection, connections
+
+from Finance import numbering
+from Finance.aging import LEDGERS
+
+
+def _insert_invoices(ledger, party_pk, count):
+    """
+    Creates ``count`` invoices without a number (the pre_save hook assigns
+    it). Stops at the first lock timeout: the run is no longer meaningful.
+    """
+    conf = LEDGERS[ledger]
+    numbers, collisions, errors = [], 0, []
+    try:
+        for _ in range(count):
+            try:
+                invoice = conf['model'].objects.create(**{
+                    conf['party'] + '_id': party_pk,
+                    'date_issued': date.today(),
+                    'due_date': date.today(),
+                    'amount': 1,
+                })
+                numbers.append(invoice.invoice_number)
+            except IntegrityError:
+                collisions += 1
+            except OperationalError as e:
+                errors.append(f"{type(e).__name__}: {e}")
+                if 'locked' in str(e):
+                    break
+            except Exception as e:
+                errors.append(f"{type(e).__name__}: {e}")
+    finally:
+        connection.close()
+    return numbers, collisions, errors
+
+
+def _worker(ledger, party_pk, threads, count, block_size):
+    """One process: ``threads`` threads inserting ``count`` invoices each."""
+    numbering.allocator.size = block_size
+    with ThreadPoolExecutor(max_workers=threads) as pool:
+        results = list(pool.map(lambda _: _insert_invoices(ledger, party_pk, count), range(threads)))
+    numbers = [n for result in results for n in result[0]]
+    return numbers, sum(r[1] for r in results), [e for r in results for e in r[2]]
+
+
+class Command(BaseCommand):
+    help = (
+        "Stress test for the invoice number allocator: several processes and threads "
+        "create invoices concurrently for one company code, then the numbers are checked "
+        "for collisions and gaps. Works on a throwaway party, removed afterwards."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--ledger', choices=['AR', 'AP'], default='AR')
+        parser.add_argument('--company-code', default='USPS')
+        parser.add_argument('--processes', type=int, default=4)
+        parser.add_argument('--threads', type=int, default=4, help="Threads per process.")
+        parser.add_argument('--invoices', type=int, default=50, help="Invoices per thread.")
+        parser.add_argument('--block-size', type=int, default=numbering.block_size())
+        parser.add_argument('--keep', action='store_true', help="Keep the test party and its invoices.")
+
+    def handle(self, *args, **options):
+        ledger = options['ledger']
+        conf = LEDGERS[ledger]
+        party = conf['party_model'].objects.create(
+            name="Invoice numbering stress test",
+            email=f"stress-{uuid.uuid4().hex[:12]}@example.invalid",
+            company_code=options['company_code'],
+        )
+        expected = options['processes'] * options['threads'] * options['invoices']
+        self.stdout.write(
+            f"{options['processes']} process(es) x {options['threads']} thread(s) x {options['invoices']} "
+            f"invoice(s) = {expected} {ledger} invoices, blocks of {options['block_size']} ..."
+        )
+
+        try:
+            # Children are forked: none of them may inherit an open connection
+            connections.close_all()
+            started = time.perf_counter()
+            args = (ledger, party.pk, options['threads'], options['invoices'], options['block_size'])
+            with multiprocessing.get_context('fork').Pool(options['processes']) as pool:
+                results = pool.starmap(_worker, [args] * options['processes'])
+            elapsed = time.perf_counter() - started
+
+            created = sum(len(result[0]) for result in results)
+            collisions = sum(result[1] for result in results)
+            errors = [e for result in results for e in result[2]]
+            # Checked against what was actually stored, not what the workers reported
+            numbers = list(conf['model'].objects.filter(**{conf['party']: party}).values_list('invoice_number', flat=True))
+            duplicates = [n for n, seen in Counter(numbers).items() if seen > 1]
+
+            prefix = numbering.number_prefix(ledger, options['company_code'])
+            values = sorted(int(n[len(prefix):]) for n in numbers)
+            gaps = (values[-1] - values[0] + 1 - len(values)) if values else 0
+
+            self.stdout.write(f"{created} invoice(s) created in {elapsed:.2f}s ({created / elapsed:.0f}/s), {len(numbers)} stored.")
+            if values:
+                first, last = (numbering.format_number(ledger, options['company_code'], v) for v in (values[0], values[-1]))
+                self.stdout.write(f"Numbers {first} .. {last}, {gaps} gap(s) (unused block tails).")
+            for error, seen in Counter(errors).most_common(5):
+                self.stderr.write(f"{seen} x {error}")
+            locked = sum(1 for e in errors if 'locked' in e)
+            if locked:
+                raise CommandError(
+                    f"{locked} insert(s) timed out waiting for the database lock ({created} created, "
+                    f"{len(numbers)} stored): raise the database 'timeout' option or lower the concurrency."
+                )
+            if collisions or duplicates:
+                raise CommandError(f"{collisions} IntegrityError(s), {len(duplicates)} duplicate number(s).")
+            if errors or len(numbers) != expected:
+                raise CommandError(f"{len(errors)} insert(s) failed for other reasons, {len(numbers)}/{expected} stored.")
+            self.stdout.write(self.style.SUCCESS("No collisions."))
+        finally:
+            if not options['keep']:
+                party.delete()
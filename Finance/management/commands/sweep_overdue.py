@@ -0,0 +1,20 @@
+from datetime import date
+
+from django.core.management.base import BaseCommand, CommandError
+
+from Finance.sweeper import sweep_overdue
+
+
+class Command(BaseCommand):
+    help = "Marks OUTSTANDING invoices past their due_date as OVERDUE (one UPDATE per table)."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--date', help="Treat this date (YYYY-MM-DD) as today.")
+
+    def handle(self, *args, **options):
+        try:
+            today = date.fromisoformat(options['date']) if options['date'] else None
+        except ValueError:
+            raise CommandError("--date must be a date in YYYY-MM-DD format.")
+        for ledger, updated in sweep_overdue(today).items():
+            self.stdout.write(self.style.SUCCESS(f"{ledger}: {updated} invoice(s) marked OVERDUE."))
@@ -0,0 +1,44 @@
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import timedelta
+
+from django.core.management.base import BaseCommand
+from django.utils import timezone
+
+from Finance import snapshots
+from Finance.views import INVOICE_TYPES
+
+
+class Command(BaseCommand):
+    help = "Pre-renders the snapshots of recently changed invoices in a thread pool, then applies LRU eviction."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--hours', type=int, default=24, help="Invoices changed in the last N hours (default 24).")
+        parser.add_argument('--limit', type=int, default=2000, help="At most this many invoices per type.")
+        parser.add_argument('--workers', type=int, default=8)
+        parser.add_argument('--variants', default=','.join(snapshots.VARIANTS), help="Comma-separated: detail,print.")
+
+    def handle(self, *args, **options):
+        variants = [v.strip() for v in options['variants'].split(',') if v.strip() in snapshots.VARIANTS]
+        since = timezone.now() - timedelta(hours=options['hours'])
+
+        # Invoices and parties are read here, in one query per type; the
+        # workers only render and write files.
+        jobs = []
+        for invoice_type, model in INVOICE_TYPES.items():
+            invoices = (
+                model.objects.filter(updated_at__gte=since)
+                .select_related(invoice_type)
+                .order_by('-updated_at')[:options['limit']]
+            )
+            jobs += [(invoice, invoice_type, variant) for invoice in invoices for variant in variants]
+
+        started = time.perf_counter()
+        with ThreadPoolExecutor(max_workers=options['workers']) as pool:
+            list(pool.map(lambda job: snapshots.get_document(*job), jobs))
+        deleted, freed = snapshots.evict()
+
+        self.stdout.write(self.style.SUCCESS(
+            f"{len(jobs)} snapshot(s) ready in {time.perf_counter() - started:.2f}s; "
+            f"evicted {deleted} file(s) ({freed / 1024:.0f} KiB)."
+        ))
@@ -0,0 +1,37 @@
+# Generated by Django 5.2.8 on 2026-10-18 07:56
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('Finance', '0007_customer_user_vendor_user'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='customerinvoice',
+            index=models.Index(fields=['status', '-date_issued', '-id'], name='ar_status_issued_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='customerinvoice',
+            index=models.Index(fields=['customer', '-date_issued', '-id'], name='ar_customer_issued_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='customerinvoice',
+            index=models.Index(fields=['customer', 'status'], name='ar_customer_status_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='vendorinvoice',
+            index=models.Index(fields=['status', '-date_issued', '-id'], name='ap_status_issued_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='vendorinvoice',
+            index=models.Index(fields=['vendor', '-date_issued', '-id'], name='ap_vendor_issued_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='vendorinvoice',
+            index=models.Index(fields=['vendor', 'status'], name='ap_vendor_status_idx'),
+        ),
+    ]
@@ -0,0 +1,37 @@
+# Generated by Django 5.2.8 on 2026-10-18 07:57
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('Finance', '0008_invoice_access_path_indexes'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='AgingSummary',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('ledger', models.CharField(choices=[('AR', 'Accounts Receivable'), ('AP', 'Accounts Payable')], max_length=2)),
+                ('company_code', models.CharField(max_length=20)),
+                ('as_of', models.DateField()),
+                ('current', models.DecimalField(decimal_places=2, default=0, max_digits=14)),
+                ('days_1_30', models.DecimalField(decimal_places=2, default=0, max_digits=14)),
+                ('days_31_60', models.DecimalField(decimal_places=2, default=0, max_digits=14)),
+                ('days_61_90', models.DecimalField(decimal_places=2, default=0, max_digits=14)),
+                ('days_over_90', models.DecimalField(decimal_places=2, default=0, max_digits=14)),
+                ('open_count', models.IntegerField(default=0)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+                ('customer', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.CASCADE, to='Finance.customer')),
+                ('vendor', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.CASCADE, to='Finance.vendor')),
+            ],
+            options={
+                'verbose_name_plural': 'Aging summaries',
+                'indexes': [models.Index(fields=['ledger', 'company_code'], name='aging_ledger_company_idx')],
+                'constraints': [models.UniqueConstraint(condition=models.Q(('customer__isnull', False)), fields=('customer',), name='aging_unique_customer'), models.UniqueConstraint(condition=models.Q(('vendor__isnull', False)), fields=('vendor',), name='aging_unique_vendor')],
+            },
+        ),
+    ]
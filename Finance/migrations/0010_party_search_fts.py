@@ -0,0 +1,41 @@
+# Generated by Django 5.2.8 on 2026-10-18 07:59
+
+from django.db import migrations
+
+# FTS5 tables for Finance.search; rowid is the party's pk.
+FTS_TABLES = {
+    'finance_customer_fts': ('Finance_customer', ['name', 'email', 'phone_number', 'company_code', 'address']),
+    'finance_vendor_fts': ('Finance_vendor', ['name', 'email', 'phone_number', 'company_code', 'company', 'tax_id', 'address']),
+}
+
+
+def create_fts_tables(apps, schema_editor):
+    if schema_editor.connection.vendor != 'sqlite':
+        return
+    for table, (source, columns) in FTS_TABLES.items():
+        schema_editor.execute(
+            f"CREATE VIRTUAL TABLE IF NOT EXISTS {table} USING fts5("
+            f"{', '.join(columns)}, tokenize='unicode61 remove_diacritics 2')"
+        )
+        select_columns = ', '.join(f"COALESCE({column}, '')" for column in columns)
+        schema_editor.execute(
+            f"INSERT INTO {table} (rowid, {', '.join(columns)}) SELECT id, {select_columns} FROM {source}"
+        )
+
+
+def drop_fts_tables(apps, schema_editor):
+    if schema_editor.connection.vendor != 'sqlite':
+        return
+    for table in FTS_TABLES:
+        schema_editor.execute(f"DROP TABLE IF EXISTS {table}")
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('Finance', '0009_agingsummary'),
+    ]
+
+    operations = [
+        migrations.RunPython(create_fts_tables, drop_fts_tables),
+    ]
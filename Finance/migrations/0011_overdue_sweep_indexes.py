@@ -0,0 +1,21 @@
+# Generated by Django 5.2.8 on 2026-10-18 08:00
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('Finance', '0010_party_search_fts'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='customerinvoice',
+            index=models.Index(fields=['status', 'due_date'], name='ar_status_due_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='vendorinvoice',
+            index=models.Index(fields=['status', 'due_date'], name='ap_status_due_idx'),
+        ),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 5.2.8 on 2026-10-18 08:02
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('Finance', '0011_overdue_sweep_indexes'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='vendorinvoice',
+            name='payment_date',
+            field=models.DateField(blank=True, null=True),
+        ),
+    ]
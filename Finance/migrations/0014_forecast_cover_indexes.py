@@ -0,0 +1,21 @@
+# Generated by Django 5.2.8 on 2026-10-18 08:33
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('Finance', '0013_invoicenumbersequence'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='customerinvoice',
+            index=models.Index(fields=['status', 'customer', 'due_date', 'payment_date', 'amount'], name='ar_forecast_cover_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='vendorinvoice',
+            index=models.Index(fields=['status', 'vendor', 'due_date', 'payment_date', 'amount'], name='ap_forecast_cover_idx'),
+        ),
+    ]
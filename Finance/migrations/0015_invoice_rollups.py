@@ -0,0 +1,43 @@
+# Generated by Django 5.2.8 on 2026-10-18 08:36
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('Finance', '0014_forecast_cover_indexes'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='DailyInvoiceRollup',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('ledger', models.CharField(choices=[('AR', 'Accounts Receivable'), ('AP', 'Accounts Payable')], max_length=2)),
+                ('company_code', models.CharField(max_length=20)),
+                ('status', models.CharField(max_length=20)),
+                ('period', models.DateField()),
+                ('invoice_count', models.IntegerField(default=0)),
+                ('amount', models.DecimalField(decimal_places=2, default=0, max_digits=16)),
+            ],
+            options={
+                'constraints': [models.UniqueConstraint(fields=('ledger', 'period', 'company_code', 'status'), name='daily_rollup_unique')],
+            },
+        ),
+        migrations.CreateModel(
+            name='MonthlyInvoiceRollup',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('ledger', models.CharField(choices=[('AR', 'Accounts Receivable'), ('AP', 'Accounts Payable')], max_length=2)),
+                ('company_code', models.CharField(max_length=20)),
+                ('status', models.CharField(max_length=20)),
+                ('period', models.DateField()),
+                ('invoice_count', models.IntegerField(default=0)),
+                ('amount', models.DecimalField(decimal_places=2, default=0, max_digits=16)),
+            ],
+            options={
+                'constraints': [models.UniqueConstraint(fields=('ledger', 'period', 'company_code', 'status'), name='monthly_rollup_unique')],
+            },
+        ),
+    ]
@@ -1,7 +1,37 @@
-from django.db import models
+from django.db import models, router, transaction
 from django.conf import settings  # <-- para usar AUTH_USER_MODEL
 
-class Customer(models.Model):
+
+class AtomicSaveMixin:
+    """
+    save() in one transaction with its pre_save/post_save hooks (Finance.signals:
+    aging summary, rollups, audit log, search index, dashboard cache), so the
+    row and the tables derived from it commit or roll back together. delete()
+    already is: the collector sends post_delete inside its own transaction.
+    """
+
+    def save(self, *args, **kwargs):
+        using = kwargs.get('using') or router.db_for_write(type(self), instance=self)
+        with transaction.atomic(using=using):
+            super().save(*args, **kwargs)
+
+
+class InvoiceSaveMixin(AtomicSaveMixin):
+    """
+    Numbers the invoice before save() opens its transaction: inside one,
+    SQLite can't hand the number out from the allocator's in-memory block
+    (Finance.numbering.NumberAllocator.next_value) and reserves it from the
+    sequence row instead.
+    """
+
+    def save(self, *args, **kwargs):
+        if not self.invoice_number:
+            from .numbering import assign_invoice_number  # numbering imports the models
+            assign_invoice_number(self)
+        super().save(*args, **kwargs)
+
+
+class Customer(AtomicSaveMixin, models.Model):
     user = models.OneToOneField(
         settings.AUTH_USER_MODEL,  # <--- cambio aquí
         on_delete=models.CASCADE,
@@ -28,7 +58,7 @@ class Customer(models.Model):
         return f"{self.name} ({self.company_code})"
 
 
-class Vendor(models.Model):
+class Vendor(AtomicSaveMixin, models.Model):
     user = models.OneToOneField(
         settings.AUTH_USER_MODEL,  # <--- cambio aquí
         on_delete=models.CASCADE,
@@ -57,7 +87,7 @@ class Vendor(models.Model):
         return f"{self.name} ({self.company_code})"
 
 
-class CustomerInvoice(models.Model):
+class CustomerInvoice(InvoiceSaveMixin, models.Model):
     STATUS_CHOICES = [
         ('OUTSTANDING', 'Outstanding'), 
         ('PAID', 'Paid'),               
@@ -76,11 +106,25 @@ class CustomerInvoice(models.Model):
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
 
+    class Meta:
+        indexes = [
+            # Staff list: status='OUTSTANDING' ordered by (date_issued, id)
+            models.Index(fields=['status', '-date_issued', '-id'], name='ar_status_issued_idx'),
+            # Customer list: customer=... ordered by (date_issued, id)
+            models.Index(fields=['customer', '-date_issued', '-id'], name='ar_customer_issued_idx'),
+            # Profile dashboard: customer=... AND status=...
+            models.Index(fields=['customer', 'status'], name='ar_customer_status_idx'),
+            # Overdue sweeper: status='OUTSTANDING' AND due_date < today
+            models.Index(fields=['status', 'due_date'], name='ar_status_due_idx'),
+            # Cash-flow forecast: every column it reads, so it never touches the table
+            models.Index(fields=['status', 'customer', 'due_date', 'payment_date', 'amount'], name='ar_forecast_cover_idx'),
+        ]
+
     def __str__(self):
         return f"AR {self.invoice_number} - {self.customer.name}"
 
 
-class VendorInvoice(models.Model):
+class VendorInvoice(InvoiceSaveMixin, models.Model):
     STATUS_CHOICES = [
         ('OUTSTANDING', 'Outstanding'),
         ('PAID', 'Paid'),
@@ -95,9 +139,163 @@ class VendorInvoice(models.Model):
     amount = models.DecimalField(max_digits=10, decimal_places=2)
     status = models.CharField(max_length=20, choices=STATUS_CHOICES, default='OUTSTANDING')
     payment_method = models.CharField(max_length=50, blank=True, null=True)
+    payment_date = models.DateField(null=True, blank=True)
     notes = models.TextField(blank=True, null=True)
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
 
+    class Meta:
+        indexes = [
+            models.Index(fields=['status', '-date_issued', '-id'], name='ap_status_issued_idx'),
+            models.Index(fields=['vendor', '-date_issued', '-id'], name='ap_vendor_issued_idx'),
+            models.Index(fields=['vendor', 'status'], name='ap_vendor_status_idx'),
+            models.Index(fields=['status', 'due_date'], name='ap_status_due_idx'),
+            models.Index(fields=['status', 'vendor', 'due_date', 'payment_date', 'amount'], name='ap_forecast_cover_idx'),
+        ]
+
     def __str__(self):
         return f"AP {self.invoice_number} - {self.vendor.name}"
+
+
+class AgingSummary(models.Model):
+    """
+    Open balance per party split into aging buckets, kept current by the
+    invoice save/delete hooks in Finance.signals. Buckets are measured
+    against ``as_of``; ``rebucket_aging`` moves everything to today.
+    """
+    LEDGER_CHOICES = [
+        ('AR', 'Accounts Receivable'),
+        ('AP', 'Accounts Payable'),
+    ]
+
+    ledger = models.CharField(max_length=2, choices=LEDGER_CHOICES)
+    customer = models.ForeignKey(Customer, on_delete=models.CASCADE, null=True, blank=True)
+    vendor = models.ForeignKey(Vendor, on_delete=models.CASCADE, null=True, blank=True)
+    company_code = models.CharField(max_length=20)
+    as_of = models.DateField()
+    current = models.DecimalField(max_digits=14, decimal_places=2, default=0)
+    days_1_30 = models.DecimalField(max_digits=14, decimal_places=2, default=0)
+    days_31_60 = models.DecimalField(max_digits=14, decimal_places=2, default=0)
+    days_61_90 = models.DecimalField(max_digits=14, decimal_places=2, default=0)
+    days_over_90 = models.DecimalField(max_digits=14, decimal_places=2, default=0)
+    open_count = models.IntegerField(default=0)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['customer'], condition=models.Q(customer__isnull=False), name='aging_unique_customer'),
+            models.UniqueConstraint(fields=['vendor'], condition=models.Q(vendor__isnull=False), name='aging_unique_vendor'),
+        ]
+        indexes = [
+            models.Index(fields=['ledger', 'company_code'], name='aging_ledger_company_idx'),
+        ]
+        verbose_name_plural = "Aging summaries"
+
+    @property
+    def total(self):
+        return self.current + self.days_1_30 + self.days_31_60 + self.days_61_90 + self.days_over_90
+
+    def __str__(self):
+        party = self.customer if self.ledger == 'AR' else self.vendor
+        return f"{self.ledger} aging - {party}"
+
+
+class InvoiceNumberSequence(models.Model):
+    """
+    Next free invoice number per ledger and company code. Worker processes
+    reserve whole blocks from it (Finance.numbering) and hand numbers out
+    from memory, so this row is written once per block, not per invoice.
+    """
+    LEDGER_CHOICES = AgingSummary.LEDGER_CHOICES
+
+    ledger = models.CharField(max_length=2, choices=LEDGER_CHOICES)
+    company_code = models.CharField(max_length=20)
+    next_value = models.PositiveBigIntegerField(default=1)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['ledger', 'company_code'], name='invoice_sequence_unique'),
+        ]
+
+    def __str__(self):
+        return f"{self.ledger}-{self.company_code}: next {self.next_value}"
+
+
+class InvoiceRollup(models.Model):
+    """
+    Invoice count and amount per ledger, company code, status and period,
+    maintained by the invoice hooks in Finance.signals (see Finance.rollups).
+    Reports read these instead of aggregating the invoice tables.
+    """
+    LEDGER_CHOICES = AgingSummary.LEDGER_CHOICES
+
+    ledger = models.CharField(max_length=2, choices=LEDGER_CHOICES)
+    company_code = models.CharField(max_length=20)
+    status = models.CharField(max_length=20)
+    period = models.DateField()  # date_issued, or the first day of its month
+    invoice_count = models.IntegerField(default=0)
+    amount = models.DecimalField(max_digits=16, decimal_places=2, default=0)
+
+    class Meta:
+        abstract = True
+
+    def __str__(self):
+        return f"{self.ledger} {self.company_code} {self.status} {self.period}: {self.amount}"
+
+
+class DailyInvoiceRollup(InvoiceRollup):
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['ledger', 'period', 'company_code', 'status'], name='daily_rollup_unique'),
+        ]
+
+
+class MonthlyInvoiceRollup(InvoiceRollup):
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['ledger', 'period', 'company_code', 'status'], name='monthly_rollup_unique'),
+        ]
+
+
+class AuditLogEntry(models.Model):
+    """
+    One changed field of an invoice or party (append-only). Creates and
+    deletes are one entry with the whole row as JSON. Written in batches by
+    Finance.audit; entries are never updated.
+    """
+    ACTION_CHOICES = [
+        ('create', 'Created'),
+        ('update', 'Updated'),
+        ('delete', 'Deleted'),
+    ]
+
+    model = models.CharField(max_length=32)  # _meta.model_name: customerinvoice, vendor, ...
+    object_id = models.BigIntegerField()  # no FK: the entries outlive deleted rows
+    object_repr = models.CharField(max_length=200)
+    action = models.CharField(max_length=10, choices=ACTION_CHOICES)
+    field = models.CharField(max_length=50, blank=True)
+    old_value = models.TextField(null=True, blank=True)
+    new_value = models.TextField(null=True, blank=True)
+    user = models.ForeignKey(settings.AUTH_USER_MODEL, on_delete=models.SET_NULL, null=True, blank=True, related_name='+')
+    changed_at = models.DateTimeField()
+
+    class Meta:
+        indexes = [
+            # History of one invoice: model=... AND object_id=... ordered by time
+            models.Index(fields=['model', 'object_id', 'changed_at'], name='audit_object_time_idx'),
+            # Everything changed in a time range
+            models.Index(fields=['changed_at'], name='audit_time_idx'),
+        ]
+        verbose_name_plural = "Audit log entries"
+
+    def save(self, *args, **kwargs):
+        if self.pk is not None:
+            raise ValueError("Audit log entries are append-only.")
+        super().save(*args, **kwargs)
+
+    def delete(self, *args, **kwargs):
+        raise ValueError("Audit log entries are append-only.")
+
+    def __str__(self):
+        return f"{self.changed_at:%Y-%m-%d %H:%M} {self.action} {self.object_repr} {self.field}".rstrip()
@@ -0,0 +1,170 @@
+import os
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+from django.conf import settings
+from django.db import IntegrityError, connection, transaction
+from django.db.models import F
+from django.db.models.functions import Length
+from django.utils import timezone
+
+from .aging import LEDGERS, ledger_for
+from .models import InvoiceNumberSequence
+
+DEFAULT_BLOCK_SIZE = 20
+DIGITS = 6
+
+
+def block_size():
+    return getattr(settings, 'FINANCE_INVOICE_NUMBER_BLOCK_SIZE', None) or DEFAULT_BLOCK_SIZE
+
+
+def number_prefix(ledger, company_code):
+    return f"{ledger}-{company_code}-"
+
+
+def format_number(ledger, company_code, value):
+    """AR-USPS-000123"""
+    return f"{number_prefix(ledger, company_code)}{value:0{DIGITS}d}"
+
+
+def is_reserved(ledger, invoice_number):
+    """
+    True for a number in the allocator's namespace (AR-<company code>-<digits>).
+    Only the allocator may issue those: a number typed in by hand or imported
+    there would collide with it later, since a sequence only looks at the
+    existing numbers when it is created.
+    """
+    party_model = LEDGERS[ledger]['party_model']
+    for code, _ in party_model._meta.get_field('company_code').choices:
+        prefix = number_prefix(ledger, code)
+        if invoice_number and invoice_number.startswith(prefix) and invoice_number[len(prefix):].isdigit():
+            return True
+    return False
+
+
+def reserved_number_error(ledger):
+    return f"Numbers like {format_number(ledger, '<company>', 123)} are assigned automatically: leave it blank or use another format."
+
+
+# === BLOCK RESERVATION ===
+def _first_free_value(ledger, company_code):
+    """
+    Where a new sequence starts: after the highest number already issued with
+    this prefix (typed in by hand or imported), so the sequence never collides
+    with them.
+    """
+    prefix = number_prefix(ledger, company_code)
+    last = (
+        LEDGERS[ledger]['model'].objects
+        .filter(invoice_number__startswith=prefix)
+        .order_by(Length('invoice_number').desc(), '-invoice_number')
+        .values_list('invoice_number', flat=True)
+        .first()
+    )
+    suffix = last[len(prefix):] if last else ''
+    return int(suffix) + 1 if suffix.isdigit() else 1
+
+
+def _reserve(ledger, company_code, size):
+    sequences = InvoiceNumberSequence.objects.filter(ledger=ledger, company_code=company_code)
+    with transaction.atomic():
+        # The UPDATE comes first so the transaction takes the write lock (row
+        # lock / SQLite RESERVED) before reading: concurrent reservations queue
+        # up behind each other instead of reading the same value.
+        if not sequences.update(next_value=F('next_value') + size, updated_at=timezone.now()):
+            try:
+                with transaction.atomic():
+                    InvoiceNumberSequence.objects.create(
+                        ledger=ledger, company_code=company_code,
+                        next_value=_first_free_value(ledger, company_code) + size,
+                    )
+            except IntegrityError:
+                # Another process created it first
+                sequences.update(next_value=F('next_value') + size, updated_at=timezone.now())
+        end = sequences.values_list('next_value', flat=True).get()
+    return range(end - size, end)
+
+
+def _separate_connection_needed():
+    # SQLite has a single writer: a second connection would wait forever for
+    # the caller's write lock, so there the reservation joins the caller's
+    # transaction instead (see NumberAllocator.next_value).
+    return connection.in_atomic_block and connection.vendor != 'sqlite'
+
+
+def reserve_block(ledger, company_code, size=None):
+    """
+    Reserves ``size`` consecutive numbers for (ledger, company_code) in one
+    short transaction and returns them as a range of ints.
+
+    Called inside an atomic block, the reservation runs on a separate
+    connection and commits on its own, so a rollback of the caller's
+    transaction can't hand the same block to another process later. (Numbers
+    of a rolled back invoice are simply skipped: gaps are expected.)
+    """
+    size = size or block_size()
+    if not _separate_connection_needed():
+        return _reserve(ledger, company_code, size)
+
+    def reserve_on_own_connection():
+        try:
+            return _reserve(ledger, company_code, size)
+        finally:
+            connection.close()
+
+    with ThreadPoolExecutor(max_workers=1) as pool:
+        return pool.submit(reserve_on_own_connection).result()
+
+
+# === IN-MEMORY ALLOCATOR ===
+class NumberAllocator:
+    """
+    Hands out invoice numbers from blocks reserved with reserve_block(); the
+    database is only touched when a block runs out. Thread-safe. Numbers left
+    in memory when the process exits are never issued (gaps, no collisions).
+    """
+
+    def __init__(self, size=None):
+        self.size = size
+        self._reset()
+        # A forked worker must not reuse blocks reserved by its parent
+        os.register_at_fork(after_in_child=self._reset)
+
+    def _reset(self):
+        self._blocks = {}
+        self._lock = threading.Lock()
+
+    def next_value(self, ledger, company_code):
+        if connection.in_atomic_block and connection.vendor == 'sqlite':
+            # Reserved inside the caller's transaction: not cached, since a
+            # rollback gives the number back to the sequence.
+            return reserve_block(ledger, company_code, size=1)[0]
+        key = (ledger, company_code)
+        with self._lock:
+            block = self._blocks.get(key)
+            value = next(block, None) if block else None
+            if value is None:
+                block = iter(reserve_block(ledger, company_code, self.size))
+                self._blocks[key] = block
+                value = next(block)
+            return value
+
+    def next_number(self, ledger, company_code):
+        return format_number(ledger, company_code, self.next_value(ledger, company_code))
+
+
+allocator = NumberAllocator()
+
+
+def next_invoice_number(ledger, company_code):
+    """Next number from this process' allocator, e.g. 'AP-USPS-000042'."""
+    return allocator.next_number(ledger, company_code)
+
+
+def assign_invoice_number(invoice):
+    """Gives an invoice without a number the next one of its party's company code."""
+    if not invoice.invoice_number:
+        ledger = ledger_for(type(invoice))
+        party = getattr(invoice, LEDGERS[ledger]['party'])
+        invoice.invoice_number = next_invoice_number(ledger, party.company_code)
@@ -0,0 +1,207 @@
+import base64
+from dataclasses import dataclass, field
+from datetime import date
+
+from django.core.paginator import Paginator
+from django.db import DatabaseError, connections, transaction
+from django.db.models import Q
+from django.utils.functional import cached_property
+
+DEFAULT_PAGE_SIZE = 50
+MAX_PAGE_SIZE = 200
+
+
+# === CURSOR TOKENS ===
+def encode_cursor(date_issued, pk):
+    """Encodes a (date_issued, id) key as an opaque URL-safe token."""
+    raw = f"{date_issued.isoformat()}|{pk}".encode()
+    return base64.urlsafe_b64encode(raw).decode().rstrip('=')
+
+
+def decode_cursor(token):
+    """Returns the (date_issued, id) key of a token, or None if it is invalid."""
+    if not token:
+        return None
+    try:
+        padded = token + '=' * (-len(token) % 4)
+        raw = base64.urlsafe_b64decode(padded.encode()).decode()
+        date_part, pk_part = raw.split('|', 1)
+        return date.fromisoformat(date_part), int(pk_part)
+    except (ValueError, UnicodeDecodeError):
+        return None
+
+
+# === KEYSET PAGE ===
+@dataclass
+class KeysetPage:
+    """One page of invoices plus the tokens needed to move around it."""
+    object_list: list = field(default_factory=list)
+    next_cursor: str = None
+    prev_cursor: str = None
+
+    @property
+    def has_next(self):
+        return self.next_cursor is not None
+
+    @property
+    def has_previous(self):
+        return self.prev_cursor is not None
+
+    def __iter__(self):
+        return iter(self.object_list)
+
+    def __len__(self):
+        return len(self.object_list)
+
+    def __bool__(self):
+        return bool(self.object_list)
+
+
+def _key(row):
+    """(date_issued, pk) of a model instance or of a values() dict."""
+    if isinstance(row, dict):
+        return row['date_issued'], row['pk']
+    return row.date_issued, row.pk
+
+
+def _page_size(value):
+    try:
+        size = int(value)
+    except (TypeError, ValueError):
+        return DEFAULT_PAGE_SIZE
+    return max(1, min(size, MAX_PAGE_SIZE))
+
+
+def _page_query(queryset, after, before, page_size):
+    """The slice to read for one page; shared by the sync and async paginators."""
+    after_key = decode_cursor(after)
+    before_key = decode_cursor(before)
+    if before_key:
+        # Walk backwards in ascending order and flip the slice afterwards
+        d, pk = before_key
+        qs = queryset.filter(Q(date_issued__gt=d) | Q(date_issued=d, pk__gt=pk))
+        return qs.order_by('date_issued', 'pk')[:page_size + 1], after_key, before_key
+    qs = queryset
+    if after_key:
+        d, pk = after_key
+        qs = qs.filter(Q(date_issued__lt=d) | Q(date_issued=d, pk__lt=pk))
+    return qs.order_by('-date_issued', '-pk')[:page_size + 1], after_key, before_key
+
+
+def _build_page(rows, page_size, after_key, before_key):
+    if before_key:
+        has_more = len(rows) > page_size
+        rows = rows[:page_size]
+        rows.reverse()
+        has_newer, has_older = has_more, True
+    else:
+        has_older = len(rows) > page_size
+        rows = rows[:page_size]
+        has_newer = after_key is not None
+
+    page = KeysetPage(object_list=rows)
+    if rows:
+        if has_older:
+            page.next_cursor = encode_cursor(*_key(rows[-1]))
+        if has_newer:
+            page.prev_cursor = encode_cursor(*_key(rows[0]))
+    return page
+
+
+def keyset_paginate(queryset, after=None, before=None, page_size=DEFAULT_PAGE_SIZE):
+    """
+    Paginates ``queryset`` newest first on (date_issued, id) without COUNT(*).
+    Works on model querysets and on values() querysets that include 'pk'.
+
+    ``after`` continues towards older rows, ``before`` goes back towards newer
+    rows. Only ``page_size + 1`` rows are read per page: the extra row tells us
+    whether another page exists in that direction.
+    """
+    page_size = _page_size(page_size)
+    qs, after_key, before_key = _page_query(queryset, after, before, page_size)
+    return _build_page(list(qs), page_size, after_key, before_key)
+
+
+async def akeyset_paginate(queryset, after=None, before=None, page_size=DEFAULT_PAGE_SIZE):
+    """Async version of keyset_paginate(), reading the page with aiterator()."""
+    page_size = _page_size(page_size)
+    qs, after_key, before_key = _page_query(queryset, after, before, page_size)
+    rows = [row async for row in qs.aiterator()]
+    return _build_page(rows, page_size, after_key, before_key)
+
+
+def _request_params(request):
+    return {
+        'after': request.GET.get('after'),
+        'before': request.GET.get('before'),
+        'page_size': request.GET.get('page_size', DEFAULT_PAGE_SIZE),
+    }
+
+
+def paginate_request(request, queryset):
+    """Reads ``after``/``before``/``page_size`` from the querystring."""
+    return keyset_paginate(queryset, **_request_params(request))
+
+
+async def apaginate_request(request, queryset):
+    return await akeyset_paginate(queryset, **_request_params(request))
+
+
+# === ADMIN CHANGELISTS ===
+def estimated_table_rows(model, using='default'):
+    """
+    Row count of ``model``'s table without scanning it: the planner
+    statistics on PostgreSQL/MySQL, the highest rowid on SQLite (whose
+    sqlite_stat1 is empty until ANALYZE and then never refreshed; MAX(rowid)
+    is one seek and only overcounts by the deleted rows). None for other
+    backends.
+    """
+    connection = connections[using]
+    table = model._meta.db_table
+    queries = {
+        'postgresql': ("SELECT reltuples::bigint FROM pg_class WHERE oid = %s::regclass", [connection.ops.quote_name(table)]),
+        'mysql': ("SELECT table_rows FROM information_schema.tables WHERE table_schema = DATABASE() AND table_name = %s", [table]),
+        'sqlite': (f"SELECT MAX(rowid) FROM {connection.ops.quote_name(table)}", []),
+    }
+    if connection.vendor not in queries:
+        return None
+    sql, params = queries[connection.vendor]
+    try:
+        # Savepoint: a failed lookup must not break the caller's transaction
+        with transaction.atomic(using=using), connection.cursor() as cursor:
+            cursor.execute(sql, params)
+            row = cursor.fetchone()
+    except DatabaseError:  # e.g. no access to the catalog
+        return None
+    if not row or row[0] is None or row[0] < 0:
+        return None
+    return int(row[0])
+
+
+class EstimatedCountPaginator(Paginator):
+    """
+    Paginator for admin changelists on large tables. Counts exactly up to
+    EXACT_LIMIT rows with a LIMITed count; past that an unfiltered list uses
+    estimated_table_rows() and a filtered one stops at EXACT_LIMIT + 1 and
+    sets ``truncated`` (LargeTableAdmin tells the user to narrow the filter
+    to reach the rest), so a page never counts a large table in full.
+    Pair it with ``show_full_result_count = False`` on the ModelAdmin.
+    """
+    EXACT_LIMIT = 10_000
+    truncated = False
+
+    @cached_property
+    def count(self):
+        queryset = self.object_list
+        if not hasattr(queryset, 'query'):
+            return len(queryset)
+        capped = queryset.order_by()[:self.EXACT_LIMIT + 1].count()
+        if capped <= self.EXACT_LIMIT:
+            return capped
+        if queryset.query.has_filters():
+            self.truncated = True
+            return capped
+        estimate = estimated_table_rows(queryset.model, queryset.db)
+        if estimate is None:
+            return queryset.count()
+        return max(estimate, capped)
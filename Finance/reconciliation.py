@@ -0,0 +1,266 @@
+import csv
+import re
+from collections import defaultdict
+from dataclasses import dataclass, field
+from datetime import date, datetime
+from decimal import Decimal, InvalidOperation
+
+from django.db import transaction
+from django.utils import timezone
+
+from . import rollups
+from .aging import LEDGERS
+from .signals import invoices_bulk_updated
+
+DATE_WINDOW_DAYS = 15
+NAME_THRESHOLD = 0.5
+
+# Statuses a bank payment can settle
+RECONCILABLE_STATUSES = {
+    'AR': ('OUTSTANDING', 'OVERDUE', 'IN_TRANSIT'),
+    'AP': ('OUTSTANDING', 'OVERDUE'),
+}
+
+CSV_ALIASES = {
+    'date': ('date', 'posted', 'booking_date', 'value_date'),
+    'amount': ('amount', 'value'),
+    'description': ('description', 'name', 'payee', 'memo', 'details'),
+    'reference': ('reference', 'ref', 'fitid', 'id'),
+}
+
+
+@dataclass
+class StatementLine:
+    line_no: int
+    date: date
+    amount: Decimal
+    description: str = ''
+    reference: str = ''
+
+    @property
+    def ledger(self):
+        """Money in settles customer invoices, money out settles vendor invoices."""
+        return 'AR' if self.amount > 0 else 'AP'
+
+
+@dataclass
+class Match:
+    line: StatementLine
+    ledger: str
+    invoice_pk: int
+    invoice_number: str
+    party_id: int
+    method: str  # 'exact' or 'fuzzy'
+    score: float = 1.0
+
+
+@dataclass
+class ReconciliationResult:
+    matches: list = field(default_factory=list)
+    unmatched: list = field(default_factory=list)  # (line, reason)
+
+
+# === STATEMENT PARSING ===
+def _parse_date(value):
+    value = (value or '').strip()
+    if re.fullmatch(r'\d{8}.*', value):  # OFX: YYYYMMDD[HHMMSS[.XXX][TZ]]
+        return datetime.strptime(value[:8], '%Y%m%d').date()
+    for fmt in ('%Y-%m-%d', '%d/%m/%Y', '%m/%d/%Y'):
+        try:
+            return datetime.strptime(value, fmt).date()
+        except ValueError:
+            continue
+    raise ValueError(f"unrecognised date {value!r}")
+
+
+def _parse_amount(value):
+    try:
+        return Decimal((value or '').strip().replace(',', ''))
+    except InvalidOperation:
+        raise ValueError(f"unrecognised amount {value!r}")
+
+
+def read_csv_statement(fh):
+    reader = csv.DictReader(fh)
+    headers = {h.strip().lower(): h for h in reader.fieldnames or []}
+    columns = {}
+    for name, aliases in CSV_ALIASES.items():
+        columns[name] = next((headers[a] for a in aliases if a in headers), None)
+    if not columns['date'] or not columns['amount']:
+        raise ValueError("statement CSV needs at least date and amount columns")
+
+    for line_no, row in enumerate(reader, start=2):
+        yield StatementLine(
+            line_no=line_no,
+            date=_parse_date(row[columns['date']]),
+            amount=_parse_amount(row[columns['amount']]),
+            description=(row.get(columns['description']) or '') if columns['description'] else '',
+            reference=(row.get(columns['reference']) or '') if columns['reference'] else '',
+        )
+
+
+OFX_TAG = re.compile(r'<(\w+)>([^<\r\n]*)')
+
+
+def read_ofx_statement(fh):
+    """Reads the <STMTTRN> blocks of an OFX/QFX file (SGML or XML flavour)."""
+    text = fh.read()
+    for number, block in enumerate(re.findall(r'<STMTTRN>(.*?)</STMTTRN>', text, re.S | re.I), start=1):
+        tags = {tag.upper(): value.strip() for tag, value in OFX_TAG.findall(block)}
+        yield StatementLine(
+            line_no=number,
+            date=_parse_date(tags.get('DTPOSTED')),
+            amount=_parse_amount(tags.get('TRNAMT')),
+            description=' '.join(filter(None, [tags.get('NAME'), tags.get('MEMO')])),
+            reference=tags.get('CHECKNUM') or tags.get('REFNUM') or tags.get('FITID', ''),
+        )
+
+
+def read_statement(path):
+    with open(path, 'r', encoding='utf-8', newline='') as fh:
+        if str(path).lower().endswith(('.ofx', '.qfx')):
+            return list(read_ofx_statement(fh))
+        return list(read_csv_statement(fh))
+
+
+# === MATCHING ===
+def _normalize_number(value):
+    return re.sub(r'[^A-Z0-9]', '', (value or '').upper())
+
+
+def _words(value):
+    return set(re.findall(r'[a-z0-9]+', (value or '').lower()))
+
+
+class OpenBook:
+    """
+    Open invoices of one ledger indexed by normalized invoice number and by
+    amount. Built with one query; every lookup afterwards is a dict hit, so
+    matching n lines costs O(n) plus the size of each amount bucket.
+    """
+
+    def __init__(self, ledger):
+        conf = LEDGERS[ledger]
+        party = conf['party']
+        self.ledger = ledger
+        self.by_number = {}
+        self.by_amount = defaultdict(list)
+        self.taken = set()
+        rows = (
+            conf['model'].objects
+            .filter(status__in=RECONCILABLE_STATUSES[ledger])
+            .values_list('pk', 'invoice_number', 'amount', 'due_date', party + '_id', party + '__name')
+            .iterator(chunk_size=5000)
+        )
+        for pk, number, amount, due_date, party_id, party_name in rows:
+            invoice = {
+                'pk': pk,
+                'invoice_number': number,
+                'amount': amount,
+                'due_date': due_date,
+                'party_id': party_id,
+                'party_words': _words(party_name),
+            }
+            self.by_number[_normalize_number(number)] = invoice
+            self.by_amount[amount].append(invoice)
+
+    def take(self, invoice):
+        self.taken.add(invoice['pk'])
+
+    def exact(self, line):
+        """An open invoice whose number appears in the line's reference or text, for the same amount."""
+        candidates = [line.reference] + re.split(r'[\s,;:/#]+', f"{line.reference} {line.description}")
+        for token in candidates:
+            invoice = self.by_number.get(_normalize_number(token))
+            if invoice and invoice['pk'] not in self.taken and invoice['amount'] == abs(line.amount):
+                return invoice
+        return None
+
+    def fuzzy(self, line, window_days, threshold):
+        """
+        Same amount, due within ``window_days`` of the line date and a party
+        name mostly found in the description. Ambiguous ties are not matched.
+        Returns (invoice, score) or (None, reason).
+        """
+        words = _words(line.description)
+        scored = []
+        for invoice in self.by_amount.get(abs(line.amount), ()):
+            if invoice['pk'] in self.taken:
+                continue
+            distance = abs((line.date - invoice['due_date']).days)
+            if distance > window_days or not invoice['party_words']:
+                continue
+            score = len(invoice['party_words'] & words) / len(invoice['party_words'])
+            if score >= threshold:
+                scored.append((score, -distance, invoice))
+        if not scored:
+            return None, "no open invoice with this amount, date and party"
+        scored.sort(key=lambda item: (item[0], item[1]), reverse=True)
+        if len(scored) > 1 and scored[0][:2] == scored[1][:2]:
+            return None, "ambiguous: several invoices match equally"
+        return scored[0][2], scored[0][0]
+
+
+def match_statement(lines, ledgers=('AR', 'AP'), window_days=DATE_WINDOW_DAYS, threshold=NAME_THRESHOLD):
+    """
+    Matches statement lines to open invoices: first every line by invoice
+    number (exact), then the leftovers by amount + date window + party name.
+    """
+    books = {ledger: OpenBook(ledger) for ledger in ledgers}
+    result = ReconciliationResult()
+    pending = []
+
+    for line in lines:
+        book = books.get(line.ledger)
+        if book is None or line.amount == 0:
+            result.unmatched.append((line, "ledger not reconciled"))
+            continue
+        invoice = book.exact(line)
+        if invoice:
+            book.take(invoice)
+            result.matches.append(Match(line, book.ledger, invoice['pk'], invoice['invoice_number'], invoice['party_id'], 'exact'))
+        else:
+            pending.append(line)
+
+    for line in pending:
+        book = books[line.ledger]
+        invoice, score = book.fuzzy(line, window_days, threshold)
+        if invoice:
+            book.take(invoice)
+            result.matches.append(Match(line, book.ledger, invoice['pk'], invoice['invoice_number'], invoice['party_id'], 'fuzzy', score))
+        else:
+            result.unmatched.append((line, score))
+    return result
+
+
+# === APPLY ===
+def apply_matches(matches, batch_size=900):
+    """
+    Marks the matched invoices PAID with the statement date as payment_date,
+    inside a single transaction. Invoices are grouped by payment date so each
+    group is a plain UPDATE ... WHERE id IN (...) (a statement has few distinct
+    dates), avoiding bulk_update's per-row CASE. Rows that stopped being open
+    in the meantime are left untouched. Returns {ledger: rows updated}.
+    """
+    now = timezone.now()
+    groups = defaultdict(list)
+    for match in matches:
+        groups[(match.ledger, match.line.date)].append(match.invoice_pk)
+
+    updated = defaultdict(int)
+    with transaction.atomic():
+        for (ledger, payment_date), pks in groups.items():
+            open_invoices = LEDGERS[ledger]['model'].objects.filter(status__in=RECONCILABLE_STATUSES[ledger])
+            for start in range(0, len(pks), batch_size):
+                updated[ledger] += rollups.update_queryset(
+                    ledger, open_invoices.filter(pk__in=pks[start:start + batch_size]),
+                    status='PAID', payment_date=payment_date, updated_at=now,
+                )
+
+    for ledger in updated:
+        invoices_bulk_updated.send(
+            sender=LEDGERS[ledger]['model'],
+            party_ids={m.party_id for m in matches if m.ledger == ledger},
+            changes={'status': 'PAID'},
+        )
+    return dict(updated)
@@ -0,0 +1,228 @@
+from collections import defaultdict
+from datetime import timedelta
+from decimal import Decimal
+
+from django.db import transaction
+from django.db.models import Count, F, Sum
+from django.db.models.functions import TruncMonth
+
+from . import audit
+from .aging import LEDGERS
+from .models import DailyInvoiceRollup, MonthlyInvoiceRollup
+
+# Invoices are counted on the day they were issued (date_issued) under their
+# party's company code and their current status. A status change moves the
+# invoice between rows of the same period; it is never counted twice.
+GRAINS = {
+    'daily': DailyInvoiceRollup,
+    'monthly': MonthlyInvoiceRollup,
+}
+
+
+def month_start(day):
+    return day.replace(day=1)
+
+
+def next_month(day):
+    return (month_start(day) + timedelta(days=32)).replace(day=1)
+
+
+# === INCREMENTAL UPDATES (used by the save/delete hooks) ===
+def contribution(company_code, status, date_issued, amount):
+    """The (company_code, status, day) key and amount a single invoice adds."""
+    if company_code is None or date_issued is None:
+        return None
+    return (company_code, status, date_issued), amount
+
+
+def row_contribution(ledger, row):
+    """Contribution of a row returned by aging.stored_row()."""
+    if row is None:
+        return None
+    company_field = LEDGERS[ledger]['party'] + '__company_code'
+    return contribution(row[company_field], row['status'], row['date_issued'], row['amount'])
+
+
+def instance_contribution(ledger, invoice):
+    party = getattr(invoice, LEDGERS[ledger]['party'])
+    return contribution(party.company_code, invoice.status, invoice.date_issued, invoice.amount)
+
+
+def _apply(ledger, deltas):
+    """
+    Adds ``deltas`` ({(company_code, status, day): [count, amount]}) to the
+    daily rows and, summed per month, to the monthly rows. Keys that net to
+    zero are skipped, so an edit that doesn't touch status, date or amount
+    writes nothing.
+    """
+    monthly = defaultdict(lambda: [0, Decimal(0)])
+    for (company_code, status, day), (count, amount) in deltas.items():
+        totals = monthly[(company_code, status, month_start(day))]
+        totals[0] += count
+        totals[1] += amount
+
+    with transaction.atomic():
+        for model, rows in ((DailyInvoiceRollup, deltas), (MonthlyInvoiceRollup, monthly)):
+            for (company_code, status, period), (count, amount) in rows.items():
+                if not count and not amount:
+                    continue
+                lookup = {'ledger': ledger, 'company_code': company_code, 'status': status, 'period': period}
+                if count > 0:
+                    model.objects.get_or_create(**lookup)
+                model.objects.filter(**lookup).update(
+                    invoice_count=F('invoice_count') + count,
+                    amount=F('amount') + amount,
+                )
+
+
+def apply_change(ledger, old, new):
+    """Moves an invoice from its ``old`` contribution to its ``new`` one."""
+    if old == new:
+        return
+    deltas = defaultdict(lambda: [0, Decimal(0)])
+    for contrib, sign in ((old, -1), (new, +1)):
+        if contrib is not None:
+            key, amount = contrib
+            deltas[key][0] += sign
+            deltas[key][1] += amount * sign
+    _apply(ledger, deltas)
+
+
+def _grouped(ledger, invoices):
+    """(company_code, status, date_issued, count, amount) groups of a queryset."""
+    company_field = LEDGERS[ledger]['party'] + '__company_code'
+    return (
+        invoices
+        .values_list(company_field, 'status', 'date_issued')
+        .order_by()
+        .annotate(Count('pk'), Sum('amount'))
+    )
+
+
+def update_queryset(ledger, invoices, **changes):
+    """
+    queryset.update() for bulk status changes, with the rollups moved and the
+    audit log written in the same transaction: the rows are grouped by their
+    current status before the UPDATE and the groups moved to the new one
+    after it. Returns the number of rows updated.
+    """
+    with transaction.atomic():
+        # Nobody changes the rows between the grouping, the audit entries
+        # (which read the old values) and the UPDATE
+        audit.lock(invoices)
+        groups = list(_grouped(ledger, invoices)) if 'status' in changes else []
+        audit.record_bulk_update(invoices, changes)
+        updated = invoices.order_by().update(**changes)
+
+        deltas = defaultdict(lambda: [0, Decimal(0)])
+        for company_code, status, day, count, amount in groups:
+            for key, sign in (((company_code, status, day), -1), ((company_code, changes['status'], day), +1)):
+                deltas[key][0] += count * sign
+                deltas[key][1] += amount * sign
+        _apply(ledger, deltas)
+    return updated
+
+
+def add_created(ledger, invoices):
+    """Counts invoices inserted with bulk_create (which skips the save hooks)."""
+    conf = LEDGERS[ledger]
+    party_field = conf['party'] + '_id'
+    codes = dict(
+        conf['party_model'].objects
+        .filter(pk__in={getattr(i, party_field) for i in invoices})
+        .values_list('pk', 'company_code')
+    )
+    deltas = defaultdict(lambda: [0, Decimal(0)])
+    for invoice in invoices:
+        key = (codes[getattr(invoice, party_field)], invoice.status, invoice.date_issued)
+        deltas[key][0] += 1
+        deltas[key][1] += invoice.amount
+    _apply(ledger, deltas)
+
+
+def move_party(ledger, party_id, old_code, new_code):
+    """Moves a party's invoices to its new company code."""
+    party = LEDGERS[ledger]['party']
+    invoices = LEDGERS[ledger]['model'].objects.filter(**{party + '_id': party_id})
+    deltas = defaultdict(lambda: [0, Decimal(0)])
+    for status, day, count, amount in invoices.values_list('status', 'date_issued').order_by().annotate(Count('pk'), Sum('amount')):
+        for code, sign in ((old_code, -1), (new_code, +1)):
+            deltas[(code, status, day)][0] += count * sign
+            deltas[(code, status, day)][1] += amount * sign
+    _apply(ledger, deltas)
+
+
+# === FULL REBUILD (backfill) ===
+def rebuild(ledger, start, end):
+    """
+    Recomputes the rollups of invoices issued in [start, end) from the
+    invoice table. ``start`` and ``end`` must be first days of a month, so the
+    monthly rows are rebuilt whole. Returns (daily rows, monthly rows) written.
+    """
+    invoices = LEDGERS[ledger]['model'].objects.filter(date_issued__gte=start, date_issued__lt=end)
+    with transaction.atomic():
+        daily = [
+            DailyInvoiceRollup(ledger=ledger, company_code=code, status=status, period=day, invoice_count=count, amount=amount)
+            for code, status, day, count, amount in _grouped(ledger, invoices)
+        ]
+        DailyInvoiceRollup.objects.filter(ledger=ledger, period__gte=start, period__lt=end).delete()
+        DailyInvoiceRollup.objects.bulk_create(daily, batch_size=500)
+
+        monthly = [
+            MonthlyInvoiceRollup(ledger=ledger, company_code=code, status=status, period=month, invoice_count=count, amount=amount)
+            for code, status, month, count, amount in (
+                DailyInvoiceRollup.objects
+                .filter(ledger=ledger, period__gte=start, period__lt=end)
+                .values_list('company_code', 'status', TruncMonth('period'))
+                .order_by()
+                .annotate(Sum('invoice_count'), Sum('amount'))
+            )
+        ]
+        MonthlyInvoiceRollup.objects.filter(ledger=ledger, period__gte=start, period__lt=end).delete()
+        MonthlyInvoiceRollup.objects.bulk_create(monthly, batch_size=500)
+    return len(daily), len(monthly)
+
+
+# === READ HELPERS ===
+def status_columns(ledger):
+    return [code for code, _ in LEDGERS[ledger]['model'].STATUS_CHOICES]
+
+
+def _pivot(ledger, rows, key):
+    """One line per ``key`` value with the amount of each status, the total and the count."""
+    statuses = status_columns(ledger)
+    lines = {}
+    for row in rows:
+        line = lines.setdefault(row[key], {key: row[key], 'by_status': dict.fromkeys(statuses, Decimal(0)), 'total': Decimal(0), 'count': 0})
+        # .get(): statuses no longer in STATUS_CHOICES still add to the total
+        line['by_status'][row['status']] = line['by_status'].get(row['status'], Decimal(0)) + row['total']
+        line['total'] += row['total']
+        line['count'] += row['count']
+    for line in lines.values():
+        line['cells'] = [line['by_status'][status] for status in statuses]
+    return [lines[k] for k in sorted(lines)]
+
+
+def period_report(ledger, start, end, grain='monthly', company_code=None):
+    """
+    Amount per period and status for invoices issued in [start, end), plus the
+    same per company code. Reads only the rollup table of ``grain``.
+    """
+    rollups = GRAINS[grain].objects.filter(ledger=ledger, period__gte=start, period__lt=end)
+    if company_code:
+        rollups = rollups.filter(company_code=company_code)
+    totals = {'count': Sum('invoice_count'), 'total': Sum('amount')}
+    periods = _pivot(ledger, rollups.values('period', 'status').order_by().annotate(**totals), 'period')
+    companies = _pivot(ledger, rollups.values('company_code', 'status').order_by().annotate(**totals), 'company_code')
+    statuses = status_columns(ledger)
+    return {
+        'statuses': statuses,
+        'periods': periods,
+        'companies': companies,
+        'total': {
+            'cells': [sum((line['cells'][i] for line in companies), Decimal(0)) for i in range(len(statuses))],
+            'total': sum((line['total'] for line in companies), Decimal(0)),
+            'count': sum(line['count'] for line in companies),
+        },
+    }
+
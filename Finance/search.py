@@ -0,0 +1,170 @@
+import re
+
+from django.db import connection, transaction
+from django.db.models import Q
+
+from .models import Customer, Vendor
+
+PAGE_SIZE = 20
+AUTOCOMPLETE_LIMIT = 10
+
+# Columns the autocomplete matches on and returns; they are stored in the
+# FTS table, so a suggestion never touches the party table.
+AUTOCOMPLETE_COLUMNS = ['name', 'email']
+
+# Per party type: model, FTS5 table and the columns copied into it.
+# rowid of the FTS row is the party's pk.
+INDEXES = {
+    'customer': {
+        'model': Customer,
+        'table': 'finance_customer_fts',
+        'columns': ['name', 'email', 'phone_number', 'company_code', 'address'],
+    },
+    'vendor': {
+        'model': Vendor,
+        'table': 'finance_vendor_fts',
+        'columns': ['name', 'email', 'phone_number', 'company_code', 'company', 'tax_id', 'address'],
+    },
+}
+
+# Column weights for bm25(): a hit on the name ranks above one in the address
+WEIGHTS = {'name': 10.0, 'email': 5.0, 'company_code': 3.0, 'company': 3.0, 'tax_id': 5.0, 'phone_number': 2.0, 'address': 1.0}
+
+
+def fts_enabled():
+    return connection.vendor == 'sqlite'
+
+
+def create_sql(kind):
+    conf = INDEXES[kind]
+    return (
+        f"CREATE VIRTUAL TABLE IF NOT EXISTS {conf['table']} USING fts5("
+        f"{', '.join(conf['columns'])}, tokenize='unicode61 remove_diacritics 2')"
+    )
+
+
+def match_expression(query, columns=None):
+    """
+    Turns free text into an FTS5 MATCH expression: every word must match,
+    and every word is a prefix ("acm" finds "Acme"). ``columns`` restricts
+    the match to those columns. Returns '' when the query has no searchable
+    characters.
+    """
+    words = re.findall(r'\w+', query or '')
+    prefix = f"{{{' '.join(columns)}}} : " if columns else ''
+    return ' '.join(f'{prefix}"{word}"*' for word in words)
+
+
+# === INDEX MAINTENANCE ===
+def index_party(kind, party):
+    """Inserts or replaces the index row of one customer/vendor."""
+    if not fts_enabled():
+        return
+    conf = INDEXES[kind]
+    columns = conf['columns']
+    with connection.cursor() as cursor:
+        cursor.execute(f"DELETE FROM {conf['table']} WHERE rowid = %s", [party.pk])
+        cursor.execute(
+            f"INSERT INTO {conf['table']} (rowid, {', '.join(columns)}) VALUES (%s, {', '.join(['%s'] * len(columns))})",
+            [party.pk] + [getattr(party, column) or '' for column in columns],
+        )
+
+
+def remove_party(kind, pk):
+    if not fts_enabled():
+        return
+    with connection.cursor() as cursor:
+        cursor.execute(f"DELETE FROM {INDEXES[kind]['table']} WHERE rowid = %s", [pk])
+
+
+def rebuild(kind):
+    """Drops and refills the index of one party type with a single INSERT ... SELECT."""
+    conf = INDEXES[kind]
+    columns = conf['columns']
+    source = conf['model']._meta.db_table
+    select_columns = ', '.join(f"COALESCE({column}, '')" for column in columns)
+    with transaction.atomic(), connection.cursor() as cursor:
+        cursor.execute(f"DROP TABLE IF EXISTS {conf['table']}")
+        cursor.execute(create_sql(kind))
+        cursor.execute(
+            f"INSERT INTO {conf['table']} (rowid, {', '.join(columns)}) "
+            f"SELECT id, {select_columns} FROM {source}"
+        )
+        cursor.execute(f"SELECT count(*) FROM {conf['table']}")
+        return cursor.fetchone()[0]
+
+
+# === QUERIES ===
+def search(kind, query, page=1, page_size=PAGE_SIZE):
+    """
+    Ranked search over name, email, phone, company code, tax id and address.
+    Returns (parties, has_next) for the requested page; reads page_size + 1
+    ids from the index and loads the parties with one IN query.
+    """
+    conf = INDEXES[kind]
+    offset = (page - 1) * page_size
+
+    if not fts_enabled():
+        return _fallback_search(kind, query, offset, page_size)
+
+    expression = match_expression(query)
+    if not expression:
+        return [], False
+
+    weights = ', '.join(str(WEIGHTS[column]) for column in conf['columns'])
+    with connection.cursor() as cursor:
+        cursor.execute(
+            f"SELECT rowid FROM {conf['table']} WHERE {conf['table']} MATCH %s "
+            f"ORDER BY bm25({conf['table']}, {weights}) LIMIT %s OFFSET %s",
+            [expression, page_size + 1, offset],
+        )
+        ids = [row[0] for row in cursor.fetchall()]
+
+    has_next = len(ids) > page_size
+    ids = ids[:page_size]
+    parties = conf['model'].objects.in_bulk(ids)
+    return [parties[pk] for pk in ids if pk in parties], has_next
+
+
+def _fallback_search(kind, query, offset, page_size):
+    """icontains over the same columns for databases without FTS5."""
+    conf = INDEXES[kind]
+    condition = Q()
+    for word in re.findall(r'\w+', query or ''):
+        word_match = Q()
+        for column in conf['columns']:
+            word_match |= Q(**{column + '__icontains': word})
+        condition &= word_match
+    if not condition:
+        return [], False
+    rows = list(conf['model'].objects.filter(condition).order_by('name', 'pk')[offset:offset + page_size + 1])
+    return rows[:page_size], len(rows) > page_size
+
+
+def autocomplete(kind, query, limit=AUTOCOMPLETE_LIMIT):
+    """
+    Prefix suggestions for the party selectors: [{'id', 'name', 'email'}]
+    plus whether more rows match. One indexed query against the FTS table.
+    """
+    conf = INDEXES[kind]
+    if not fts_enabled():
+        prefix = (query or '').strip()
+        if not prefix:
+            return [], False
+        rows = list(
+            conf['model'].objects.filter(name__istartswith=prefix)
+            .order_by('name', 'pk').values('pk', *AUTOCOMPLETE_COLUMNS)[:limit + 1]
+        )
+        return [{'id': row['pk'], 'name': row['name'], 'email': row['email']} for row in rows[:limit]], len(rows) > limit
+
+    expression = match_expression(query, AUTOCOMPLETE_COLUMNS)
+    if not expression:
+        return [], False
+    with connection.cursor() as cursor:
+        cursor.execute(
+            f"SELECT rowid, {', '.join(AUTOCOMPLETE_COLUMNS)} FROM {conf['table']} "
+            f"WHERE {conf['table']} MATCH %s ORDER BY rank LIMIT %s",
+            [expression, limit + 1],
+        )
+        rows = cursor.fetchall()
+    return [{'id': pk, 'name': name, 'email': email} for pk, name, email in rows[:limit]], len(rows) > limit
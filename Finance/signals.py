@@ -0,0 +1,190 @@
+from django.db.models.signals import post_delete, post_save, pre_save
+from django.dispatch import Signal, receiver
+
+from . import aging, audit, caching, numbering, rollups, search
+from .models import AgingSummary, Customer, CustomerInvoice, Vendor, VendorInvoice
+
+# Sent after a queryset.update() on an invoice model (those skip
+# pre_save/post_save). Arguments: party_ids (set of customer/vendor ids
+# touched) and changes (dict of the fields written). The revenue/spend
+# rollups and the audit log need the old values, gone by then: the senders
+# run the UPDATE through rollups.update_queryset().
+invoices_bulk_updated = Signal()
+
+
+# ==================================
+# === INVOICE NUMBERS ====
+# ==================================
+
+@receiver(pre_save, sender=CustomerInvoice)
+@receiver(pre_save, sender=VendorInvoice)
+def assign_invoice_number(sender, instance, **kwargs):
+    """
+    Invoices saved without a number get the next one of their party's company
+    code. save() already numbers them before its transaction
+    (models.InvoiceSaveMixin); this covers save_base() callers such as loaddata.
+    """
+    numbering.assign_invoice_number(instance)
+
+
+# ==================================
+# === AGING SUMMARY ====
+# ==================================
+
+@receiver(pre_save, sender=CustomerInvoice)
+@receiver(pre_save, sender=VendorInvoice)
+def remember_stored_invoice(sender, instance, **kwargs):
+    """Keeps the row as stored before this save, for the post_save hooks below."""
+    ledger = aging.ledger_for(sender)
+    instance._stored_row = aging.stored_row(ledger, instance.pk) if instance.pk else None
+
+
+@receiver(post_save, sender=CustomerInvoice)
+@receiver(post_save, sender=VendorInvoice)
+def update_aging_on_save(sender, instance, created, **kwargs):
+    ledger = aging.ledger_for(sender)
+    old = None if created else aging.row_contribution(ledger, getattr(instance, '_stored_row', None))
+    aging.apply_change(ledger, old, aging.instance_contribution(ledger, instance))
+
+
+@receiver(post_delete, sender=CustomerInvoice)
+@receiver(post_delete, sender=VendorInvoice)
+def update_aging_on_delete(sender, instance, **kwargs):
+    ledger = aging.ledger_for(sender)
+    aging.apply_change(ledger, aging.instance_contribution(ledger, instance), None)
+
+
+@receiver(invoices_bulk_updated)
+def update_aging_on_bulk_update(sender, party_ids, changes, **kwargs):
+    """Bulk updates that close invoices or move amounts/dates rebuild the touched parties."""
+    ledger = aging.ledger_for(sender)
+    open_statuses = aging.LEDGERS[ledger]['open_statuses']
+    closes = 'status' in changes and changes['status'] not in open_statuses
+    if closes or {'amount', 'due_date'} & set(changes):
+        aging.rebuild(ledger, party_ids=party_ids)
+
+
+@receiver(post_save, sender=Customer)
+def sync_customer_company_code(sender, instance, **kwargs):
+    AgingSummary.objects.filter(customer=instance).exclude(company_code=instance.company_code).update(company_code=instance.company_code)
+
+
+@receiver(post_save, sender=Vendor)
+def sync_vendor_company_code(sender, instance, **kwargs):
+    AgingSummary.objects.filter(vendor=instance).exclude(company_code=instance.company_code).update(company_code=instance.company_code)
+
+
+# ==================================
+# === REVENUE / SPEND ROLLUPS ====
+# ==================================
+
+@receiver(post_save, sender=CustomerInvoice)
+@receiver(post_save, sender=VendorInvoice)
+def update_rollups_on_save(sender, instance, created, **kwargs):
+    ledger = aging.ledger_for(sender)
+    old = None if created else rollups.row_contribution(ledger, getattr(instance, '_stored_row', None))
+    rollups.apply_change(ledger, old, rollups.instance_contribution(ledger, instance))
+
+
+@receiver(post_delete, sender=CustomerInvoice)
+@receiver(post_delete, sender=VendorInvoice)
+def update_rollups_on_delete(sender, instance, **kwargs):
+    ledger = aging.ledger_for(sender)
+    rollups.apply_change(ledger, rollups.instance_contribution(ledger, instance), None)
+
+
+@receiver(pre_save, sender=Customer)
+@receiver(pre_save, sender=Vendor)
+def remember_stored_party(sender, instance, **kwargs):
+    """The party as stored before this save, for the rollup and audit hooks."""
+    fields = [f.attname for f in sender._meta.concrete_fields]
+    instance._stored_row = sender.objects.filter(pk=instance.pk).values(*fields).first() if instance.pk else None
+
+
+@receiver(post_save, sender=Customer)
+@receiver(post_save, sender=Vendor)
+def move_rollups_on_company_change(sender, instance, created, **kwargs):
+    old_code = (getattr(instance, '_stored_row', None) or {}).get('company_code')
+    if not created and old_code and old_code != instance.company_code:
+        ledger = 'AR' if sender is Customer else 'AP'
+        rollups.move_party(ledger, instance.pk, old_code, instance.company_code)
+
+
+# ==================================
+# === AUDIT LOG ====
+# ==================================
+
+@receiver(post_save, sender=CustomerInvoice)
+@receiver(post_save, sender=VendorInvoice)
+@receiver(post_save, sender=Customer)
+@receiver(post_save, sender=Vendor)
+def audit_save(sender, instance, created, **kwargs):
+    audit.record(audit.entries_for_save(instance, getattr(instance, '_stored_row', None), created))
+
+
+@receiver(post_delete, sender=CustomerInvoice)
+@receiver(post_delete, sender=VendorInvoice)
+@receiver(post_delete, sender=Customer)
+@receiver(post_delete, sender=Vendor)
+def audit_delete(sender, instance, **kwargs):
+    audit.record(audit.entries_for_delete(instance))
+
+
+# ==================================
+# === PARTY SEARCH INDEX ====
+# ==================================
+
+@receiver(post_save, sender=Customer)
+def index_customer(sender, instance, **kwargs):
+    search.index_party('customer', instance)
+
+
+@receiver(post_save, sender=Vendor)
+def index_vendor(sender, instance, **kwargs):
+    search.index_party('vendor', instance)
+
+
+@receiver(post_delete, sender=Customer)
+def unindex_customer(sender, instance, **kwargs):
+    search.remove_party('customer', instance.pk)
+
+
+@receiver(post_delete, sender=Vendor)
+def unindex_vendor(sender, instance, **kwargs):
+    search.remove_party('vendor', instance.pk)
+
+
+# ==================================
+# === DASHBOARD CACHE ====
+# ==================================
+
+def _party_ids(ledger, instance):
+    """Current party of the invoice plus the stored one, in case it was reassigned."""
+    party_field = aging.LEDGERS[ledger]['party'] + '_id'
+    ids = {getattr(instance, party_field)}
+    stored = getattr(instance, '_stored_row', None)
+    if stored:
+        ids.add(stored[party_field])
+    return ids
+
+
+@receiver(post_save, sender=CustomerInvoice)
+@receiver(post_save, sender=VendorInvoice)
+@receiver(post_delete, sender=CustomerInvoice)
+@receiver(post_delete, sender=VendorInvoice)
+def invalidate_dashboard(sender, instance, **kwargs):
+    ledger = aging.ledger_for(sender)
+    caching.bump(ledger, _party_ids(ledger, instance))
+
+
+@receiver(invoices_bulk_updated)
+def invalidate_dashboard_bulk(sender, party_ids, **kwargs):
+    caching.bump(aging.ledger_for(sender), party_ids)
+
+
+@receiver(post_save, sender=Customer)
+@receiver(post_save, sender=Vendor)
+def invalidate_dashboard_on_party_save(sender, instance, created, **kwargs):
+    """The cached rows carry the party's name: a rename must not serve the old one."""
+    if not created:
+        caching.bump('AR' if sender is Customer else 'AP', {instance.pk})
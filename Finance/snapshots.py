@@ -0,0 +1,133 @@
+import os
+import tempfile
+import threading
+import time
+from pathlib import Path
+
+from django.conf import settings
+from django.template.loader import render_to_string
+from django.utils.safestring import mark_safe
+
+# Rendered invoice documents on disk, one file per (type, pk, version,
+# variant). The version is the invoice's updated_at plus its party's (the
+# document shows the party name), so any edit produces a new file name and a
+# stale snapshot is never served. Old files are removed by LRU eviction.
+VARIANTS = {
+    'detail': 'Finance/invoice_document.html',
+    'print': 'Finance/invoice_print.html',
+}
+
+DEFAULT_MAX_BYTES = 50 * 1024 * 1024
+EVICT_INTERVAL = 60  # seconds between size checks, per process
+
+_last_eviction = 0.0
+_eviction_lock = threading.Lock()
+
+
+def snapshot_dir():
+    return Path(getattr(settings, 'FINANCE_SNAPSHOT_DIR', None) or Path(settings.BASE_DIR) / 'var' / 'invoice_snapshots')
+
+
+def max_bytes():
+    return getattr(settings, 'FINANCE_SNAPSHOT_MAX_BYTES', None) or DEFAULT_MAX_BYTES
+
+
+def _stamp(value):
+    return int(value.timestamp() * 1_000_000) if value else 0
+
+
+def snapshot_path(invoice, invoice_type, variant):
+    party = getattr(invoice, invoice_type)
+    version = f"{_stamp(invoice.updated_at)}-{_stamp(party.updated_at)}"
+    return snapshot_dir() / invoice_type / f"{invoice.pk}-{version}.{variant}.html"
+
+
+def _write(path, content):
+    """Writes through a temp file + rename, so readers never see half a file."""
+    path.parent.mkdir(parents=True, exist_ok=True)
+    fd, tmp = tempfile.mkstemp(dir=path.parent, suffix='.tmp')
+    try:
+        with os.fdopen(fd, 'w', encoding='utf-8') as fh:
+            fh.write(content)
+        os.replace(tmp, path)
+    except BaseException:
+        os.unlink(tmp)
+        raise
+
+
+def _drop_old_versions(path, invoice_pk, variant):
+    for old in path.parent.glob(f"{invoice_pk}-*.{variant}.html"):
+        if old != path:
+            old.unlink(missing_ok=True)
+
+
+def render_document(invoice, invoice_type, variant='detail'):
+    return render_to_string(VARIANTS[variant], {'invoice': invoice, 'invoice_type': invoice_type})
+
+
+def get_document(invoice, invoice_type, variant='detail'):
+    """
+    The rendered document of ``invoice`` (with its party loaded), from disk
+    when this version was rendered before. A hit refreshes the file's mtime,
+    which is what LRU eviction goes by.
+    """
+    path = snapshot_path(invoice, invoice_type, variant)
+    try:
+        content = path.read_text(encoding='utf-8')
+        os.utime(path)
+        return mark_safe(content)
+    except FileNotFoundError:
+        pass
+
+    content = render_document(invoice, invoice_type, variant)
+    _write(path, content)
+    _drop_old_versions(path, invoice.pk, variant)
+    maybe_evict()
+    return mark_safe(content)
+
+
+# === LRU EVICTION ===
+def evict(limit=None):
+    """
+    Deletes the least recently used snapshots until the directory is under
+    90% of ``limit`` bytes. Returns (files deleted, bytes freed).
+    """
+    limit = limit or max_bytes()
+    entries = []
+    total = 0
+    for root, _, files in os.walk(snapshot_dir()):
+        for name in files:
+            try:
+                stat = os.stat(os.path.join(root, name))
+            except FileNotFoundError:
+                continue
+            entries.append((stat.st_mtime, stat.st_size, os.path.join(root, name)))
+            total += stat.st_size
+    if total <= limit:
+        return 0, 0
+
+    deleted = freed = 0
+    target = limit * 0.9
+    for _, size, path in sorted(entries):
+        if total - freed <= target:
+            break
+        try:
+            os.unlink(path)
+        except FileNotFoundError:
+            continue
+        deleted += 1
+        freed += size
+    return deleted, freed
+
+
+def maybe_evict():
+    """evict(), at most once every EVICT_INTERVAL seconds per process."""
+    global _last_eviction
+    now = time.monotonic()
+    if now - _last_eviction < EVICT_INTERVAL:
+        return
+    with _eviction_lock:
+        if now - _last_eviction < EVICT_INTERVAL:
+            return
+        _last_eviction = now
+    evict()
@@ -0,0 +1,68 @@
+import logging
+import threading
+from datetime import date
+
+from django.db import close_old_connections, transaction
+from django.utils import timezone
+
+from . import rollups
+from .aging import LEDGERS
+from .signals import invoices_bulk_updated
+
+logger = logging.getLogger(__name__)
+
+_scheduler = None
+_scheduler_lock = threading.Lock()
+
+
+def sweep_overdue(today=None):
+    """
+    Flips OUTSTANDING invoices whose due_date has passed to OVERDUE with one
+    UPDATE per table, backed by the (status, due_date) indexes. The WHERE
+    clause is re-evaluated by the UPDATE itself, so rows paid by a web request
+    in the meantime are left alone. Returns {ledger: rows updated}.
+    """
+    today = today or date.today()
+    now = timezone.now()
+    results = {}
+    for ledger, conf in LEDGERS.items():
+        model = conf['model']
+        party_field = conf['party'] + '_id'
+        with transaction.atomic():
+            due = model.objects.filter(status='OUTSTANDING', due_date__lt=today)
+            party_ids = set(due.values_list(party_field, flat=True).distinct())
+            updated = rollups.update_queryset(ledger, due, status='OVERDUE', updated_at=now)
+        if updated:
+            invoices_bulk_updated.send(sender=model, party_ids=party_ids, changes={'status': 'OVERDUE'})
+        results[ledger] = updated
+    return results
+
+
+# === IN-PROCESS SCHEDULE ===
+def _run_forever(interval, stop_event):
+    while not stop_event.wait(interval):
+        close_old_connections()
+        try:
+            results = sweep_overdue()
+            if any(results.values()):
+                logger.info("Overdue sweep: %s", results)
+        except Exception:
+            logger.exception("Overdue sweep failed")
+        finally:
+            close_old_connections()
+
+
+def start_scheduler(interval):
+    """
+    Starts a daemon thread that runs sweep_overdue every ``interval`` seconds.
+    Safe to call more than once; only the first call starts a thread.
+    Returns the Event that stops it.
+    """
+    global _scheduler
+    with _scheduler_lock:
+        if _scheduler is None:
+            stop_event = threading.Event()
+            thread = threading.Thread(target=_run_forever, args=(interval, stop_event), name='overdue-sweeper', daemon=True)
+            thread.start()
+            _scheduler = stop_event
+        return _scheduler
@@ -1,3 +1,398 @@
-from django.test import TestCase
+import csv
+import json
+import tempfile
+from datetime import date, timedelta
+from io import StringIO
+from pathlib import Path
+from unittest import mock
+
+from asgiref.sync import sync_to_async
+from django.contrib import admin
+from django.contrib.auth import get_user_model
+from django.core.management import call_command
+from django.db import connection, transaction
+from django.test import AsyncClient, RequestFactory, TestCase, TransactionTestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.http import HttpResponse
+from django.urls import reverse
+from django.utils import timezone
+from django.utils.http import http_date
+
+from messaging.inbox import direct_conversation
+from messaging.models import Message
+
+from . import audit, caching, numbering
+from .bulk_actions import apply_action
+from .forms import CustomerInvoiceForm
+from .models import AuditLogEntry, Customer, CustomerInvoice, InvoiceNumberSequence, Vendor, VendorInvoice
+from .pagination import EstimatedCountPaginator
+
+
+def make_customer(name='Acme', company_code='USPS'):
+    return Customer.objects.create(name=name, email=f"{name.lower()}@example.com", company_code=company_code)
+
+
+def make_invoice(customer, **fields):
+    fields = {'date_issued': date(2025, 1, 1), 'due_date': date(2025, 2, 1), 'amount': 10, **fields}
+    return CustomerInvoice.objects.create(customer=customer, **fields)
+
+
+# ==================================
+# === INVOICE NUMBERS ====
+# ==================================
+
+class InvoiceNumberingTests(TransactionTestCase):
+    """Outside TestCase's transaction: the in-memory blocks only work between transactions."""
+
+    def setUp(self):
+        self.customer = make_customer()
+        patcher = mock.patch.object(numbering, 'allocator', numbering.NumberAllocator(size=5))
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def sequence_queries(self, queries):
+        return [q['sql'] for q in queries if 'invoicenumbersequence' in q['sql'].lower()]
+
+    def test_numbers_come_from_one_reserved_block(self):
+        make_invoice(self.customer)
+        with CaptureQueriesContext(connection) as queries:
+            second = make_invoice(self.customer)
+            third = make_invoice(self.customer)
+        self.assertEqual(self.sequence_queries(queries), [])
+        self.assertEqual([second.invoice_number, third.invoice_number], ['AR-USPS-000002', 'AR-USPS-000003'])
+        self.assertEqual(InvoiceNumberSequence.objects.get(ledger='AR', company_code='USPS').next_value, 6)
+
+    def test_allocators_of_different_processes_never_share_a_number(self):
+        other_process = numbering.NumberAllocator(size=3)
+        numbers = []
+        for _ in range(8):
+            numbers.append(make_invoice(self.customer).invoice_number)
+            numbers.append(make_invoice(self.customer, invoice_number=other_process.next_number('AR', 'USPS')).invoice_number)
+        self.assertEqual(len(set(numbers)), len(numbers))
+        self.assertEqual(CustomerInvoice.objects.count(), 16)
+
+    def test_new_sequence_starts_after_existing_numbers(self):
+        # Issued before the sequence existed (e.g. by an older version)
+        CustomerInvoice.objects.bulk_create([CustomerInvoice(
+            customer=self.customer, invoice_number='AR-USPS-000041',
+            date_issued=date(2025, 1, 1), due_date=date(2025, 2, 1), amount=1,
+        )])
+        self.assertEqual(make_invoice(self.customer).invoice_number, 'AR-USPS-000042')
+
+    def test_rolled_back_reservation_inside_a_transaction_is_not_reused(self):
+        with self.assertRaises(RuntimeError):
+            with transaction.atomic():
+                make_invoice(self.customer)
+                raise RuntimeError
+        numbers = {make_invoice(self.customer).invoice_number for _ in range(3)}
+        self.assertEqual(len(numbers), 3)
+        self.assertEqual(CustomerInvoice.objects.count(), 3)
+
+
+class ReservedNumberTests(TestCase):
+
+    def setUp(self):
+        self.customer = make_customer()
+
+    def form(self, number, instance=None):
+        return CustomerInvoiceForm(data={
+            'invoice_number': number, 'customer': self.customer.pk, 'due_date': '2025-02-01',
+            'amount': '10', 'status': 'OUTSTANDING',
+        }, instance=instance)
+
+    def test_manual_number_in_the_automatic_format_is_rejected(self):
+        form = self.form('AR-USPS-000500')
+        self.assertFalse(form.is_valid())
+        self.assertIn('invoice_number', form.errors)
+
+    def test_other_formats_and_the_invoice_own_number_are_accepted(self):
+        self.assertTrue(self.form('MANUAL-1').is_valid())
+        invoice = make_invoice(self.customer)
+        self.assertTrue(self.form(invoice.invoice_number, instance=invoice).is_valid())
+
+
+# ==================================
+# === IMPORT ====
+# ==================================
+
+class ImportInvoicesTests(TestCase):
+
+    def setUp(self):
+        self.customer = make_customer()
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        self.directory = Path(directory.name)
+
+    def run_import(self, name, content):
+        path = self.directory / name
+        path.write_text(content, encoding='utf-8')
+        errors = self.directory / 'errors.csv'
+        with self.captureOnCommitCallbacks(execute=True):
+            call_command('import_invoices', str(path), ledger='AR', errors_file=str(errors), stdout=StringIO(), stderr=StringIO())
+        with open(errors, newline='', encoding='utf-8') as fh:
+            return list(csv.reader(fh))
+
+    def test_rows_without_a_number_get_the_next_one(self):
+        errors = self.run_import('ar.csv', (
+            "invoice_number,customer,due_date,amount\n"
+            ",acme@example.com,2025-03-01,12.50\n"
+            "AR-USPS-000099,acme@example.com,2025-03-01,1\n"
+        ))
+        self.assertEqual(CustomerInvoice.objects.get().invoice_number[:8], 'AR-USPS-')
+        self.assertEqual([row[0] for row in errors], ['2'])  # data rows count from 1
+
+    def test_json_lines_that_are_not_objects_are_rejected(self):
+        valid = json.dumps({'invoice_number': 'J1', 'customer': 'acme@example.com', 'due_date': '2025-03-01', 'amount': 3})
+        errors = self.run_import('ar.jsonl', '\n'.join(['[1, 2]', '"x"', valid, '3']) + '\n')
+        self.assertEqual(CustomerInvoice.objects.get().invoice_number, 'J1')
+        self.assertEqual([(row[0], row[2]) for row in errors], [
+            ('1', 'expected a JSON object'), ('2', 'expected a JSON object'), ('4', 'expected a JSON object'),
+        ])
+
+    def test_import_invalidates_the_party_dashboards(self):
+        before = caching.get_version('AR', self.customer.pk)
+        self.run_import('ar.csv', "invoice_number,customer,due_date,amount\nC1,acme@example.com,2025-03-01,1\n")
+        self.assertNotEqual(caching.get_version('AR', self.customer.pk), before)
+
+
+# ==================================
+# === AUDIT LOG ====
+# ==================================
+
+def audit_inserts(queries):
+    return [q['sql'] for q in queries if q['sql'].startswith('INSERT INTO "Finance_auditlogentry"')]
+
+
+class BulkUpdateAuditTests(TestCase):
+
+    def setUp(self):
+        customer = make_customer()
+        self.open = [make_invoice(customer) for _ in range(3)]
+        self.paid = make_invoice(customer, status='PAID', payment_date=date(2025, 1, 15))
+
+    def test_one_entry_per_changed_row_and_field_from_one_statement_per_field(self):
+        pks = [i.pk for i in self.open] + [self.paid.pk]
+        with CaptureQueriesContext(connection) as queries:
+            self.assertEqual(apply_action('AR', pks, 'mark_paid', payment_date=date(2025, 3, 1)), 3)
+        self.assertEqual(len(audit_inserts(queries)), 2)  # status and payment_date, whatever the row count
+        self.assertIn('SELECT', audit_inserts(queries)[0])
+
+        entries = AuditLogEntry.objects.filter(action='update').order_by('object_id', 'field')
+        self.assertEqual(
+            list(entries.values_list('object_id', 'field', 'old_value', 'new_value')),
+            [(i.pk, field, old, new) for i in self.open for field, old, new in (
+                ('payment_date', None, '2025-03-01'), ('status', 'OUTSTANDING', 'PAID'),
+            )],
+        )
+        self.assertEqual({e.object_repr for e in entries}, {i.invoice_number for i in self.open})
+
+    def test_rolled_back_update_leaves_no_entries(self):
+        with self.assertRaises(RuntimeError):
+            with transaction.atomic():
+                apply_action('AR', [i.pk for i in self.open], 'mark_overdue')
+                raise RuntimeError
+        self.assertFalse(AuditLogEntry.objects.filter(action='update').exists())
+
+    @override_settings(FINANCE_AUDIT_LOG=False)
+    def test_nothing_is_written_when_the_log_is_off(self):
+        with CaptureQueriesContext(connection) as queries:
+            apply_action('AR', [i.pk for i in self.open], 'mark_overdue')
+        self.assertEqual(audit_inserts(queries), [])
+
+
+class AuditMiddlewareTests(TransactionTestCase):
+    """Outside TestCase's transaction, so the entries reach the buffer on commit."""
+
+    def setUp(self):
+        self.customer = make_customer()
+        self.staff = get_user_model().objects.create_user('staff', is_staff=True)
+
+    def test_a_request_writes_its_entries_once_when_the_response_is_ready(self):
+        invoice_entries = AuditLogEntry.objects.filter(model='customerinvoice')
+
+        def view(request):
+            for amount in (1, 2, 3):
+                make_invoice(self.customer, amount=amount)  # each save commits on its own
+            self.assertFalse(invoice_entries.exists())
+            return HttpResponse()
+
+        request = RequestFactory().post('/')
+        request.user = self.staff
+        with CaptureQueriesContext(connection) as queries:
+            audit.AuditMiddleware(view)(request)
+        self.assertEqual(len(audit_inserts(queries)), 1)
+        self.assertEqual(list(invoice_entries.values_list('action', 'user_id')), [('create', self.staff.pk)] * 3)
+
+    def test_an_edit_request_logs_each_changed_field(self):
+        invoice = make_invoice(self.customer)
+        AuditLogEntry.objects.all().delete()
+        self.client.force_login(self.staff)
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.post(reverse('edit_customer_invoice', kwargs={'pk': invoice.pk}), {
+                'invoice_number': invoice.invoice_number, 'customer': self.customer.pk,
+                'due_date': '2025-02-01', 'amount': '25.00', 'notes': 'edited', 'status': 'OUTSTANDING',
+            })
+        self.assertEqual(response.status_code, 302)
+        self.assertEqual(len(audit_inserts(queries)), 1)
+        entries = AuditLogEntry.objects.filter(object_id=invoice.pk, user=self.staff)
+        self.assertEqual(sorted(entries.values_list('field', 'new_value')), [('amount', '25.00'), ('notes', 'edited')])
+
+
+# ==================================
+# === INVOICE API ====
+# ==================================
+
+class InvoiceApiConditionalTests(TestCase):
+
+    def setUp(self):
+        self.customer = make_customer()
+        self.invoice = make_invoice(self.customer)
+        staff = get_user_model().objects.create_user('staff', is_staff=True)
+        self.client.force_login(staff)
+        self.list_url = reverse('api_invoice_list', kwargs={'ledger': 'ar'})
+        self.detail_url = reverse('api_invoice_detail', kwargs={'ledger': 'ar', 'pk': self.invoice.pk})
+
+    def test_renaming_the_party_changes_the_etags(self):
+        etags = {url: self.client.get(url)['ETag'] for url in (self.list_url, self.detail_url)}
+        self.assertEqual(self.client.get(self.list_url, HTTP_IF_NONE_MATCH=etags[self.list_url]).status_code, 304)
+
+        self.customer.name = 'Renamed'
+        self.customer.save()
+
+        for url, etag in etags.items():
+            response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+            self.assertEqual(response.status_code, 200, url)
+        self.assertEqual(response.json()['customer_name'], 'Renamed')
+
+    def test_detail_last_modified_follows_the_party(self):
+        later = timezone.now() + timedelta(hours=1)
+        Customer.objects.filter(pk=self.customer.pk).update(updated_at=later)
+        response = self.client.get(self.detail_url)
+        self.assertEqual(response['Last-Modified'], http_date(later.timestamp()))
+
+
+# ==================================
+# === ASYNC VIEWS ====
+# ==================================
+
+class AsyncViewsTests(TestCase):
+    """The async twins must show the same invoices under the same rules as the sync views."""
+
+    def setUp(self):
+        User = get_user_model()
+        self.customer, other = make_customer(), make_customer('Other')
+        self.own = [make_invoice(self.customer), make_invoice(self.customer, status='PAID')]
+        self.foreign = make_invoice(other)
+        self.owner = User.objects.create_user('owner', user_type='C', customer_profile=self.customer)
+        self.staff = User.objects.create_user('staff', is_staff=True)
+
+    async def get_both(self, user, sync_name, async_name, **kwargs):
+        client, async_client = self.client, AsyncClient()
+        await client.aforce_login(user)
+        await async_client.aforce_login(user)
+        sync_response = await sync_to_async(client.get)(reverse(sync_name, kwargs=kwargs))
+        return sync_response, await async_client.get(reverse(async_name, kwargs=kwargs))
+
+    async def test_lists_show_the_same_invoices(self):
+        for user, expected in ((self.staff, {self.own[0].pk, self.foreign.pk}), (self.owner, {i.pk for i in self.own})):
+            with self.subTest(user.username):
+                responses = await self.get_both(user, 'invoice_list', 'invoice_list_async')
+                self.assertEqual([{i.pk for i in r.context['invoices']} for r in responses], [expected, expected])
+
+    async def test_detail_access_rules_match(self):
+        for pk, status in ((self.own[0].pk, 200), (self.foreign.pk, 302), (0, 404)):
+            with self.subTest(pk=pk):
+                responses = await self.get_both(self.owner, 'customer_invoice_detail', 'customer_invoice_detail_async', pk=pk)
+                self.assertEqual([r.status_code for r in responses], [status, status])
+                if status == 302:
+                    self.assertEqual([r.url for r in responses], [reverse('profile')] * 2)
+
+
+# ==================================
+# === ADMIN CHANGELISTS ====
+# ==================================
+
+class AdminChangelistQueryTests(TestCase):
+    """
+    Queries per changelist page (session and user lookups included), pinned
+    at what each page needs today. The count must also stay the same as rows
+    are added: anything that grows with the page is an N+1 in a list column.
+    """
+    BUDGETS = {
+        'Finance.customer': 4,
+        'Finance.vendor': 4,
+        'Finance.customerinvoice': 4,
+        'Finance.vendorinvoice': 4,
+        'Finance.agingsummary': 5,
+        'Finance.dailyinvoicerollup': 8,
+        'Finance.monthlyinvoicerollup': 8,
+        'Finance.auditlogentry': 5,
+        'messaging.conversation': 5,
+        'messaging.message': 6,
+        'accounts.customuser': 4,
+    }
+
+    def setUp(self):
+        self.client.force_login(get_user_model().objects.create_superuser('root', password=None))
+        self.seeded = 0
+
+    def seed(self, rows):
+        """``rows`` of every model above, with their related rows."""
+        User = get_user_model()
+        today = date.today()
+        for i in range(self.seeded, self.seeded + rows):
+            user = User.objects.create_user(f"user-{i}")
+            other = User.objects.create_user(f"user-{i}b")
+            customer = Customer.objects.create(name=f"Customer {i}", email=f"c-{i}@example.com", company_code='USPS')
+            vendor = Vendor.objects.create(name=f"Vendor {i}", email=f"v-{i}@example.com", company_code='USPS')
+            # The hooks add the aging summaries, the rollups and the audit entries
+            CustomerInvoice.objects.create(customer=customer, date_issued=today - timedelta(days=i), due_date=today, amount=10)
+            VendorInvoice.objects.create(vendor=vendor, date_issued=today - timedelta(days=i), due_date=today, amount=10)
+            Message.objects.create(conversation=direct_conversation(user, other), sender=user, content="hi")
+            AuditLogEntry.objects.create(
+                model='customer', object_id=customer.pk, object_repr=customer.name, action='create',
+                user=user, changed_at=timezone.now(),
+            )
+        self.seeded += rows
+
+    def assertChangelistQueries(self):
+        for label, budget in self.BUDGETS.items():
+            app_label, model_name = label.split('.')
+            with self.subTest(label), self.assertNumQueries(budget):
+                response = self.client.get(reverse(f"admin:{app_label}_{model_name}_changelist"))
+                self.assertEqual(response.status_code, 200)
+
+    def test_every_budgeted_model_is_registered(self):
+        registered = {f"{m._meta.app_label}.{m._meta.model_name}" for m in admin.site._registry}
+        self.assertEqual(set(self.BUDGETS) - registered, set())
+
+    def test_queries_per_page_are_fixed(self):
+        self.seed(1)
+        self.assertChangelistQueries()
+        self.seed(20)
+        self.assertChangelistQueries()
+
+
+@mock.patch.object(EstimatedCountPaginator, 'EXACT_LIMIT', 3)
+class EstimatedCountPaginatorTests(TestCase):
+
+    def setUp(self):
+        self.customers = [make_customer(f"Customer{i}") for i in range(6)]
+        self.client.force_login(get_user_model().objects.create_superuser('root', password=None))
+
+    def test_unfiltered_list_past_the_limit_is_estimated_without_a_full_count(self):
+        Customer.objects.filter(pk=self.customers[2].pk).delete()
+        with CaptureQueriesContext(connection) as queries:
+            paginator = EstimatedCountPaginator(Customer.objects.all(), 2)
+            count = paginator.count
+        self.assertEqual(count, self.customers[-1].pk)  # the highest rowid: deleted rows still count
+        self.assertFalse(paginator.truncated)
+        self.assertFalse(any('LIMIT' not in q['sql'] and 'COUNT' in q['sql'] for q in queries))
+
+    def test_filtered_list_past_the_limit_is_capped_and_says_so(self):
+        paginator = EstimatedCountPaginator(Customer.objects.filter(name__startswith='Customer'), 2)
+        self.assertEqual(paginator.count, 4)
+        self.assertTrue(paginator.truncated)
+        response = self.client.get(reverse('admin:Finance_customer_changelist'), {'q': 'Customer'})
+        self.assertContains(response, 'Narrow the search or the filters')
 
-# Create your tests here.
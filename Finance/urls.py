@@ -1,5 +1,5 @@
 from django.urls import path
-from . import views
+from . import api, async_views, views
 
 urlpatterns = [
     path('', views.index, name='index'),
@@ -16,7 +16,23 @@ urlpatterns = [
     path('vendors/', views.vendor_payment_list, name='vendor_payment_list'),
     
     # === DETALLE DE FACTURA (SOLUCIÓN DEL ERROR NoReverseMatch) ===
-    path('invoice/<int:pk>/', views.invoice_detail, name='invoice_detail'), 
+    path('invoice/ar/<int:pk>/', views.invoice_detail, {'invoice_type': 'customer'}, name='customer_invoice_detail'),
+    path('invoice/ap/<int:pk>/', views.invoice_detail, {'invoice_type': 'vendor'}, name='vendor_invoice_detail'),
+    path('invoice/ar/<int:pk>/print/', views.invoice_print, {'invoice_type': 'customer'}, name='customer_invoice_print'),
+    path('invoice/ap/<int:pk>/print/', views.invoice_print, {'invoice_type': 'vendor'}, name='vendor_invoice_print'),
+    path('invoice/ar/<int:pk>/history/', views.invoice_history, {'invoice_type': 'customer'}, name='customer_invoice_history'),
+    path('invoice/ap/<int:pk>/history/', views.invoice_history, {'invoice_type': 'vendor'}, name='vendor_invoice_history'),
+    # Enlaces antiguos sin tipo: redirigen a la ruta AR/AP
+    path('invoice/<int:pk>/', views.legacy_invoice_detail, name='invoice_detail'), 
+
+    # === ASYNC VERSIONS (SERVED UNDER ASGI) ===
+    path('async/invoices/', async_views.invoice_list, name='invoice_list_async'),
+    path('async/vendors/', async_views.vendor_payment_list, name='vendor_payment_list_async'),
+    path('async/invoice/ar/<int:pk>/', async_views.invoice_detail, {'invoice_type': 'customer'}, name='customer_invoice_detail_async'),
+    path('async/invoice/ap/<int:pk>/', async_views.invoice_detail, {'invoice_type': 'vendor'}, name='vendor_invoice_detail_async'),
+
+    # === BULK ACTIONS (STAFF) ===
+    path('bulk/<str:ledger>/', views.bulk_invoice_action, name='bulk_invoice_action'),
 
     # === CRUD - UPDATE & DELETE ===
     path('invoice/<int:pk>/edit/', views.edit_customer_invoice, name='edit_customer_invoice'),
@@ -24,9 +40,23 @@ urlpatterns = [
     path('invoice/<int:pk>/delete/', views.delete_customer_invoice, name='delete_customer_invoice'),
     path('vendor_invoice/<int:pk>/delete/', views.delete_vendor_invoice, name='delete_vendor_invoice'),
 
+    # === REPORTS ===
+    path('reports/aging/', views.aging_report, name='aging_report'),
+    path('reports/revenue/', views.revenue_report, name='revenue_report'),
+    path('reports/cash-flow/', views.cash_flow_forecast, name='cash_flow_forecast'),
+
+    # === EXPORTS ===
+    path('export/<str:ledger>/', views.export_invoices, name='export_invoices'),
+
+    # === JSON API (READ ONLY) ===
+    path('api/<str:ledger>/invoices/', api.invoice_list_api, name='api_invoice_list'),
+    path('api/<str:ledger>/invoices/<int:pk>/', api.invoice_detail_api, name='api_invoice_detail'),
+    path('api/forecast/', api.cash_flow_forecast_api, name='api_cash_flow_forecast'),
+
     # === SEARCH VIEWS ===
     path('search_customers/', views.search_customers, name='search_customers'),
     path('search_vendors/', views.search_vendors, name='search_vendors'),
+    path('autocomplete/<str:kind>/', views.party_autocomplete, name='party_autocomplete'),
 
     # === ADMIN HOME PENDING LISTS ===
     # Comentadas para desactivar dashboard propio
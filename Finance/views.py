@@ -1,13 +1,16 @@
 from datetime import date 
-from django.db.models import Q
+from django.db.models import Q, Value
 from django.shortcuts import render, redirect, get_object_or_404 
 from django.contrib import messages
 from django.contrib.auth.decorators import login_required, user_passes_test
-from django.http import Http404
+from django.http import Http404, HttpResponse, HttpResponseBadRequest, JsonResponse, StreamingHttpResponse
 from django.core.exceptions import ObjectDoesNotExist # Importar explícitamente
 
 from .forms import CustomerInvoiceForm, VendorInvoiceForm
-from .models import Customer, CustomerInvoice, Vendor, VendorInvoice
+from . import aging, audit, exporting, forecast, rollups, search, snapshots
+from .bulk_actions import ACTIONS, apply_action
+from .models import AgingSummary, Customer, CustomerInvoice, Vendor, VendorInvoice
+from .pagination import paginate_request
 
 # === UTILITIES ===
 def staff_required(view_func):
@@ -130,90 +133,293 @@ def add_vendor_invoice(request):
 @login_required
 def invoice_list(request):
     if request.user.is_staff:
-        invoices = CustomerInvoice.objects.filter(status='OUTSTANDING').order_by('-date_issued')
+        invoices = CustomerInvoice.objects.filter(status='OUTSTANDING')
     elif request.user.user_type == 'C':
         try:
             customer = request.user.customer_profile
-            invoices = CustomerInvoice.objects.filter(customer=customer).order_by('-date_issued')
+            invoices = CustomerInvoice.objects.filter(customer=customer)
         except ObjectDoesNotExist:
             invoices = CustomerInvoice.objects.none()
             messages.warning(request, "Customer profile not found.")
     else:
         invoices = CustomerInvoice.objects.none()
 
-    return render(request, "Finance/invoice_list.html", {'invoices': invoices, 'page_title': 'Outstanding AR Invoices'})
+    # Keyset pagination on (date_issued, id): one page per request, no COUNT(*)
+    page = paginate_request(request, invoices.select_related('customer'))
+    return render(request, "Finance/invoice_list.html", {'invoices': page, 'page': page, 'page_title': 'Outstanding AR Invoices'})
 
 @login_required
 def vendor_payment_list(request):
     if request.user.is_staff:
-        invoices = VendorInvoice.objects.filter(status='OUTSTANDING').order_by('-date_issued')
+        invoices = VendorInvoice.objects.filter(status='OUTSTANDING')
     elif request.user.user_type == 'V':
         try:
             vendor = request.user.vendor_profile
-            invoices = VendorInvoice.objects.filter(vendor=vendor).order_by('-date_issued')
+            invoices = VendorInvoice.objects.filter(vendor=vendor)
         except ObjectDoesNotExist:
             invoices = VendorInvoice.objects.none()
             messages.warning(request, "Vendor profile not found.")
     else:
         invoices = VendorInvoice.objects.none()
 
-    return render(request, "Finance/vendor_invoice_list.html", {'invoices': invoices, 'page_title': 'Pending AP Payments'})
+    page = paginate_request(request, invoices.select_related('vendor'))
+    return render(request, "Finance/vendor_invoice_list.html", {'invoices': page, 'page': page, 'page_title': 'Pending AP Payments'})
+
+
+# Detail routes are qualified by type: AR and AP invoices live in separate
+# tables and their pks overlap.
+INVOICE_TYPES = {
+    'customer': CustomerInvoice,
+    'vendor': VendorInvoice,
+}
+
+def _viewable_invoice(request, pk, invoice_type):
+    """
+    The invoice with its party (one query), or None when the user may not see
+    it. Ownership is checked against the profile id already loaded on
+    request.user, so it costs nothing extra.
+    """
+    model = INVOICE_TYPES.get(invoice_type)
+    if model is None:
+        raise Http404("Invoice does not exist.")
+    invoice = get_object_or_404(model.objects.select_related(invoice_type), pk=pk)
+
+    owner_profile_id = getattr(request.user, invoice_type + '_profile_id', None)
+    is_owner = owner_profile_id is not None and owner_profile_id == getattr(invoice, invoice_type + '_id')
+    if not (request.user.is_staff or is_owner):
+        messages.error(request, "You are not authorized to view this invoice.")
+        return None
+    return invoice
 
+@login_required
+def invoice_detail(request, pk, invoice_type):
+    invoice = _viewable_invoice(request, pk, invoice_type)
+    if invoice is None:
+        return redirect('profile')
+
+    context = {
+        'invoice': invoice,
+        'invoice_type': invoice_type,
+        # Reused from disk while the invoice is unchanged
+        'document': snapshots.get_document(invoice, invoice_type),
+        'page_title': f"Invoice Detail: {invoice.invoice_number}",
+        'can_edit': True,
+    }
+    return render(request, "Finance/invoice_detail.html", context)
 
 @login_required
-def invoice_detail(request, pk):
-    
-    invoice = None
-    invoice_type = None
-    related_user_profile = None 
+def invoice_print(request, pk, invoice_type):
+    invoice = _viewable_invoice(request, pk, invoice_type)
+    if invoice is None:
+        return redirect('profile')
+    return HttpResponse(snapshots.get_document(invoice, invoice_type, 'print'))
 
-    try:
-        invoice = CustomerInvoice.objects.get(pk=pk)
-        invoice_type = 'customer'
-        related_user_profile = invoice.customer 
-    except CustomerInvoice.DoesNotExist:
+
+@login_required
+@staff_required
+def invoice_history(request, pk, invoice_type):
+    """Last 200 audit entries of one invoice, newest first. Deleted invoices keep theirs."""
+    model = INVOICE_TYPES.get(invoice_type)
+    if model is None:
+        raise Http404("Invoice does not exist.")
+    entries = list(audit.history(model(pk=pk))[:200])
+    if not entries:
+        raise Http404("No history for this invoice.")
+    context = {
+        'entries': entries,
+        'invoice_pk': pk,
+        'invoice_type': invoice_type,
+        'page_title': f"Change History: {'AR' if invoice_type == 'customer' else 'AP'} #{pk}",
+    }
+    return render(request, "Finance/invoice_history.html", context)
+
+
+@login_required
+def legacy_invoice_detail(request, pk):
+    """
+    Old untyped /invoice/<pk>/ links. Keeps the old AR-first precedence but
+    resolves the type with a single UNION query, then redirects.
+    """
+    matches = (
+        CustomerInvoice.objects.filter(pk=pk).annotate(kind=Value(0)).values_list('kind')
+        .union(VendorInvoice.objects.filter(pk=pk).annotate(kind=Value(1)).values_list('kind'))
+    )
+    kinds = {kind for (kind,) in matches}
+    if not kinds:
+        raise Http404("Invoice does not exist.")
+    route = 'customer_invoice_detail' if 0 in kinds else 'vendor_invoice_detail'
+    return redirect(route, pk=pk)
+
+
+# === BULK STATUS ACTIONS ===
+@login_required
+@staff_required
+def bulk_invoice_action(request, ledger):
+    """Applies mark_paid / mark_processed / mark_overdue to the selected invoices with one UPDATE."""
+    ledger = ledger.upper()
+    list_route = 'vendor_payment_list' if ledger == 'AP' else 'invoice_list'
+    if request.method != "POST" or ledger not in ('AR', 'AP'):
+        return redirect(list_route)
+
+    action = request.POST.get('action')
+    pks = [int(pk) for pk in request.POST.getlist('invoice_ids') if pk.isdigit()]
+    if action not in ACTIONS or not pks:
+        messages.error(request, "Select at least one invoice and an action.")
+        return redirect(list_route)
+
+    payment_date = None
+    if request.POST.get('payment_date'):
         try:
-            invoice = VendorInvoice.objects.get(pk=pk)
-            invoice_type = 'vendor'
-            related_user_profile = invoice.vendor
-        except VendorInvoice.DoesNotExist:
-            raise Http404("Invoice does not exist.") 
+            payment_date = date.fromisoformat(request.POST['payment_date'])
+        except ValueError:
+            messages.error(request, "Payment date must be a valid date.")
+            return redirect(list_route)
 
-    is_authorized = request.user.is_staff 
-    
-    owner_profile = getattr(request.user, invoice_type + '_profile', None) 
-    is_owner = related_user_profile and owner_profile and related_user_profile == owner_profile
+    try:
+        updated = apply_action(ledger, pks, action, payment_date=payment_date)
+    except ValueError as e:
+        messages.error(request, str(e))
+        return redirect(list_route)
 
-    if is_owner:
-        is_authorized = True
+    messages.success(request, f"{updated} {ledger} invoice(s) updated.")
+    return redirect(list_route)
 
-    can_edit = is_authorized 
-    
-    if not is_authorized:
-        messages.error(request, "You are not authorized to view this invoice.")
-        return redirect('profile')
 
+# === REPORTS ===
+@login_required
+@staff_required
+def aging_report(request):
+    """AR/AP aging read from the summary table: one row per party, never per invoice."""
+    ledger = 'AP' if request.GET.get('ledger') == 'AP' else 'AR'
+    party = aging.LEDGERS[ledger]['party']
+    parties = (
+        AgingSummary.objects
+        .filter(ledger=ledger, open_count__gt=0)
+        .select_related(party)
+        .order_by('company_code', party + '__name')
+    )
     context = {
-        'invoice': invoice,
-        'invoice_type': invoice_type,
-        'page_title': f"Invoice Detail: {invoice.invoice_number}",
-        'can_edit': can_edit, 
+        'ledger': ledger,
+        'party': party,
+        'parties': parties,
+        'companies': aging.company_totals(ledger),
+        'page_title': f'{ledger} Aging Report',
     }
-    return render(request, "Finance/invoice_detail.html", context)
+    return render(request, "Finance/aging_report.html", context)
+
+
+@login_required
+@staff_required
+def revenue_report(request):
+    """
+    AR revenue / AP spend per month of a year (or per day of ?month=YYYY-MM),
+    by status and company code. Reads only the rollup tables.
+    """
+    ledger = 'AP' if request.GET.get('ledger') == 'AP' else 'AR'
+    company_code = request.GET.get('company_code') or None
+    try:
+        if request.GET.get('month'):
+            start = date.fromisoformat(request.GET['month'] + '-01')
+            end, grain = rollups.next_month(start), 'daily'
+        else:
+            year = int(request.GET.get('year') or date.today().year)
+            start, end, grain = date(year, 1, 1), date(year + 1, 1, 1), 'monthly'
+    except ValueError:
+        return HttpResponseBadRequest("year must be a number and month YYYY-MM.")
+
+    context = {
+        'ledger': ledger,
+        'grain': grain,
+        'start': start,
+        'company_code': company_code,
+        'report': rollups.period_report(ledger, start, end, grain=grain, company_code=company_code),
+        'page_title': f"{'Revenue' if ledger == 'AR' else 'Spend'} by {'Day' if grain == 'daily' else 'Month'}",
+    }
+    return render(request, "Finance/revenue_report.html", context)
+
+
+@login_required
+@staff_required
+def cash_flow_forecast(request):
+    """13-week cash-flow projection from open AR/AP invoices (Finance.forecast)."""
+    context = {
+        'forecast': forecast.build_forecast(),
+        'page_title': '13-Week Cash-Flow Forecast',
+    }
+    return render(request, "Finance/cash_flow_forecast.html", context)
+
+
+# === EXPORTS ===
+@login_required
+@staff_required
+def export_invoices(request, ledger):
+    """Streams the AR or AP ledger as CSV (or .csv.gz) without loading it in memory."""
+    ledger = ledger.upper()
+    if ledger not in exporting.COLUMNS:
+        raise Http404("Unknown ledger.")
+    try:
+        queryset = exporting.export_queryset(
+            ledger,
+            status=request.GET.get('status'),
+            date_from=exporting.parse_date(request.GET.get('from'), 'from'),
+            date_to=exporting.parse_date(request.GET.get('to'), 'to'),
+            company_code=request.GET.get('company_code'),
+        )
+    except ValueError as e:
+        return HttpResponseBadRequest(str(e))
+
+    lines = exporting.csv_lines(ledger, queryset)
+    filename = f"{ledger.lower()}_invoices_{date.today().isoformat()}.csv"
+    if request.GET.get('gzip', '').lower() in ('1', 'true', 'yes'):
+        response = StreamingHttpResponse(exporting.gzip_chunks(lines), content_type='application/gzip')
+        filename += '.gz'
+    else:
+        response = StreamingHttpResponse(lines, content_type='text/csv')
+    response['Content-Disposition'] = f'attachment; filename="{filename}"'
+    return response
 
 
 # === SEARCH VIEWS ===
+def _search_page(request, kind):
+    """Runs the full-text party search for ?q=...&page=... and returns the template context."""
+    query = request.GET.get('q')
+    try:
+        page_number = max(1, int(request.GET.get('page', 1)))
+    except ValueError:
+        page_number = 1
+    results, has_next = search.search(kind, query, page=page_number) if query else (None, False)
+    return {
+        'query': query,
+        'page_number': page_number,
+        'has_previous': page_number > 1,
+        'has_next': has_next,
+        'previous_page': page_number - 1,
+        'next_page': page_number + 1,
+    }, results
+
 @login_required
 def search_customers(request):
-    query = request.GET.get('q')
-    customers = Customer.objects.filter(Q(name__icontains=query) | Q(company_code__icontains=query)).order_by('name') if query else None
-    return render(request, "Finance/search_customer.html", {'customers': customers, 'query': query, 'page_title': 'Search Customers'})
+    context, customers = _search_page(request, 'customer')
+    context.update({'customers': customers, 'page_title': 'Search Customers'})
+    return render(request, "Finance/search_customer.html", context)
 
 @login_required
 def search_vendors(request):
-    query = request.GET.get('q')
-    vendors = Vendor.objects.filter(Q(name__icontains=query) | Q(company_code__icontains=query)).order_by('name') if query else None
-    return render(request, "Finance/search_vendor.html", {'vendors': vendors, 'query': query, 'page_title': 'Search Vendors'})
+    context, vendors = _search_page(request, 'vendor')
+    context.update({'vendors': vendors, 'page_title': 'Search Vendors'})
+    return render(request, "Finance/search_vendor.html", context)
+
+@login_required
+@staff_required
+def party_autocomplete(request, kind):
+    """
+    GET /finance/autocomplete/<customer|vendor>/?q=acm
+    Prefix suggestions for the party selectors of the invoice forms.
+    """
+    if kind not in search.INDEXES:
+        raise Http404("Unknown party type.")
+    results, more = search.autocomplete(kind, request.GET.get('q', ''))
+    return JsonResponse({'results': results, 'more': more})
 
 
 # ==================================
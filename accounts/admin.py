@@ -1,10 +1,14 @@
 from django.contrib import admin
 from django.contrib.auth.admin import UserAdmin
+from Finance.pagination import EstimatedCountPaginator
 from .models import CustomUser
 
 @admin.register(CustomUser)
 class CustomUserAdmin(UserAdmin):
     model = CustomUser
+    # Sin COUNT(*) de la tabla entera en cada página
+    paginator = EstimatedCountPaginator
+    show_full_result_count = False
     list_display = ('username', 'email', 'first_name', 'last_name', 'user_type', 'is_staff', 'is_superuser')
     list_filter = ('user_type', 'is_staff', 'is_superuser')
     fieldsets = UserAdmin.fieldsets + (
@@ -9,10 +9,16 @@ class Migration(migrations.Migration):
         ('accounts', '0002_customuser_customer_profile_customuser_user_type_and_more'),
     ]
 
+    # La columna avatar ya la crea 0001_initial: aquí solo cambia el estado
+    # (upload_to), si no una base nueva falla con "duplicate column name"
     operations = [
-        migrations.AddField(
-            model_name='CustomUser',
-            name='avatar',
-            field=models.ImageField(blank=True, null=True, upload_to='avatar/'),
+        migrations.SeparateDatabaseAndState(
+            state_operations=[
+                migrations.AlterField(
+                    model_name='CustomUser',
+                    name='avatar',
+                    field=models.ImageField(blank=True, null=True, upload_to='avatar/'),
+                ),
+            ],
         ),
     ]
@@ -5,6 +5,8 @@ from django.contrib.auth.decorators import login_required
 from django.contrib.auth.forms import PasswordChangeForm
 from .models import CustomUser
 from .forms import LoginForm, SignUpForm, CustomUserUpdateForm
+from django.core.cache import cache
+from Finance import caching
 from Finance.models import Customer, Vendor, CustomerInvoice, VendorInvoice
 from datetime import date
 
@@ -93,6 +95,24 @@ def logout_view(request):
     messages.info(request, "Logged out successfully.")
     return redirect('login')
 
+def _dashboard_invoices(ledger, party_id, status):
+    """
+    Invoice rows for the profile table as plain dicts (cacheable). The party
+    name is joined in the same query; the template reads it as
+    invoice.customer.name / invoice.vendor.name.
+    """
+    model, party = (VendorInvoice, 'vendor') if ledger == 'AP' else (CustomerInvoice, 'customer')
+    invoices = model.objects.all()
+    if party_id:
+        invoices = invoices.filter(**{party + '_id': party_id})
+    if status:
+        invoices = invoices.filter(status=status)
+    rows = list(invoices.values('pk', 'invoice_number', 'date_issued', 'due_date', 'amount', 'status', party + '__name'))
+    for row in rows:
+        row[party] = {'name': row.pop(party + '__name')}
+    return rows
+
+
 @login_required
 def profile_view(request):
     user = request.user
@@ -104,32 +124,40 @@ def profile_view(request):
         return redirect('home') 
 
     invoices = []
+    # AR/AP decides which typed detail route the table links to
+    invoice_ledger = 'AP' if user.user_type == 'V' else 'AR'
+    party_id = None
+    has_invoices = True
 
     if user.is_superuser:
-        if view_type == 'AP':
-            invoices = VendorInvoice.objects.all()
-        else:
-            invoices = CustomerInvoice.objects.all()
+        invoice_ledger = 'AP' if view_type == 'AP' else 'AR'
+    # 🟢 CORRECCIÓN CLAVE: 
+    # 1. Usar user.user_type para decidir la rama.
+    # 2. Verificar que el perfil exista (id no nulo) antes de buscar las facturas.
+    elif user.user_type == 'C' and user.customer_profile_id:
+        party_id = user.customer_profile_id
+    elif user.user_type == 'V' and user.vendor_profile_id:
+        party_id = user.vendor_profile_id
     else:
-        # 🟢 CORRECCIÓN CLAVE: 
-        # 1. Usar user.user_type para decidir la rama.
-        # 2. Verificar que el objeto de perfil exista (no sea None) antes de acceder a las facturas.
-        if user.user_type == 'C' and user.customer_profile:
-            invoices = user.customer_profile.customerinvoice_set.all()
-        
-        elif user.user_type == 'V' and user.vendor_profile:
-            invoices = user.vendor_profile.vendorinvoice_set.all()
-
-    if filter_status:
-        # Solo intentar filtrar si la variable 'invoices' contiene un QuerySet válido
-        if invoices:
-            invoices = invoices.filter(status=filter_status.upper())
+        has_invoices = False
+
+    if has_invoices:
+        # Cached per user, ledger and status; invoice save/delete hooks bump
+        # the version in the key, so repeat visits skip the invoice table.
+        status = filter_status.upper() if filter_status else None
+        version = caching.get_version(invoice_ledger, party_id)
+        key = caching.dashboard_key(user.pk, invoice_ledger, status, version)
+        invoices = cache.get(key)
+        if invoices is None:
+            invoices = _dashboard_invoices(invoice_ledger, party_id, status)
+            cache.set(key, invoices, caching.DASHBOARD_TIMEOUT)
 
     context = {
         'user': user,
         'invoices': invoices,
         'filter_status': filter_status or 'ALL',
         'view_type': view_type or 'AR',
+        'invoice_ledger': invoice_ledger,
         'customer': getattr(user, 'customer_profile', None),
         'vendor': getattr(user, 'vendor_profile', None),
     }
@@ -1,19 +1,51 @@
 from django.contrib import admin
-from .models import Conversation, Message
+from django.core.exceptions import ValidationError
+from django.forms.models import BaseInlineFormSet
+from Finance.admin import LargeTableAdmin
+from .inbox import pair_conversation
+from .models import Conversation, Membership, Message
+
+class MembershipFormSet(BaseInlineFormSet):
+    def clean(self):
+        """Una sola conversación por pareja: no se crea otra desde el admin"""
+        super().clean()
+        users = [
+            form.cleaned_data['user'].pk for form in self.forms
+            if form.cleaned_data.get('user') and not form.cleaned_data.get('DELETE')
+        ]
+        if len(set(users)) == 2:
+            existing = pair_conversation(users, exclude=self.instance.pk)
+            if existing is not None:
+                raise ValidationError(f"These two users already have a conversation (#{existing.pk}).")
+
+class MembershipInline(admin.TabularInline):
+    model = Membership
+    formset = MembershipFormSet
+    extra = 0
+    autocomplete_fields = ('user',) # No cargar todos los usuarios en el formulario
+    readonly_fields = ('last_read_message_id', 'last_read_at')
 
 class MessageInline(admin.TabularInline):
     model = Message
     extra = 0
-    readonly_fields = ('sender', 'content', 'timestamp', 'is_read')
+    readonly_fields = ('sender', 'content', 'timestamp')
     can_delete = False
 
+    def get_queryset(self, request):
+        # El remitente se muestra en cada fila
+        return super().get_queryset(request).select_related('sender')
+
 @admin.register(Conversation)
-class ConversationAdmin(admin.ModelAdmin):
+class ConversationAdmin(LargeTableAdmin):
     list_display = ('id', 'display_participants', 'last_message_at')
-    filter_horizontal = ('participants',) # Para un mejor manejo del M2M
-    inlines = [MessageInline]
+    inlines = [MembershipInline, MessageInline]
+    readonly_fields = ('user_low', 'user_high') # Clave de la pareja, sigue a los participantes (inbox.sync_pair_key)
     search_fields = ('participants__username',)
     ordering = ('-last_message_at',)
+
+    def get_queryset(self, request):
+        # Participantes de toda la página en una sola query (display_participants y __str__)
+        return super().get_queryset(request).prefetch_related('participants')
     
     # Método para mostrar los nombres de usuario en la lista
     def display_participants(self, obj):
@@ -21,9 +53,15 @@ class ConversationAdmin(admin.ModelAdmin):
     display_participants.short_description = 'Participants'
 
 @admin.register(Message)
-class MessageAdmin(admin.ModelAdmin):
-    list_display = ('id', 'conversation', 'sender', 'content', 'timestamp', 'is_read')
-    list_filter = ('timestamp', 'is_read', 'sender')
+class MessageAdmin(LargeTableAdmin):
+    list_display = ('id', 'conversation', 'sender', 'content', 'timestamp')
+    # Solo los usuarios que enviaron mensajes, no la tabla de usuarios entera
+    list_filter = ('timestamp', ('sender', admin.RelatedOnlyFieldListFilter))
     search_fields = ('content', 'sender__username')
     raw_id_fields = ('conversation', 'sender') # Útil para buscar IDs rápidamente
+    list_select_related = ('conversation', 'sender')
+
+    def get_queryset(self, request):
+        # La columna conversation usa Conversation.__str__, que lista los participantes
+        return super().get_queryset(request).prefetch_related('conversation__participants')
 
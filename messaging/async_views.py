@@ -0,0 +1,199 @@
+import json
+import time
+
+from django.contrib.auth.decorators import login_required
+from django.http import Http404, HttpResponse, HttpResponseRedirect, JsonResponse, StreamingHttpResponse
+from django.urls import reverse
+
+from Finance.async_views import current_user, render_async
+from . import live
+from .forms import MessageForm
+from .history import ahistory_page, message_json
+from .inbox import ainbox_page, amark_read, available_users
+from .models import Conversation
+
+# Async versions of ConversationListView and ConversationDetailView, built on
+# the async ORM. Same templates as the class-based views in views.py.
+# live_events streams new messages to open pages under ASGI (each stream
+# waits on the event loop, not on a worker thread); under WSGI it answers
+# short polls at once (see messaging.live).
+
+LIVE_STREAM_SECONDS = 300   # then the browser reconnects (and re-authenticates)
+LIVE_HEARTBEAT_SECONDS = 15
+LONG_POLL_SECONDS = 25
+
+# ----------------------------------------------------
+# 1. Conversation List (Inbox)
+# ----------------------------------------------------
+@login_required
+async def conversation_list(request):
+    user = await current_user(request)
+    page = await ainbox_page(user, after=request.GET.get('after'))
+    return await render_async(request, 'messaging/conversation_list.html', {
+        'conversations': page.conversations,
+        'page': page,
+        'available_users': [u async for u in available_users(user)],
+        'live_options': live.client_options(request),
+    })
+
+# ----------------------------------------------------
+# 2. Conversation Detail (Chat)
+# ----------------------------------------------------
+@login_required
+async def conversation_detail(request, pk):
+    user = await current_user(request)
+    try:
+        conversation = await Conversation.objects.filter(participants=user).aget(pk=pk)
+    except Conversation.DoesNotExist:
+        raise Http404("Conversation not found or access denied.")
+
+    form = MessageForm()
+    if request.method == 'POST':
+        form = MessageForm(request.POST)
+        if form.is_valid():
+            new_message = form.save(commit=False)
+            new_message.conversation = conversation
+            new_message.sender = user
+            await new_message.asave()
+            if request.headers.get('x-requested-with') == 'XMLHttpRequest':
+                # Sent from the live chat: the message reaches the page through live_events
+                return JsonResponse(message_json(new_message, user.pk), status=201)
+            return HttpResponseRedirect(reverse('conversation_detail_async', kwargs={'pk': conversation.pk}))
+        if request.headers.get('x-requested-with') == 'XMLHttpRequest':
+            return JsonResponse({'errors': form.errors}, status=400)
+    else:
+        # Move the user's read cursor to the newest message (one row)
+        if await amark_read(conversation, user):
+            await live.apublish_read(conversation.pk, user.pk)
+
+    # Newest messages only, senders included, so rendering doesn't query
+    history = await ahistory_page(conversation)
+    partner = await conversation.participants.exclude(pk=user.pk).afirst()
+    return await render_async(request, 'messaging/conversation_detail.html', {
+        'conversation': conversation,
+        'history': history,
+        'partner': partner,
+        'form': form,
+        'live_options': live.client_options(request),
+    })
+
+# ----------------------------------------------------
+# 3. Live Events (SSE, long-poll fallback)
+# ----------------------------------------------------
+def _last_message_id(request):
+    # EventSource resends the id of the last event after a reconnect
+    raw = request.headers.get('last-event-id') or request.GET.get('after') or ''
+    return int(raw) if raw.isdigit() else None
+
+
+def _sse(event):
+    lines = [f"event: {event['type']}"]
+    if event['type'] == 'message':
+        lines.append(f"id: {event['id']}")
+    lines.append(f"data: {json.dumps(event)}")
+    return '\n'.join(lines) + '\n\n'
+
+
+async def _viewing(event, user, conversation_id):
+    """
+    The user has the thread open: its messages are read as they arrive, and
+    the unread counts for it (stale by now) are not sent.
+    """
+    if event.get('conversation') != conversation_id:
+        return event
+    if event['type'] == 'unread':
+        return None
+    if event['type'] == 'message' and not event['mine']:
+        if await amark_read(conversation_id, user, up_to=event['id']):
+            await live.apublish_read(conversation_id, user.pk)
+    return event
+
+
+async def _answer_now(request, user, conversation_id, after):
+    """
+    live_events under WSGI: a held request would pin a worker, and the
+    in-process backend misses what other workers publish, so the client gets
+    what the database has right away and polls again later.
+    """
+    if after is None:
+        events, last_id = [], await live.alast_message_id(user)
+    else:
+        events = await live.aevents_since(user, after)
+        last_id = max([after] + [e['id'] for e in events if e['type'] == 'message'])
+    delivered = [e for e in [await _viewing(e, user, conversation_id) for e in events] if e]
+    if request.GET.get('transport') == 'poll':
+        return JsonResponse({'events': delivered, 'last_id': last_id})
+    # An EventSource (a page rendered under ASGI): it reconnects after `retry`
+    body = "retry: %d\n\n" % (live.client_options(request)['pollSeconds'] * 1000)
+    body += ''.join(_sse(e) for e in delivered)
+    return HttpResponse(body, content_type='text/event-stream', headers={'Cache-Control': 'no-cache'})
+
+
+@login_required
+async def live_events(request):
+    """
+    New messages and unread counts for the user's pages. Server-sent events
+    by default; ?transport=poll answers once (JSON) with the first events or
+    an empty list after LONG_POLL_SECONDS. ?conversation=<pk> marks that
+    thread's incoming messages read, and ?after=<message id> (or
+    Last-Event-ID) first replays what the client missed.
+
+    Under WSGI nothing waits: the answer is what the database has after
+    ?after= (the JSON also carries last_id, the cursor of the next poll).
+    """
+    user = await current_user(request)
+    conversation_id = request.GET.get('conversation')
+    if conversation_id is not None:
+        if not conversation_id.isdigit() or not await Conversation.objects.filter(pk=conversation_id, participants=user).aexists():
+            raise Http404("Conversation not found or access denied.")
+        conversation_id = int(conversation_id)
+
+    after = _last_message_id(request)
+    if live.transport(request) != 'sse':
+        return await _answer_now(request, user, conversation_id, after)
+
+    # Subscribe before catching up, so nothing published in between is lost
+    subscription = live.get_backend().subscribe(live.user_channel(user.pk))
+    try:
+        missed = await live.aevents_since(user, after) if after is not None else []
+    except BaseException:
+        subscription.close()
+        raise
+
+    if request.GET.get('transport') == 'poll':
+        try:
+            events = list(missed)
+            if not events:
+                event = await subscription.get(LONG_POLL_SECONDS)
+                while event is not None:
+                    events.append(event)
+                    event = await subscription.get(0.05)  # what arrived together
+            delivered = [e for e in [await _viewing(e, user, conversation_id) for e in events] if e]
+        finally:
+            subscription.close()
+        return JsonResponse({'events': delivered})
+
+    async def stream():
+        try:
+            yield "retry: 3000\n\n"
+            for event in missed:
+                event = await _viewing(event, user, conversation_id)
+                if event:
+                    yield _sse(event)
+            deadline = time.monotonic() + LIVE_STREAM_SECONDS
+            while time.monotonic() < deadline and not subscription.overflowed:
+                event = await subscription.get(LIVE_HEARTBEAT_SECONDS)
+                if event is None:
+                    yield ": ping\n\n"
+                    continue
+                event = await _viewing(event, user, conversation_id)
+                if event:
+                    yield _sse(event)
+        finally:  # also when the client goes away (the task is cancelled)
+            subscription.close()
+
+    response = StreamingHttpResponse(stream(), content_type='text/event-stream')
+    response['Cache-Control'] = 'no-cache'
+    response['X-Accel-Buffering'] = 'no'  # nginx: don't buffer the stream
+    return response
+
@@ -0,0 +1,71 @@
+from dataclasses import dataclass, field
+
+from django.db.models import Q
+from django.utils.dateformat import format as date_format
+from django.utils.timezone import localtime
+
+from .inbox import decode_cursor, encode_cursor
+from .models import Message
+
+# A thread is shown as a window of its newest messages; older ones come a
+# page at a time through the 'load older' endpoint. Pages are keyset on
+# (timestamp, id), backed by msg_conversation_time_idx, so the thousandth
+# page of a long thread costs the same as the first.
+
+PAGE_SIZE = 50
+
+
+@dataclass
+class HistoryPage:
+    messages: list = field(default_factory=list)  # oldest first, as displayed
+    older_cursor: str = None
+
+    @property
+    def has_older(self):
+        return self.older_cursor is not None
+
+    def __iter__(self):
+        return iter(self.messages)
+
+    def __len__(self):
+        return len(self.messages)
+
+
+def _page_query(conversation, before, page_size):
+    messages = Message.objects.filter(conversation=conversation).select_related('sender')
+    key = decode_cursor(before)
+    if key:
+        when, pk = key
+        messages = messages.filter(Q(timestamp__lt=when) | Q(timestamp=when, pk__lt=pk))
+    return messages.order_by('-timestamp', '-pk')[:page_size + 1]
+
+
+def _build_page(rows, page_size):
+    newest_first = rows[:page_size]
+    page = HistoryPage(messages=newest_first[::-1])
+    if len(rows) > page_size:
+        oldest = page.messages[0]
+        page.older_cursor = encode_cursor(oldest.timestamp, oldest.pk)
+    return page
+
+
+def history_page(conversation, before=None, page_size=PAGE_SIZE):
+    """The newest messages of the thread, or the ones older than the ``before`` cursor."""
+    return _build_page(list(_page_query(conversation, before, page_size)), page_size)
+
+
+async def ahistory_page(conversation, before=None, page_size=PAGE_SIZE):
+    return _build_page([m async for m in _page_query(conversation, before, page_size)], page_size)
+
+
+def message_json(message, user_id):
+    """A message as ``user_id`` sees it (JSON history pages and live events)."""
+    return {
+        'id': message.pk,
+        'conversation': message.conversation_id,
+        'sender': message.sender.username,
+        'mine': message.sender_id == user_id,
+        'content': message.content,
+        'timestamp': message.timestamp.isoformat(),
+        'time': date_format(localtime(message.timestamp), 'H:i'),
+    }
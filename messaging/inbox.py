@@ -0,0 +1,200 @@
+import base64
+from dataclasses import dataclass, field
+from datetime import datetime
+
+from django.contrib.auth import get_user_model
+from django.db import transaction
+from django.db.models import Count, IntegerField, OuterRef, Q, Subquery, Value
+from django.db.models.functions import Coalesce, Now, Substr
+
+from .models import Conversation, Membership, Message
+
+# The inbox as one query: each conversation of the user comes with its
+# partner, a preview of the last message and the unread count as correlated
+# subqueries, instead of two queries per thread. Pages are keyset on
+# (last_message_at, id), newest first, so a long inbox costs the same per
+# page as a short one.
+#
+# Read state is a cursor per participant (Membership.last_read_message_id):
+# unread messages are the others' messages past it, a range count on
+# msg_conversation_id_idx, and reading a thread moves it with a one-row
+# UPDATE.
+
+PAGE_SIZE = 20
+PREVIEW_LENGTH = 80
+
+
+
+# === CURSOR TOKENS ===
+def encode_cursor(last_message_at, pk):
+    raw = f"{last_message_at.isoformat()}|{pk}".encode()
+    return base64.urlsafe_b64encode(raw).decode().rstrip('=')
+
+
+def decode_cursor(token):
+    """The (last_message_at, id) key of a token, or None if it is invalid."""
+    if not token:
+        return None
+    try:
+        raw = base64.urlsafe_b64decode((token + '=' * (-len(token) % 4)).encode()).decode()
+        when, pk = raw.split('|', 1)
+        return datetime.fromisoformat(when), int(pk)
+    except (ValueError, UnicodeDecodeError):
+        return None
+
+
+@dataclass
+class InboxPage:
+    conversations: list = field(default_factory=list)
+    next_cursor: str = None
+
+    @property
+    def has_next(self):
+        return self.next_cursor is not None
+
+    def __iter__(self):
+        return iter(self.conversations)
+
+    def __len__(self):
+        return len(self.conversations)
+
+
+# === QUERY ===
+def inbox_queryset(user):
+    """The user's conversations, annotated with everything the inbox shows."""
+    others = Membership.objects.filter(conversation=OuterRef('pk')).exclude(user=user).order_by('pk')
+    last_message = Message.objects.filter(conversation=OuterRef('pk')).order_by('-timestamp', '-pk')
+    # Correlated to the message subquery below, so it's the message's conversation
+    read_up_to = Membership.objects.filter(conversation=OuterRef('conversation'), user=user).values('last_read_message_id')[:1]
+    unread = (
+        Message.objects
+        .filter(conversation=OuterRef('pk'), pk__gt=Subquery(read_up_to))
+        .exclude(sender=user)
+        .order_by()
+        .values('conversation')
+        .annotate(n=Count('pk'))
+        .values('n')
+    )
+    return (
+        Conversation.objects
+        .filter(participants=user)
+        .annotate(
+            partner_id=Subquery(others.values('user_id')[:1]),
+            partner_username=Subquery(others.values('user__username')[:1]),
+            last_message_preview=Subquery(last_message.annotate(preview=Substr('content', 1, PREVIEW_LENGTH)).values('preview')[:1]),
+            last_sender_id=Subquery(last_message.values('sender_id')[:1]),
+            unread_count=Coalesce(Subquery(unread, output_field=IntegerField()), Value(0)),
+        )
+    )
+
+
+def _page_query(user, after, page_size):
+    qs = inbox_queryset(user)
+    key = decode_cursor(after)
+    if key:
+        when, pk = key
+        qs = qs.filter(Q(last_message_at__lt=when) | Q(last_message_at=when, pk__lt=pk))
+    return qs.order_by('-last_message_at', '-pk')[:page_size + 1]
+
+
+def _build_page(rows, page_size):
+    page = InboxPage(conversations=rows[:page_size])
+    if len(rows) > page_size:
+        last = page.conversations[-1]
+        page.next_cursor = encode_cursor(last.last_message_at, last.pk)
+    return page
+
+
+def inbox_page(user, after=None, page_size=PAGE_SIZE):
+    """One page of the inbox, newest activity first; ``after`` is the previous page's next_cursor."""
+    return _build_page(list(_page_query(user, after, page_size)), page_size)
+
+
+async def ainbox_page(user, after=None, page_size=PAGE_SIZE):
+    return _build_page([c async for c in _page_query(user, after, page_size)], page_size)
+
+
+# === READ CURSORS ===
+def _mark_read_query(conversation, user, up_to=None):
+    """
+    Moves the user's cursor to ``up_to`` (default: the thread's newest
+    message). Never moves it back, and a thread with nothing new isn't
+    written at all.
+    """
+    if up_to is None:
+        up_to = Subquery(Message.objects.filter(conversation=conversation).order_by('-pk').values('pk')[:1])
+    return (
+        Membership.objects
+        .filter(conversation=conversation, user=user, last_read_message_id__lt=up_to),
+        {'last_read_message_id': up_to, 'last_read_at': Now()},
+    )
+
+
+def mark_read(conversation, user, up_to=None):
+    memberships, changes = _mark_read_query(conversation, user, up_to)
+    return memberships.update(**changes)
+
+
+async def amark_read(conversation, user, up_to=None):
+    memberships, changes = _mark_read_query(conversation, user, up_to)
+    return await memberships.aupdate(**changes)
+
+
+def available_users(user):
+    """Customers and vendors the user can start a chat with (the 'new conversation' select)."""
+    return (
+        get_user_model().objects
+        .filter(user_type__in=('C', 'V'))
+        .exclude(pk=user.pk)
+        .only('pk', 'username', 'user_type')
+        .order_by('username')
+    )
+
+
+# === DIRECT (1-TO-1) CONVERSATIONS ===
+def pair_key(user_id, other_id):
+    """(user_low, user_high) of a 1-to-1 conversation."""
+    return min(user_id, other_id), max(user_id, other_id)
+
+
+def direct_conversation(user, other):
+    """
+    The 1-to-1 conversation of the two users, created if needed: one probe on
+    conv_pair_unique. Concurrent requests end up with the same conversation
+    (get_or_create retries the lookup when the insert loses the race). The
+    only way code should start a conversation between two users.
+    """
+    low, high = pair_key(user.pk, other.pk)
+    with transaction.atomic():
+        conversation, created = Conversation.objects.get_or_create(user_low_id=low, user_high_id=high)
+        if created:
+            conversation.participants.add(user, other)
+    return conversation
+
+
+def pair_conversation(user_ids, exclude=None):
+    """The conversation holding the pair key of these two users, if any."""
+    low, high = pair_key(*user_ids)
+    conversations = Conversation.objects.filter(user_low_id=low, user_high_id=high)
+    if exclude is not None:
+        conversations = conversations.exclude(pk=exclude)
+    return conversations.first()
+
+
+def sync_pair_key(conversation_id):
+    """
+    Keeps the pair key in step with the participants, however they were
+    added (admin inline, participants.add()): set when the conversation has
+    exactly two, cleared otherwise. Stays empty when another conversation
+    already holds the pair, so conv_pair_unique is never hit.
+    """
+    members = list(Membership.objects.filter(conversation_id=conversation_id).values_list('user_id', flat=True)[:3])
+    low = high = None
+    if len(members) == 2 and pair_conversation(members, exclude=conversation_id) is None:
+        low, high = pair_key(*members)
+    (
+        Conversation.objects
+        .filter(pk=conversation_id)
+        .exclude(Q(user_low_id=low, user_high_id=high) if low else Q(user_low__isnull=True, user_high__isnull=True))
+        .update(user_low_id=low, user_high_id=high)
+    )
@@ -0,0 +1,246 @@
+import asyncio
+import threading
+from collections import defaultdict
+from datetime import timedelta
+from functools import lru_cache
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.core.handlers.asgi import ASGIRequest
+from django.db import transaction
+from django.db.models import Max
+from django.utils import timezone
+from django.utils.module_loading import import_string
+
+from .history import message_json
+from .models import LiveEvent, Membership, Message
+
+# Live delivery of the chat: new messages and unread-count changes are
+# published to a channel per user, and the streaming endpoint
+# (async_views.live_events, SSE or long-poll) forwards them to the user's open
+# pages. The backend is pluggable (MESSAGING_LIVE_BACKEND): LocalBackend fans
+# out inside one process, DatabaseBackend shares events between worker
+# processes through the LiveEvent table, read by one poller per worker.
+#
+# Events are only notifications: a client that was disconnected catches up
+# from the Message table (aevents_since), so nothing depends on the backend
+# keeping them.
+#
+# Push needs ASGI. Under WSGI (the project's WSGI_APPLICATION) a held request
+# would pin a sync worker, and with LocalBackend it would only hear messages
+# sent through its own worker process. There the pages short-poll instead
+# (transport() == 'poll'): every MESSAGING_LIVE_SHORT_POLL_SECONDS they ask
+# live_events for what is new, answered at once from the Message table.
+# Read-state changes made on another page (badges cleared) then only show
+# up on a reload.
+
+DEFAULT_BACKEND = 'messaging.live.LocalBackend'
+DEFAULT_POLL_INTERVAL = 0.5
+DEFAULT_SHORT_POLL_SECONDS = 5
+# Events a slow client may have pending before its stream is closed (it
+# reconnects and catches up from the database)
+QUEUE_SIZE = 100
+CATCH_UP_LIMIT = 100
+
+
+def user_channel(user_id):
+    return f"user:{user_id}"
+
+
+def transport(request):
+    """
+    How pages served by ``request`` listen: 'sse' (pushed, long-poll without
+    EventSource) under ASGI, 'poll' (short polls, nothing held) under WSGI.
+    """
+    return 'sse' if isinstance(request, ASGIRequest) else 'poll'
+
+
+def client_options(request):
+    """The options of openLiveEvents() (static/messaging/live.js) for a page."""
+    return {
+        'transport': transport(request),
+        'pollSeconds': getattr(settings, 'MESSAGING_LIVE_SHORT_POLL_SECONDS', None) or DEFAULT_SHORT_POLL_SECONDS,
+    }
+
+
+# === BACKENDS ===
+class Subscription:
+    """One open stream: a queue on the event loop that serves it."""
+
+    def __init__(self, backend, channel):
+        self.backend = backend
+        self.channel = channel
+        self.loop = asyncio.get_running_loop()
+        self.queue = asyncio.Queue(maxsize=QUEUE_SIZE)
+        self.overflowed = False
+
+    def deliver(self, event):
+        """Thread-safe: publishers run on other threads (sync views, signals)."""
+        try:
+            self.loop.call_soon_threadsafe(self._put, event)
+        except RuntimeError:  # the loop is gone
+            self.close()
+
+    def _put(self, event):
+        try:
+            self.queue.put_nowait(event)
+        except asyncio.QueueFull:
+            self.overflowed = True
+
+    async def get(self, timeout):
+        """The next event, or None after ``timeout`` seconds."""
+        try:
+            return await asyncio.wait_for(self.queue.get(), timeout)
+        except asyncio.TimeoutError:
+            return None
+
+    def close(self):
+        self.backend.unsubscribe(self)
+
+
+class LocalBackend:
+    """Fan-out inside the current process."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._subscriptions = defaultdict(set)
+
+    def subscribe(self, channel):
+        """Must be called from the event loop that will read the events."""
+        subscription = Subscription(self, channel)
+        with self._lock:
+            self._subscriptions[channel].add(subscription)
+        return subscription
+
+    def unsubscribe(self, subscription):
+        with self._lock:
+            subscriptions = self._subscriptions.get(subscription.channel)
+            if subscriptions is not None:
+                subscriptions.discard(subscription)
+                if not subscriptions:
+                    del self._subscriptions[subscription.channel]
+
+    def publish(self, channel, event):
+        self._dispatch(channel, event)
+
+    def _dispatch(self, channel, event, loop=None):
+        with self._lock:
+            subscriptions = list(self._subscriptions.get(channel, ()))
+        for subscription in subscriptions:
+            if loop is None or subscription.loop is loop:
+                subscription.deliver(event)
+
+    def _channels(self, loop):
+        with self._lock:
+            return [
+                channel for channel, subscriptions in self._subscriptions.items()
+                if any(s.loop is loop for s in subscriptions)
+            ]
+
+
+class DatabaseBackend(LocalBackend):
+    """
+    Shares events between processes through the LiveEvent table. publish()
+    inserts a row; each event loop with open streams runs one poller that
+    reads the new rows of its channels and fans them out locally.
+    """
+    RETENTION = timedelta(minutes=5)
+
+    def __init__(self):
+        super().__init__()
+        self._pollers = {}
+
+    def subscribe(self, channel):
+        subscription = super().subscribe(channel)
+        loop = subscription.loop
+        if loop not in self._pollers:
+            self._pollers[loop] = loop.create_task(self._poll(loop))
+        return subscription
+
+    def publish(self, channel, event):
+        LiveEvent.objects.create(channel=channel, payload=event)
+
+    async def _poll(self, loop):
+        interval = getattr(settings, 'MESSAGING_LIVE_POLL_INTERVAL', None) or DEFAULT_POLL_INTERVAL
+        cursor = (await LiveEvent.objects.aaggregate(last=Max('pk')))['last'] or 0
+        pruned_at = timezone.now()
+        try:
+            while True:
+                channels = self._channels(loop)
+                if not channels:
+                    break
+                async for event in LiveEvent.objects.filter(pk__gt=cursor, channel__in=channels).order_by('pk')[:500]:
+                    cursor = event.pk
+                    self._dispatch(event.channel, event.payload, loop=loop)
+                if timezone.now() - pruned_at > timedelta(minutes=1):
+                    pruned_at = timezone.now()
+                    await LiveEvent.objects.filter(created_at__lt=pruned_at - self.RETENTION).adelete()
+                await asyncio.sleep(interval)
+        finally:
+            self._pollers.pop(loop, None)
+
+
+@lru_cache(maxsize=None)
+def get_backend():
+    return import_string(getattr(settings, 'MESSAGING_LIVE_BACKEND', None) or DEFAULT_BACKEND)()
+
+
+# === PUBLISHING ===
+def publish(user_id, event):
+    get_backend().publish(user_channel(user_id), event)
+
+
+def unread_messages(conversation_id, user_id, last_read_message_id):
+    return (
+        Message.objects
+        .filter(conversation_id=conversation_id, pk__gt=last_read_message_id)
+        .exclude(sender_id=user_id)
+    )
+
+
+def publish_message(message):
+    """The new message to every participant, and the recipients' new unread counts."""
+    memberships = Membership.objects.filter(conversation_id=message.conversation_id).values_list('user_id', 'last_read_message_id')
+    for user_id, last_read in memberships:
+        publish(user_id, {'type': 'message', **message_json(message, user_id)})
+        if user_id != message.sender_id:
+            unread = unread_messages(message.conversation_id, user_id, last_read).count()
+            publish(user_id, {'type': 'unread', 'conversation': message.conversation_id, 'unread': unread})
+
+
+def publish_read(conversation_id, user_id):
+    """The user read the thread: their other pages clear its badge."""
+    publish(user_id, {'type': 'unread', 'conversation': conversation_id, 'unread': 0})
+
+
+def publish_on_commit(message):
+    transaction.on_commit(lambda: publish_message(message))
+
+
+apublish_read = sync_to_async(publish_read)
+
+
+# === CATCHING UP ===
+async def aevents_since(user, after):
+    """
+    Events for the messages a client missed while disconnected (id > after),
+    oldest first, with the current unread count of each thread they touch.
+    """
+    missed = [
+        m async for m in Message.objects
+        .filter(conversation__memberships__user=user, pk__gt=after)
+        .select_related('sender')
+        .order_by('pk')[:CATCH_UP_LIMIT]
+    ]
+    events = [{'type': 'message', **message_json(m, user.pk)} for m in missed]
+    for conversation_id in sorted({m.conversation_id for m in missed}):
+        membership = await Membership.objects.aget(conversation_id=conversation_id, user=user)
+        unread = await unread_messages(conversation_id, user.pk, membership.last_read_message_id).acount()
+        events.append({'type': 'unread', 'conversation': conversation_id, 'unread': unread})
+    return events
+
+
+async def alast_message_id(user):
+    """Newest message id of the user's conversations: where a short poll starts."""
+    result = await Message.objects.filter(conversation__memberships__user=user).aaggregate(last=Max('pk'))
+    return result['last'] or 0
@@ -0,0 +1,105 @@
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+from django.db.models import Exists, OuterRef, Subquery, Value
+from django.db.models.functions import Coalesce
+
+
+def backfill_read_cursors(apps, schema_editor):
+    """
+    Cursor of each participant from the is_read flags: the message just
+    before the participant's oldest unread one from someone else, or the
+    newest message of the thread when everything was read. Read messages that
+    come after an unread one count as unread from now on.
+    """
+    Membership = apps.get_model('messaging', 'Membership')
+    Message = apps.get_model('messaging', 'Message')
+
+    thread = Message.objects.filter(conversation=OuterRef('conversation')).order_by()
+    unread = Exists(thread.filter(is_read=False).exclude(sender=OuterRef('user')))
+
+    # Nothing unread: the newest message of the thread
+    Membership.objects.exclude(unread).update(
+        last_read_message_id=Coalesce(Subquery(thread.order_by('-pk').values('pk')[:1]), Value(0)),
+    )
+    # Otherwise the first unread message, and then the one before it
+    with_unread = Membership.objects.filter(unread)
+    with_unread.update(
+        last_read_message_id=Subquery(
+            thread.filter(is_read=False).exclude(sender=OuterRef('user')).order_by('pk').values('pk')[:1]
+        ),
+    )
+    with_unread.update(
+        last_read_message_id=Coalesce(
+            Subquery(thread.filter(pk__lt=OuterRef('last_read_message_id')).order_by('-pk').values('pk')[:1]),
+            Value(0),
+        ),
+    )
+    Membership.objects.filter(last_read_message_id__gt=0).update(
+        last_read_at=Subquery(Message.objects.filter(pk=OuterRef('last_read_message_id')).values('timestamp')[:1]),
+    )
+
+
+def restore_is_read(apps, schema_editor):
+    Membership = apps.get_model('messaging', 'Membership')
+    Message = apps.get_model('messaging', 'Message')
+
+    read_by_someone = Membership.objects.filter(
+        conversation=OuterRef('conversation'), last_read_message_id__gte=OuterRef('pk'),
+    ).exclude(user=OuterRef('sender'))
+    Message.objects.filter(Exists(read_by_someone)).update(is_read=True)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('messaging', '0002_conversation_last_message_idx'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        # participants pasa a usar un modelo intermedio propio sobre la misma
+        # tabla: solo cambia el estado, la base de datos queda igual
+        migrations.SeparateDatabaseAndState(
+            state_operations=[
+                migrations.CreateModel(
+                    name='Membership',
+                    fields=[
+                        ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                        ('conversation', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='memberships', to='messaging.conversation')),
+                        ('user', models.ForeignKey(db_column='customuser_id', on_delete=django.db.models.deletion.CASCADE, related_name='conversation_memberships', to=settings.AUTH_USER_MODEL)),
+                    ],
+                    options={
+                        'verbose_name': 'Participante',
+                        'verbose_name_plural': 'Participantes',
+                        'db_table': 'messaging_conversation_participants',
+                        'unique_together': {('conversation', 'user')},
+                    },
+                ),
+                migrations.AlterField(
+                    model_name='conversation',
+                    name='participants',
+                    field=models.ManyToManyField(related_name='conversations', through='messaging.Membership', to=settings.AUTH_USER_MODEL),
+                ),
+            ],
+        ),
+        migrations.AddField(
+            model_name='membership',
+            name='last_read_message_id',
+            field=models.PositiveBigIntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name='membership',
+            name='last_read_at',
+            field=models.DateTimeField(blank=True, null=True),
+        ),
+        migrations.AddIndex(
+            model_name='message',
+            index=models.Index(fields=['conversation', 'id'], name='msg_conversation_id_idx'),
+        ),
+        migrations.RunPython(backfill_read_cursors, restore_is_read),
+        migrations.RemoveField(
+            model_name='message',
+            name='is_read',
+        ),
+    ]
@@ -0,0 +1,90 @@
+from collections import defaultdict
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+def _first_unread(Message, membership):
+    return (
+        Message.objects
+        .filter(conversation_id=membership.conversation_id, pk__gt=membership.last_read_message_id)
+        .exclude(sender_id=membership.user_id)
+        .order_by('pk')
+        .values_list('pk', flat=True)
+        .first()
+    )
+
+
+def merge_duplicate_pairs(apps, schema_editor):
+    """
+    Gives every 1-to-1 conversation its pair key. When a pair has several
+    conversations, the oldest one keeps them all: the others' messages move
+    to it and they are deleted. Each participant's read cursor ends just
+    before their first unread message in any of them, so nothing unread is
+    lost (a few read messages may show as unread again).
+    """
+    Conversation = apps.get_model('messaging', 'Conversation')
+    Membership = apps.get_model('messaging', 'Membership')
+    Message = apps.get_model('messaging', 'Message')
+
+    members = defaultdict(list)
+    for conversation_id, user_id in Membership.objects.order_by('conversation_id', 'user_id').values_list('conversation_id', 'user_id'):
+        members[conversation_id].append(user_id)
+    pairs = defaultdict(list)
+    for conversation_id, user_ids in members.items():
+        if len(user_ids) == 2:
+            pairs[tuple(user_ids)].append(conversation_id)
+
+    for (low, high), conversation_ids in pairs.items():
+        keep, *duplicates = sorted(conversation_ids)
+        if duplicates:
+            memberships = list(Membership.objects.filter(conversation_id__in=conversation_ids))
+            first_unread = defaultdict(list)
+            for membership in memberships:
+                pk = _first_unread(Message, membership)
+                if pk is not None:
+                    first_unread[membership.user_id].append(pk)
+
+            Message.objects.filter(conversation_id__in=duplicates).update(conversation_id=keep)
+            newest = Message.objects.filter(conversation_id=keep).order_by('-pk').values_list('pk', flat=True).first() or 0
+            for user_id in (low, high):
+                read_at = [m.last_read_at for m in memberships if m.user_id == user_id and m.last_read_at]
+                Membership.objects.filter(conversation_id=keep, user_id=user_id).update(
+                    last_read_message_id=min(first_unread[user_id]) - 1 if first_unread[user_id] else newest,
+                    last_read_at=max(read_at, default=None),
+                )
+            last_message_at = max(Conversation.objects.filter(pk__in=conversation_ids).values_list('last_message_at', flat=True))
+            Conversation.objects.filter(pk__in=duplicates).delete()
+            Conversation.objects.filter(pk=keep).update(last_message_at=last_message_at)
+        Conversation.objects.filter(pk=keep).update(user_low_id=low, user_high_id=high)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('messaging', '0005_liveevent'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='conversation',
+            name='user_high',
+            field=models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='+', to=settings.AUTH_USER_MODEL),
+        ),
+        migrations.AddField(
+            model_name='conversation',
+            name='user_low',
+            field=models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='+', to=settings.AUTH_USER_MODEL),
+        ),
+        migrations.RunPython(merge_duplicate_pairs, migrations.RunPython.noop),
+        migrations.AddConstraint(
+            model_name='conversation',
+            constraint=models.UniqueConstraint(fields=('user_low', 'user_high'), name='conv_pair_unique'),
+        ),
+        migrations.AddConstraint(
+            model_name='conversation',
+            constraint=models.CheckConstraint(condition=models.Q(('user_low__lt', models.F('user_high'))), name='conv_pair_ordered'),
+        ),
+    ]
@@ -15,6 +15,7 @@ class Conversation(models.Model):
     participants = models.ManyToManyField(
         User, 
         related_name='conversations',
+        through='Membership',
         # Puedes añadir un límite si siempre son solo 2 (ej: limit_choices_to={'user_type__in': ['C', 'V']})
     )
     
@@ -24,8 +25,32 @@ class Conversation(models.Model):
         verbose_name="Último Mensaje"
     )
 
+    # Clave de las conversaciones 1 a 1: los dos participantes, el de id
+    # menor primero. Vacía en las conversaciones de grupo
+    user_low = models.ForeignKey(
+        User,
+        null=True, blank=True,
+        related_name='+',
+        on_delete=models.SET_NULL
+    )
+    user_high = models.ForeignKey(
+        User,
+        null=True, blank=True,
+        related_name='+',
+        on_delete=models.SET_NULL
+    )
+
     class Meta:
         ordering = ('-last_message_at',)
+        # La bandeja de entrada pagina por (last_message_at, id), más reciente primero
+        indexes = [
+            models.Index(fields=['-last_message_at', '-id'], name='conv_last_message_idx'),
+        ]
+        # Una sola conversación por pareja de usuarios
+        constraints = [
+            models.UniqueConstraint(fields=['user_low', 'user_high'], name='conv_pair_unique'),
+            models.CheckConstraint(condition=models.Q(user_low__lt=models.F('user_high')), name='conv_pair_ordered'),
+        ]
         verbose_name = "Conversación"
         verbose_name_plural = "Conversaciones"
 
@@ -36,7 +61,47 @@ class Conversation(models.Model):
 
 
 # ----------------------------------------------------
-# 3.2 Modelo: Message (El Mensaje Individual)
+# 3.2 Modelo: Membership (Participante + cursor de lectura)
+# ----------------------------------------------------
+class Membership(models.Model):
+    """
+    Un participante de una conversación y hasta dónde leyó. Los mensajes
+    no leídos son los de otros con id > last_read_message_id.
+    """
+
+    conversation = models.ForeignKey(
+        Conversation,
+        related_name='memberships',
+        on_delete=models.CASCADE
+    )
+
+    # Es la tabla intermedia que Django creaba para participants: se
+    # conserva el nombre de la columna
+    user = models.ForeignKey(
+        User,
+        related_name='conversation_memberships',
+        on_delete=models.CASCADE,
+        db_column='customuser_id'
+    )
+
+    # Id del último mensaje leído (0: ninguno). Un entero y no una FK: si el
+    # mensaje se borra, el cursor sigue sirviendo como límite del rango
+    last_read_message_id = models.PositiveBigIntegerField(default=0)
+
+    last_read_at = models.DateTimeField(null=True, blank=True)
+
+    class Meta:
+        db_table = 'messaging_conversation_participants'
+        unique_together = [('conversation', 'user')]
+        verbose_name = "Participante"
+        verbose_name_plural = "Participantes"
+
+    def __str__(self):
+        return f"{self.user_id} en {self.conversation_id}"
+
+
+# ----------------------------------------------------
+# 3.3 Modelo: Message (El Mensaje Individual)
 # ----------------------------------------------------
 class Message(models.Model):
     """Representa un único mensaje dentro de una conversación."""
@@ -59,12 +124,39 @@ class Message(models.Model):
     
     timestamp = models.DateTimeField(auto_now_add=True)
     
-    is_read = models.BooleanField(default=False)
-
     class Meta:
         ordering = ('timestamp',)
+        # Los no leídos se cuentan por rango de id dentro de la conversación;
+        # el historial se pagina por (timestamp, id)
+        indexes = [
+            models.Index(fields=['conversation', 'id'], name='msg_conversation_id_idx'),
+            models.Index(fields=['conversation', 'timestamp', 'id'], name='msg_conversation_time_idx'),
+        ]
         verbose_name = "Mensaje"
         verbose_name_plural = "Mensajes"
 
     def __str__(self):
         return f"Mensaje de {self.sender.username} en {self.conversation.id}"
+
+
+# ----------------------------------------------------
+# 3.4 Modelo: LiveEvent (Eventos en vivo entre procesos)
+# ----------------------------------------------------
+class LiveEvent(models.Model):
+    """
+    Un evento del chat en vivo publicado por messaging.live.DatabaseBackend,
+    para que lo lean los demás procesos. Se borran a los pocos minutos.
+    """
+
+    channel = models.CharField(max_length=100)
+
+    payload = models.JSONField()
+
+    created_at = models.DateTimeField(auto_now_add=True, db_index=True)
+
+    class Meta:
+        verbose_name = "Evento en vivo"
+        verbose_name_plural = "Eventos en vivo"
+
+    def __str__(self):
+        return f"{self.channel} #{self.pk}"
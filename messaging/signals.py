@@ -1,6 +1,8 @@
-from django.db.models.signals import post_save
+from django.db.models.signals import m2m_changed, post_delete, post_save
 from django.dispatch import receiver
-from .models import Message, Conversation
+from .models import Membership, Message, Conversation
+from .inbox import mark_read, sync_pair_key
+from .live import publish_on_commit
 
 @receiver(post_save, sender=Message)
 def update_conversation_timestamp(sender, instance, created, **kwargs):
@@ -11,4 +13,55 @@ def update_conversation_timestamp(sender, instance, created, **kwargs):
     if created:
         conversation = instance.conversation
         conversation.last_message_at = instance.timestamp
-        conversation.save()
\ No newline at end of file
+        conversation.save()
+
+
+@receiver(post_save, sender=Message)
+def advance_sender_read_cursor(sender, instance, created, **kwargs):
+    """
+    Quien escribe un mensaje ya leyó el hilo hasta ese mensaje.
+    """
+    if created:
+        mark_read(instance.conversation_id, instance.sender_id, up_to=instance.pk)
+
+
+@receiver(post_save, sender=Message)
+def publish_new_message(sender, instance, created, **kwargs):
+    """
+    Envía el mensaje nuevo a las páginas abiertas de los participantes
+    (messaging.live), una vez confirmado.
+    """
+    if created:
+        publish_on_commit(instance)
+
+
+@receiver(post_save, sender=Membership)
+@receiver(post_delete, sender=Membership)
+def sync_pair_key_on_membership(sender, instance, **kwargs):
+    """
+    Participantes añadidos o quitados uno a uno (inline del admin): la clave
+    de la pareja sigue a los participantes.
+    """
+    sync_pair_key(instance.conversation_id)
+
+
+@receiver(m2m_changed, sender=Conversation.participants.through)
+def sync_pair_key_on_participants(sender, instance, action, reverse, pk_set, **kwargs):
+    """Lo mismo para participants.add() / remove() / clear(), que no envían post_save."""
+    if reverse and action == 'pre_clear':
+        # user.conversations.clear(): después ya no se sabe de qué conversaciones
+        instance._cleared_conversations = list(
+            Membership.objects.filter(user=instance).values_list('conversation_id', flat=True)
+        )
+        return
+    if action not in ('post_add', 'post_remove', 'post_clear'):
+        return
+    if not reverse:
+        conversation_ids = [instance.pk]
+    elif action == 'post_clear':
+        conversation_ids = getattr(instance, '_cleared_conversations', [])
+    else:
+        conversation_ids = pk_set
+    for conversation_id in conversation_ids:
+        sync_pair_key(conversation_id)
+
@@ -0,0 +1,41 @@
+// Live chat events (messaging.async_views.live_events). options come from
+// messaging.live.client_options(): under ASGI (transport 'sse') server-sent
+// events when the browser has EventSource, long-poll otherwise; under WSGI
+// (transport 'poll') a short poll every options.pollSeconds. onEvent gets
+// every event ({type: 'message' | 'unread', ...}); lastId is the newest
+// message id the page already shows, so nothing sent in between is lost.
+function openLiveEvents(url, lastId, options, onEvent) {
+    var separator = url.indexOf('?') === -1 ? '?' : '&';
+    var pushed = options.transport === 'sse';
+
+    function handle(event) {
+        if (event.type === 'message' && event.id > lastId) {
+            lastId = event.id;
+        }
+        onEvent(event);
+    }
+
+    if (pushed && window.EventSource) {
+        var source = new EventSource(url + (lastId ? separator + 'after=' + lastId : ''));
+        ['message', 'unread'].forEach(function (type) {
+            source.addEventListener(type, function (e) { handle(JSON.parse(e.data)); });
+        });
+        return;
+    }
+
+    (function poll() {
+        var pollUrl = url + separator + 'transport=poll' + (lastId ? '&after=' + lastId : '');
+        fetch(pollUrl, {credentials: 'same-origin'})
+            .then(function (response) {
+                if (!response.ok) { throw new Error(response.status); }
+                return response.json();
+            })
+            .then(function (data) {
+                data.events.forEach(handle);
+                if (data.last_id > lastId) { lastId = data.last_id; }
+                // A long-poll answers when there is something new: ask again right away
+                if (pushed) { poll(); } else { setTimeout(poll, options.pollSeconds * 1000); }
+            })
+            .catch(function () { setTimeout(poll, 3000); });
+    })();
+}
@@ -1,3 +1,265 @@
-from django.test import TestCase
+import time
+from datetime import timedelta
+
+from django.contrib.auth import get_user_model
+from django.db import connection
+from django.db.migrations.executor import MigrationExecutor
+from django.test import AsyncClient, TestCase, TransactionTestCase
+from django.urls import reverse
+from django.utils import timezone
+
+from .history import history_page
+from .inbox import direct_conversation, inbox_page, mark_read
+from .models import Conversation, Message
+
+User = get_user_model()
+
+
+class MessagingTestCase(TestCase):
+
+    def setUp(self):
+        self.customer = User.objects.create_user('customer', user_type='C')
+        self.vendor = User.objects.create_user('vendor', user_type='V')
+        self.conversation = direct_conversation(self.customer, self.vendor)
+
+    def send(self, sender, content='hi', conversation=None):
+        return Message.objects.create(conversation=conversation or self.conversation, sender=sender, content=content)
+
+
+# ==================================
+# === INBOX ====
+# ==================================
+
+class InboxPageTests(MessagingTestCase):
+
+    def setUp(self):
+        super().setUp()
+        now = timezone.now()
+        partners = [self.vendor] + [User.objects.create_user(f"partner-{i}", user_type='V') for i in range(4)]
+        self.threads = [direct_conversation(self.customer, partner) for partner in partners]
+        for i, (partner, conversation) in enumerate(zip(partners, self.threads)):
+            self.send(partner, f"message {i}", conversation)
+        # Two threads share their last activity: the id breaks the tie
+        times = [now - timedelta(minutes=m) for m in (5, 1, 3, 3, 2)]
+        for conversation, when in zip(self.threads, times):
+            Conversation.objects.filter(pk=conversation.pk).update(last_message_at=when)
+        self.expected = [self.threads[i].pk for i in (1, 4, 3, 2, 0)]
+
+    def test_pages_walk_every_conversation_once_newest_first(self):
+        seen, after = [], None
+        while True:
+            with self.assertNumQueries(1):
+                page = inbox_page(self.customer, after=after, page_size=2)
+            seen += [c.pk for c in page]
+            if not page.has_next:
+                break
+            after = page.next_cursor
+        self.assertEqual(seen, self.expected)
+
+    def test_rows_carry_partner_preview_and_unread_count(self):
+        row = next(c for c in inbox_page(self.customer) if c.pk == self.conversation.pk)
+        self.assertEqual((row.partner_username, row.last_message_preview, row.unread_count), ('vendor', 'message 0', 1))
+        mark_read(self.conversation, self.customer)
+        row = next(c for c in inbox_page(self.customer) if c.pk == self.conversation.pk)
+        self.assertEqual(row.unread_count, 0)
+
+    def test_invalid_cursor_starts_from_the_top(self):
+        self.assertEqual([c.pk for c in inbox_page(self.customer, after='garbage')], self.expected)
+
+
+# ==================================
+# === HISTORY ====
+# ==================================
+
+class HistoryPageTests(MessagingTestCase):
+
+    def setUp(self):
+        super().setUp()
+        self.messages = [self.send(self.customer if i % 2 else self.vendor, f"m{i}") for i in range(7)]
+        # Same timestamp for the middle ones: the id orders them
+        Message.objects.filter(pk__in=[m.pk for m in self.messages[2:5]]).update(timestamp=self.messages[2].timestamp)
+
+    def test_newest_window_then_older_pages(self):
+        pages, before = [], None
+        while True:
+            page = history_page(self.conversation, before=before, page_size=3)
+            pages.append([m.content for m in page])
+            if not page.has_older:
+                break
+            before = page.older_cursor
+        self.assertEqual(pages, [['m4', 'm5', 'm6'], ['m1', 'm2', 'm3'], ['m0']])
+
+    def test_older_messages_endpoint(self):
+        self.client.force_login(self.customer)
+        first = history_page(self.conversation, page_size=5)
+        url = reverse('conversation_older_messages', kwargs={'pk': self.conversation.pk})
+        data = self.client.get(url, {'before': first.older_cursor, 'format': 'json'}).json()
+        self.assertEqual([m['content'] for m in data['messages']], ['m0', 'm1'])
+        self.assertIsNone(data['older_cursor'])
+
+    def test_older_messages_of_someone_elses_conversation_are_not_found(self):
+        outsider = User.objects.create_user('outsider', user_type='C')
+        self.client.force_login(outsider)
+        url = reverse('conversation_older_messages', kwargs={'pk': self.conversation.pk})
+        self.assertEqual(self.client.get(url).status_code, 404)
+
+
+# ==================================
+# === LIVE EVENTS ====
+# ==================================
+
+class LiveEventsUnderWsgiTests(MessagingTestCase):
+    """The test Client is a WSGI request: polls must answer at once, from the database."""
+
+    def setUp(self):
+        super().setUp()
+        self.client.force_login(self.vendor)
+        self.url = reverse('live_events')
+
+    def test_pages_are_told_to_short_poll(self):
+        response = self.client.get(reverse('conversation_detail', kwargs={'pk': self.conversation.pk}))
+        self.assertEqual(response.context['live_options']['transport'], 'poll')
+
+    def test_first_poll_answers_at_once_with_the_cursor(self):
+        newest = self.send(self.customer)
+        started = time.monotonic()
+        response = self.client.get(self.url, {'transport': 'poll'})
+        self.assertLess(time.monotonic() - started, 1)
+        self.assertEqual(response.json(), {'events': [], 'last_id': newest.pk})
+
+    def test_poll_returns_what_arrived_after_the_cursor(self):
+        first = self.send(self.customer, 'first')
+        second = self.send(self.customer, 'second')
+        data = self.client.get(self.url, {'transport': 'poll', 'after': first.pk}).json()
+        self.assertEqual([e['content'] for e in data['events'] if e['type'] == 'message'], ['second'])
+        self.assertIn({'type': 'unread', 'conversation': self.conversation.pk, 'unread': 2}, data['events'])
+        self.assertEqual(data['last_id'], second.pk)
+
+    def test_event_stream_request_is_answered_without_waiting(self):
+        first = self.send(self.customer, 'first')
+        self.send(self.customer, 'second')
+        started = time.monotonic()
+        response = self.client.get(self.url, {'after': first.pk})
+        self.assertLess(time.monotonic() - started, 1)
+        self.assertEqual(response['Content-Type'], 'text/event-stream')
+        self.assertIn(b'"content": "second"', response.content)
+
+
+class LiveEventsUnderAsgiTests(MessagingTestCase):
+
+    async def test_pages_are_told_to_stream(self):
+        client = AsyncClient()
+        await client.aforce_login(self.vendor)
+        response = await client.get(reverse('conversation_list_async'))
+        self.assertEqual(response.context['live_options']['transport'], 'sse')
+
+
+# ==================================
+# === MIGRATIONS ====
+# ==================================
+
+class MigrationTestCase(TransactionTestCase):
+    """Migrates messaging back to ``migrate_from``, seeds it, then runs up to ``migrate_to``."""
+    migrate_from = migrate_to = None
+
+    def setUp(self):
+        executor = MigrationExecutor(connection)
+        # The other apps stay at their latest migration, as in the database
+        others = [node for node in executor.loader.graph.leaf_nodes() if node[0] != 'messaging']
+        executor.migrate([('messaging', self.migrate_from)])
+        self.seed(executor.loader.project_state([('messaging', self.migrate_from), *others]).apps)
+        executor = MigrationExecutor(connection)  # reload the graph
+        executor.migrate([('messaging', self.migrate_to)])
+        self.apps = executor.loader.project_state([('messaging', self.migrate_to), *others]).apps
+
+    def tearDown(self):
+        executor = MigrationExecutor(connection)
+        executor.migrate(executor.loader.graph.leaf_nodes())
+
+    def seed(self, apps):
+        raise NotImplementedError
+
+
+class ReadCursorBackfillMigrationTests(MigrationTestCase):
+    migrate_from = '0002_conversation_last_message_idx'
+    migrate_to = '0003_membership_read_cursors'
+
+    def seed(self, apps):
+        User = apps.get_model('accounts', 'CustomUser')
+        Conversation = apps.get_model('messaging', 'Conversation')
+        Message = apps.get_model('messaging', 'Message')
+        self.a = User.objects.create(username='a')
+        self.b = User.objects.create(username='b')
+        conversation = Conversation.objects.create()
+        conversation.participants.add(self.a, self.b)
+        self.conversation_id = conversation.pk
+        self.read_by_b = Message.objects.create(conversation=conversation, sender=self.a, content='1', is_read=True)
+        self.read_by_a = Message.objects.create(conversation=conversation, sender=self.b, content='2', is_read=True)
+        self.unread_by_b = Message.objects.create(conversation=conversation, sender=self.a, content='3', is_read=False)
+
+    def cursor(self, user):
+        Membership = self.apps.get_model('messaging', 'Membership')
+        return Membership.objects.get(conversation_id=self.conversation_id, user_id=user.pk).last_read_message_id
+
+    def test_each_participant_keeps_what_they_had_read(self):
+        # a read everything from b; b's first unread message is the third one
+        self.assertEqual(self.cursor(self.a), self.unread_by_b.pk)
+        self.assertEqual(self.cursor(self.b), self.read_by_a.pk)
+
+    def test_unread_count_survives(self):
+        Message = self.apps.get_model('messaging', 'Message')
+        unread = Message.objects.filter(conversation_id=self.conversation_id, pk__gt=self.cursor(self.b)).exclude(sender_id=self.b.pk)
+        self.assertEqual(list(unread.values_list('pk', flat=True)), [self.unread_by_b.pk])
+
+
+class MergeDuplicatePairsMigrationTests(MigrationTestCase):
+    migrate_from = '0005_liveevent'
+    migrate_to = '0006_conversation_pair_key'
+
+    def seed(self, apps):
+        User = apps.get_model('accounts', 'CustomUser')
+        Conversation = apps.get_model('messaging', 'Conversation')
+        Membership = apps.get_model('messaging', 'Membership')
+        Message = apps.get_model('messaging', 'Message')
+        self.a, self.b, self.c = (User.objects.create(username=name) for name in 'abc')
+
+        def conversation(*users):
+            conversation = Conversation.objects.create()
+            for user in users:
+                Membership.objects.create(conversation=conversation, user=user)
+            return conversation
+
+        self.first, self.second = conversation(self.a, self.b), conversation(self.b, self.a)
+        self.group = conversation(self.a, self.b, self.c)
+        self.messages = [
+            Message.objects.create(conversation=self.first, sender=self.a, content='1').pk,
+            Message.objects.create(conversation=self.second, sender=self.b, content='2').pk,
+            Message.objects.create(conversation=self.first, sender=self.a, content='3').pk,
+        ]
+        Message.objects.create(conversation=self.group, sender=self.c, content='group')
+        # b read everything in the first thread, a nothing in the second
+        Membership.objects.filter(conversation=self.first, user=self.b).update(last_read_message_id=self.messages[2])
+
+    def test_the_oldest_conversation_keeps_every_message_and_member(self):
+        Conversation = self.apps.get_model('messaging', 'Conversation')
+        Message = self.apps.get_model('messaging', 'Message')
+        Membership = self.apps.get_model('messaging', 'Membership')
+        self.assertFalse(Conversation.objects.filter(pk=self.second.pk).exists())
+        kept = Conversation.objects.get(pk=self.first.pk)
+        self.assertEqual((kept.user_low_id, kept.user_high_id), (self.a.pk, self.b.pk))
+        self.assertEqual(list(Message.objects.filter(conversation=kept).order_by('pk').values_list('pk', flat=True)), self.messages)
+        self.assertEqual(set(Membership.objects.filter(conversation=kept).values_list('user_id', flat=True)), {self.a.pk, self.b.pk})
+
+    def test_unread_messages_stay_unread(self):
+        Membership = self.apps.get_model('messaging', 'Membership')
+        cursor = Membership.objects.get(conversation_id=self.first.pk, user_id=self.a.pk).last_read_message_id
+        self.assertLess(cursor, self.messages[1])  # b's message, from the merged thread
+        cursor = Membership.objects.get(conversation_id=self.first.pk, user_id=self.b.pk).last_read_message_id
+        self.assertEqual(cursor, self.messages[2])
+
+    def test_group_conversations_get_no_pair_key(self):
+        Conversation = self.apps.get_model('messaging', 'Conversation')
+        group = Conversation.objects.get(pk=self.group.pk)
+        self.assertEqual((group.user_low_id, group.user_high_id), (None, None))
+        self.assertEqual(group.messages.count(), 1)
 
-# Create your tests here.
@@ -1,5 +1,5 @@
 from django.urls import path, include
-from . import views
+from . import async_views, views
 
 urlpatterns = [
     # 1. Bandeja de entrada (lista de conversaciones)
@@ -7,8 +7,16 @@ urlpatterns = [
     
     # 2. Detalle de la conversación (ID de la conversación)
     path('inbox/<int:pk>/', views.ConversationDetailView.as_view(), name='conversation_detail'),
+    path('inbox/<int:pk>/older/', views.OlderMessagesView.as_view(), name='conversation_older_messages'),
     
     # 3. Iniciar o buscar una conversación
     path('start/', views.StartConversationView.as_view(), name='start_conversation'),
 
+    # 4. Versiones async de la bandeja y del chat (para ASGI)
+    path('async/inbox/', async_views.conversation_list, name='conversation_list_async'),
+    path('async/inbox/<int:pk>/', async_views.conversation_detail, name='conversation_detail_async'),
+
+    # 5. Mensajes nuevos en vivo (SSE o long-poll, ASGI)
+    path('live/', async_views.live_events, name='live_events'),
+
 ]
\ No newline at end of file
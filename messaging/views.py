@@ -2,11 +2,13 @@ from django.shortcuts import render, redirect, get_object_or_404
 from django.urls import reverse
 from django.contrib.auth.mixins import LoginRequiredMixin 
 from django.views.generic import ListView, DetailView, View
-from django.http import HttpResponseRedirect, Http404
+from django.http import HttpResponseRedirect, Http404, JsonResponse
 from django.contrib.auth import get_user_model
-from django.db.models import Count
 from .models import Conversation, Message
+from . import live
 from .forms import MessageForm
+from .history import history_page, message_json
+from .inbox import available_users, direct_conversation, inbox_page, mark_read
 
 # ----------------------------------------------------
 # 1. Conversation List View (Inbox)
@@ -18,22 +20,16 @@ class ConversationListView(LoginRequiredMixin, ListView):
     context_object_name = 'conversations'
 
     def get_queryset(self):
-        qs = Conversation.objects.filter(participants=self.request.user).order_by('-last_message_at').distinct()
-        for conv in qs:
-            # Determine the 1-to-1 partner (other participant)
-            conv.partner = conv.participants.exclude(pk=self.request.user.pk).first()
-            # Count unread messages from partner
-            if conv.partner:
-                conv.unread_count = conv.messages.filter(is_read=False, sender=conv.partner).count()
-            else:
-                conv.unread_count = 0
-        return qs
+        # One query per page: partner, last message and unread count come
+        # annotated (messaging.inbox), ?after= moves to older threads
+        self.page = inbox_page(self.request.user, after=self.request.GET.get('after'))
+        return self.page.conversations
 
     def get_context_data(self, **kwargs):
         context = super().get_context_data(**kwargs)
-        User = get_user_model()
-        # All users except the logged-in user
-        context['available_users'] = User.objects.exclude(pk=self.request.user.pk)
+        context['page'] = self.page
+        context['available_users'] = available_users(self.request.user)
+        context['live_options'] = live.client_options(self.request)
         return context
 
 # ----------------------------------------------------
@@ -55,12 +51,16 @@ class ConversationDetailView(LoginRequiredMixin, DetailView):
         context = super().get_context_data(**kwargs)
         context['form'] = MessageForm()
 
-        # Mark partner's unread messages as read
-        partner_messages = self.object.messages.filter(is_read=False).exclude(sender=self.request.user)
-        partner_messages.update(is_read=True)
+        # Only the newest messages; older ones through OlderMessagesView
+        context['history'] = history_page(self.object)
+
+        # Move the user's read cursor to the newest message (one row)
+        if mark_read(self.object, self.request.user):
+            live.publish_read(self.object.pk, self.request.user.pk)
 
         # Determine partner 1-to-1
         context['partner'] = self.object.participants.exclude(pk=self.request.user.pk).first()
+        context['live_options'] = live.client_options(self.request)
         return context
 
     def post(self, request, *args, **kwargs):
@@ -72,12 +72,35 @@ class ConversationDetailView(LoginRequiredMixin, DetailView):
             new_message.conversation = self.object
             new_message.sender = request.user
             new_message.save()
+            if request.headers.get('x-requested-with') == 'XMLHttpRequest':
+                # Sent from the live chat: the message reaches the page through live_events
+                return JsonResponse(message_json(new_message, request.user.pk), status=201)
             return HttpResponseRedirect(reverse('conversation_detail', kwargs={'pk': self.object.pk}))
+        if request.headers.get('x-requested-with') == 'XMLHttpRequest':
+            return JsonResponse({'errors': form.errors}, status=400)
 
         context = self.get_context_data(object=self.object)
         context['form'] = form
         return self.render_to_response(context)
 
+# ----------------------------------------------------
+# 2.1 Older Messages ("load older" in the chat)
+# ----------------------------------------------------
+class OlderMessagesView(LoginRequiredMixin, View):
+    """
+    The page of messages before ?before= (a cursor from the previous page),
+    as an HTML fragment for the chat or as JSON with ?format=json.
+    """
+    def get(self, request, pk):
+        conversation = get_object_or_404(Conversation.objects.filter(participants=request.user), pk=pk)
+        history = history_page(conversation, before=request.GET.get('before'))
+        if request.GET.get('format') == 'json':
+            return JsonResponse({
+                'messages': [message_json(m, request.user.pk) for m in history],
+                'older_cursor': history.older_cursor,
+            })
+        return render(request, 'messaging/message_history.html', {'conversation': conversation, 'history': history})
+
 # ----------------------------------------------------
 # 3. Start Conversation View (1-to-1)
 # ----------------------------------------------------
@@ -98,21 +121,7 @@ class StartConversationView(LoginRequiredMixin, View):
         except RecipientModel.DoesNotExist:
             return redirect('conversation_list') 
 
-        current_user = request.user
-        
-        # Find 1-to-1 conversation using annotate
-        conversation = (
-            Conversation.objects
-            .filter(participants=current_user)
-            .filter(participants=recipient)
-            .annotate(num_participants=Count('participants'))
-            .filter(num_participants=2)
-            .first()
-        )
-
-        if not conversation:
-            conversation = Conversation.objects.create()
-            conversation.participants.add(current_user, recipient)
-            conversation.save()
+        # One probe on the (user_low, user_high) pair key
+        conversation = direct_conversation(request.user, recipient)
 
         return redirect('conversation_detail', pk=conversation.pk)